@@ -25,15 +25,18 @@ class OscilatorAgent(AgentBase):
 
     def driver(self, sim):
         sig = self.intf
-        sim.write(0, sig)
-        halfPeriod = self.period / 2
+        sim.writeInt(0, sig)
+        # integer halves, odd period does not cause a drift
+        p = sim.toSimTime(self.period)
+        lowTime = p // 2
+        highTime = p - lowTime
         yield sim.wait(self.initWait)
 
         while True:
-            yield sim.wait(halfPeriod)
-            sim.write(1, sig)
-            yield sim.wait(halfPeriod)
-            sim.write(0, sig)
+            yield sim.wait(lowTime)
+            sim.writeInt(1, sig)
+            yield sim.wait(highTime)
+            sim.writeInt(0, sig)
 
     def getMonitors(self):
         self.last = (-1, None)
@@ -43,11 +46,7 @@ class OscilatorAgent(AgentBase):
 
     def monitor(self, sim):
         yield sim.waitOnCombUpdate()
-        v = sim.read(self.intf)
-        if not v.vldMask:
-            v = None
-        else:
-            v = v.val
+        v = sim.readInt(self.intf)
 
         now = sim.now
         last = self.last
@@ -23,25 +23,25 @@ class FifoReaderAgent(SyncAgentBase):
     def setEnable_asDriver(self, en, sim):
         self._enabled = en
         self.driver.setEnable(en, sim)
-        sim.write(not en, self.intf.wait)
+        sim.writeInt(int(not en), self.intf.wait)
         self.lastData_invalidate = not en
 
     def setEnable_asMonitor(self, en, sim):
         lastEn = self._enabled
         self._enabled = en
         self.monitor.setEnable(en, sim)
-        sim.write(en, self.intf.en)
+        sim.writeInt(int(en), self.intf.en)
         self.readPending_invalidate = not en
         if not lastEn:
             self.dataReader.setEnable(en, sim)
 
     def driver_init(self, sim):
-        sim.write(not self._enabled, self.intf.wait)
+        sim.writeInt(int(not self._enabled), self.intf.wait)
         return
         yield
 
     def monitor_init(self, sim):
-        sim.write(self._enabled, self.intf.en)
+        sim.writeInt(int(self._enabled), self.intf.en)
         return
         yield
 
@@ -64,18 +64,18 @@ class FifoReaderAgent(SyncAgentBase):
 
     def monitor(self, sim):
         intf = self.intf
-        r = sim.read
 
         if self.notReset(sim):
             # speculative en set
             yield sim.waitOnCombUpdate()
-            wait = r(intf.wait)
-            assert wait.vldMask, (sim.now, intf, "wait signal in invalid state")
-            rd = not wait.val
-            sim.write(rd, intf.en)
+            wait = sim.readInt(intf.wait)
+            assert wait is not None, (sim.now, intf,
+                                      "wait signal in invalid state")
+            rd = not wait
+            sim.writeInt(int(rd), intf.en)
 
         else:
-            sim.write(0, intf.en)
+            sim.writeInt(0, intf.en)
             rd = False
 
         self.readPending = rd
@@ -92,7 +92,7 @@ class FifoReaderAgent(SyncAgentBase):
         # delay data litle bit to have nicer wave
         # otherwise wirte happens before next clk period
         # and it means in 0 time and we will not be able to see it in wave
-        yield sim.wait(DEFAULT_CLOCK / 10)
+        yield sim.wait(DEFAULT_CLOCK // 10)
         sim.write(self.lastData, self.intf.data)
         if self.lastData_invalidate:
             self.lastData = None
@@ -103,7 +103,6 @@ class FifoReaderAgent(SyncAgentBase):
         # * set last data (done in separate process)
         # * if en == 1, pop next data for next clk
         intf = self.intf
-        w = sim.write
         rst_n = self.notReset(sim)
         # speculative write
         if rst_n and self.data:
@@ -111,7 +110,7 @@ class FifoReaderAgent(SyncAgentBase):
         else:
             wait = 1
 
-        w(wait, intf.wait)
+        sim.writeInt(wait, intf.wait)
 
         if rst_n:
             yield sim.waitOnCombUpdate()
@@ -119,9 +118,10 @@ class FifoReaderAgent(SyncAgentBase):
             yield sim.waitOnCombUpdate()
             # check if write can be performed and if it possible do real write
 
-            en = sim.read(intf.en)
-            assert en.vldMask, (sim.now, intf, "en signal in invalid state")
-            if en.val:
+            en = sim.readInt(intf.en)
+            assert en is not None, (sim.now, intf,
+                                    "en signal in invalid state")
+            if en:
                 assert self.data, (sim.now, intf, "underflow")
                 self.lastData = self.data.popleft()
 
@@ -136,37 +136,37 @@ class FifoWriterAgent(SyncAgentBase):
         self.data = deque()
 
     def driver_init(self, sim):
-        sim.write(self._enabled, self.intf.en)
+        sim.writeInt(int(self._enabled), self.intf.en)
         return
         yield
 
     def monitor_init(self, sim):
-        sim.write(not self._enabled, self.intf.wait)
+        sim.writeInt(int(not self._enabled), self.intf.wait)
         return
         yield
 
     def setEnable_asDriver(self, en, sim):
         SyncAgentBase.setEnable_asDriver(self, en, sim)
-        sim.write(en, self.intf.en)
+        sim.writeInt(int(en), self.intf.en)
 
     def setEnable_asMonitor(self, en, sim):
         SyncAgentBase.setEnable_asMonitor(self, en, sim)
-        sim.write(not en, self.intf.wait)
+        sim.writeInt(int(not en), self.intf.wait)
 
     def monitor(self, sim):
         # set wait signal
         # if en == 1 take data
         intf = self.intf
-        sim.write(0, intf.wait)
+        sim.writeInt(0, intf.wait)
 
         yield sim.waitOnCombUpdate()
         # wait for potential update of en
         yield sim.waitOnCombUpdate()
 
-        en = sim.read(intf.en)
-        assert en.vldMask, (sim.now, intf, "en signal in invalid state")
-        if en.val:
-            yield sim.wait(DEFAULT_CLOCK / 10)
+        en = sim.readInt(intf.en)
+        assert en is not None, (sim.now, intf, "en signal in invalid state")
+        if en:
+            yield sim.wait(DEFAULT_CLOCK // 10)
             self.data.append(sim.read(intf.data))
 
     def driver(self, sim):
@@ -177,16 +177,17 @@ class FifoWriterAgent(SyncAgentBase):
         if self.notReset(sim) and self.data:
             yield sim.waitOnCombUpdate()
 
-            wait = sim.read(intf.wait)
-            assert wait.vldMask, (sim.now, intf, "wait signal in invalid state")
-            if not wait.val:
+            wait = sim.readInt(intf.wait)
+            assert wait is not None, (sim.now, intf,
+                                      "wait signal in invalid state")
+            if not wait:
                 d = self.data.popleft()
                 w(d, intf.data)
-                w(1, intf.en)
+                sim.writeInt(1, intf.en)
                 return
 
         w(None, intf.data)
-        w(0, intf.en)
+        sim.writeInt(0, intf.en)
 
     def getDrivers(self):
         return SyncAgentBase.getDrivers(self) + [self.driver_init]
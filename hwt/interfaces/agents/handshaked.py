@@ -2,6 +2,9 @@ from collections import deque
 
 from hwt.hdl.constants import NOP
 from hwt.simulator.agentBase import SyncAgentBase
+from hwt.simulator.agentBuffers import BufferDataSource, IntDataBuffer
+from hwt.simulator.agentConnector import valToBit
+from hwt.simulator.shortcuts import IDLE_FOREVER
 
 
 class HandshakedAgent(SyncAgentBase):
@@ -30,17 +33,104 @@ class HandshakedAgent(SyncAgentBase):
         self._lastVld = None
         # callbacks
         self._afterRead = None
+        # burst mode
+        self._schedule = None
+        self._scheduleIndex = 0
+        self._onDriverWriteAck = None
+        self._onMonitorReady = None
+
+        # subclasses may override only hooks which work with Value instances
+        self._bindValueHook(
+            HandshakedAgent, "isRd", "isRdInt",
+            lambda sim: valToBit(self.isRd(sim.read)))
+        self._bindValueHook(
+            HandshakedAgent, "wrRd", "wrRdInt",
+            lambda sim, val: self.wrRd(sim.write, val))
+        self._bindValueHook(
+            HandshakedAgent, "isVld", "isVldInt",
+            lambda sim: valToBit(self.isVld(sim.read)))
+        self._bindValueHook(
+            HandshakedAgent, "wrVld", "wrVldInt",
+            lambda sim, val: self.wrVld(sim.write, val))
+
+    def setDataSource(self, data, itemSize=None, byteorder="little"):
+        """
+        Use buffer as a source of data for driver
+        (data are converted to ints lazily, see :class:`~.BufferDataSource`)
+
+        :param data: bytes/memoryview (byte stream), array.array
+            or 1D NumPy array (an item per data word, masked to width
+            of data signal)
+        :param itemSize: size of item in bytes for byte stream,
+            default is width of data signal rounded up to bytes
+        """
+        width = self.intf.data._dtype.bit_length()
+        if itemSize is None:
+            itemSize = (width + 7) // 8
+        self.data = BufferDataSource(data, itemSize=itemSize,
+                                     byteorder=byteorder, width=width)
+
+    def setDataSink(self, capacity=0, fields=None):
+        """
+        Collect data of monitor as ints in a growable array
+        (see :class:`~.IntDataBuffer`) instead of deque of values
+
+        :param capacity: number of items to preallocate
+        :param fields: optional HStruct type used to decode fields of data
+        :attention: doRead has to return Value of data signal
+        """
+        self.data = IntDataBuffer(self.intf.data._dtype.bit_length(),
+                                  capacity=capacity, fields=fields)
+
+    def setBurstMode(self, schedule=None):
+        """
+        Switch driver/monitor to burst mode in which it is a plain function
+        called on every clock edge instead of generator,
+        rd/vld is checked by function called after combinational update
+        (only if vld/rd of this agent is high) and the bookkeeping is done
+        only if data were transferred. Data are transferred back to back
+        as long as the other side is ready.
+
+        :param schedule: optional sequence of 0/1 (bytes, array,
+            NumPy array...), i-th item specifies if vld (driver) can be
+            asserted in i-th clock cycle in which driver has data to send
+            or if rd (monitor) can be asserted in i-th clock cycle,
+            schedule is repeated, used to randomize stalls
+        :attention: has to be called before start of simulation
+        """
+        if schedule is not None:
+            if not isinstance(schedule, (bytes, bytearray)):
+                schedule = bytes(bool(x) for x in schedule)
+            assert schedule, "schedule can not be empty"
+        self._schedule = schedule
+        self._scheduleIndex = 0
+        self._onDriverWriteAck = getattr(self, "onDriverWriteAck", None)
+        self._onMonitorReady = getattr(self, "onMonitorReady", None)
+        self.driver.fn = self._burstDriver
+        self.driver.isGenerator = False
+        self.monitor.fn = self._burstMonitor
+        self.monitor.isGenerator = False
+
+    def _nextInSchedule(self) -> int:
+        schedule = self._schedule
+        i = self._scheduleIndex
+        v = schedule[i]
+        i += 1
+        if i == len(schedule):
+            i = 0
+        self._scheduleIndex = i
+        return v
 
     def setEnable_asDriver(self, en, sim):
         super(HandshakedAgent, self).setEnable_asDriver(en, sim)
         if not en:
-            self.wrVld(sim.write, 0)
+            self.wrVldInt(sim, 0)
             self._lastVld = 0
 
     def setEnable_asMonitor(self, en, sim):
         super(HandshakedAgent, self).setEnable_asMonitor(en, sim)
         if not en:
-            self.wrRd(sim.write, 0)
+            self.wrRdInt(sim, 0)
             self._lastRd = 0
 
     def getRd(self):
@@ -50,12 +140,30 @@ class HandshakedAgent(SyncAgentBase):
     def isRd(self, readFn):
         """
         get value of "ready" signal
+
+        :param readFn: sim.read
+        :note: agent uses :meth:`~.isRdInt`, which calls this method
+            if it is overridden
         """
         return readFn(self._rd)
 
+    def isRdInt(self, sim):
+        """
+        Same as :meth:`~.isRd` but value is read by sim.readInt
+
+        :return: 1/0 or None if value is invalid
+        """
+        return sim.readInt(self._rd)
+
     def wrRd(self, wrFn, val):
         wrFn(val, self._rd)
 
+    def wrRdInt(self, sim, val):
+        """
+        Same as :meth:`~.wrRd` but value is written by sim.writeInt
+        """
+        sim.writeInt(val, self._rd)
+
     def getVld(self):
         """get "valid" signal"""
         return self.intf.vld._sigInside
@@ -64,21 +172,38 @@ class HandshakedAgent(SyncAgentBase):
         """
         get value of "valid" signal, override f.e. when you
         need to use signal with reversed polarity
+
+        :param readFn: sim.read
+        :note: agent uses :meth:`~.isVldInt`, which calls this method
+            if it is overridden
         """
         return readFn(self._vld)
 
+    def isVldInt(self, sim):
+        """
+        Same as :meth:`~.isVld` but value is read by sim.readInt
+
+        :return: 1/0 or None if value is invalid
+        """
+        return sim.readInt(self._vld)
+
     def wrVld(self, wrFn, val):
         wrFn(val, self._vld)
 
+    def wrVldInt(self, sim, val):
+        """
+        Same as :meth:`~.wrVld` but value is written by sim.writeInt
+        """
+        sim.writeInt(val, self._vld)
+
     def monitor(self, sim):
         """
         Collect data from interface
         """
-        r = sim.read
         if self.notReset(sim):
             # update rd signal only if required
             if self._lastRd is not 1:
-                self.wrRd(sim.write, 1)
+                self.wrRdInt(sim, 1)
                 self._lastRd = 1
 
                 # try to run onMonitorReady if there is any
@@ -92,11 +217,11 @@ class HandshakedAgent(SyncAgentBase):
 
             # wait for response of master
             yield sim.waitOnCombUpdate()
-            vld = self.isVld(r)
-            assert vld.vldMask, (sim.now, self.intf,
-                                 "vld signal is in invalid state")
+            vld = self.isVldInt(sim)
+            assert vld is not None, (sim.now, self.intf,
+                                     "vld signal is in invalid state")
 
-            if vld.val:
+            if vld:
                 # master responded with positive ack, do read data
                 d = self.doRead(sim)
                 if self._debugOutput is not None:
@@ -110,9 +235,25 @@ class HandshakedAgent(SyncAgentBase):
         else:
             if self._lastRd is not 0:
                 # can not receive, say it to masters
-                self.wrRd(sim.write, 0)
+                self.wrRdInt(sim, 0)
                 self._lastRd = 0
 
+    def monitorIdleUntil(self, sim):
+        """
+        Monitor is idle if it does not have to change ready signal
+        and there is no valid data on interface
+        """
+        if self.notReset(sim):
+            if self._lastRd != 1:
+                return None
+            vld = self.isVldInt(sim)
+            if vld is None or vld:
+                return None
+        elif self._lastRd != 0:
+            return None
+
+        return IDLE_FOREVER
+
     def doRead(self, sim):
         """extract data from interface"""
         return sim.read(self.intf.data)
@@ -123,8 +264,21 @@ class HandshakedAgent(SyncAgentBase):
 
     def checkIfRdWillBeValid(self, sim):
         yield sim.waitOnCombUpdate()
-        rd = self.isRd(sim.read)
-        assert rd.vldMask, (sim.now, self.intf, "rd signal in invalid state")
+        rd = self.isRdInt(sim)
+        assert rd is not None, (sim.now, self.intf,
+                                "rd signal in invalid state")
+
+    def driverIdleUntil(self, sim):
+        """
+        Driver is idle until its queue is refilled
+        if it does not have any pending data
+        """
+        if (self.actualData is NOP
+                and not self.data
+                and self._lastWritten is NOP
+                and self._lastVld == 0):
+            return IDLE_FOREVER
+        return None
 
     def driver(self, sim):
         """
@@ -132,8 +286,6 @@ class HandshakedAgent(SyncAgentBase):
 
         set vld high and wait on rd in high then pass new data
         """
-        r = sim.read
-
         # pop new data if there are not any pending
         if self.actualData is NOP and self.data:
             self.actualData = self.data.popleft()
@@ -151,7 +303,7 @@ class HandshakedAgent(SyncAgentBase):
         en = self.notReset(sim)
         vld = int(en and doSend)
         if self._lastVld is not vld:
-            self.wrVld(sim.write, vld)
+            self.wrVldInt(sim, vld)
             self._lastVld = vld
 
         if not self._enabled:
@@ -163,13 +315,13 @@ class HandshakedAgent(SyncAgentBase):
         # wait of response of slave
         yield sim.waitOnCombUpdate()
 
-        rd = self.isRd(r)
-        assert rd.vldMask, (sim.now, self.intf,
-                            "rd signal in invalid state")
+        rd = self.isRdInt(sim)
+        assert rd is not None, (sim.now, self.intf,
+                                "rd signal in invalid state")
         if not vld:
             return
 
-        if rd.val:
+        if rd:
             # slave did read data, take new one
             if self._debugOutput is not None:
                 self._debugOutput.write("%s, wrote, %d: %r\n" % (
@@ -193,6 +345,109 @@ class HandshakedAgent(SyncAgentBase):
             if onDone is not None:
                 onDone(sim)
 
+    def _burstDriver(self, sim):
+        """
+        Driver for burst mode (see :meth:`~.setBurstMode`)
+
+        :return: function which checks ready after combinational update
+            or None if there is nothing to check
+        """
+        if self.actualData is NOP and self.data:
+            self.actualData = self.data.popleft()
+
+        doSend = self.actualData is not NOP
+        if doSend and self._schedule is not None:
+            doSend = self._nextInSchedule()
+
+        if self.actualData is not self._lastWritten:
+            if self.actualData is NOP:
+                self.doWrite(sim, None)
+            else:
+                self.doWrite(sim, self.actualData)
+            self._lastWritten = self.actualData
+
+        vld = int(doSend and self.notReset(sim))
+        if self._lastVld is not vld:
+            self.wrVldInt(sim, vld)
+            self._lastVld = vld
+
+        if vld:
+            return self._burstDriverCheckRd
+
+    def _burstDriverCheckRd(self, sim):
+        """
+        Check if slave did read data in burst mode
+        """
+        if not self._lastVld:
+            # disabled in meantime
+            return
+        rd = self.isRdInt(sim)
+        assert rd is not None, (sim.now, self.intf,
+                                "rd signal in invalid state")
+        if not rd:
+            return
+
+        a = self.actualData
+        self.actualData = NOP
+        if self._debugOutput is not None:
+            self._debugOutput.write("%s, wrote, %d: %r\n" % (
+                self.intf._getFullName(),
+                sim.now, a))
+
+        if self._onDriverWriteAck is not None:
+            self._onDriverWriteAck(sim)
+
+        if not isinstance(a, int):
+            onDone = getattr(a, "onDone", None)
+            if onDone is not None:
+                onDone(sim)
+
+    def _burstMonitor(self, sim):
+        """
+        Monitor for burst mode (see :meth:`~.setBurstMode`)
+
+        :return: function which checks valid after combinational update
+            or None if there is nothing to check
+        """
+        if self.notReset(sim):
+            if self._schedule is None:
+                rd = 1
+            else:
+                rd = self._nextInSchedule()
+        else:
+            rd = 0
+
+        if self._lastRd is not rd:
+            self.wrRdInt(sim, rd)
+            self._lastRd = rd
+            if rd and self._onMonitorReady is not None:
+                self._onMonitorReady(sim)
+
+        if rd:
+            return self._burstMonitorCheckVld
+
+    def _burstMonitorCheckVld(self, sim):
+        """
+        Check if master did send data in burst mode
+        """
+        if not self._lastRd:
+            # disabled in meantime
+            return
+        vld = self.isVldInt(sim)
+        assert vld is not None, (sim.now, self.intf,
+                                 "vld signal is in invalid state")
+        if not vld:
+            return
+
+        d = self.doRead(sim)
+        if self._debugOutput is not None:
+            self._debugOutput.write("%s, read, %d: %r\n" % (
+                self.intf._getFullName(),
+                sim.now, d))
+        self.data.append(d)
+        if self._afterRead is not None:
+            self._afterRead(sim)
+
 
 class HandshakeSyncAgent(HandshakedAgent):
     """
@@ -2,6 +2,7 @@ from collections import deque
 
 from hwt.hdl.constants import NOP
 from hwt.simulator.agentBase import SyncAgentBase
+from hwt.simulator.agentConnector import valToBit
 
 
 class RdSyncedAgent(SyncAgentBase):
@@ -14,31 +15,58 @@ class RdSyncedAgent(SyncAgentBase):
         self.data = deque()
         self._rd = self.getRd(intf)
 
+        # subclasses may override only hooks which work with Value instances
+        self._bindValueHook(
+            RdSyncedAgent, "isRd", "isRdInt",
+            lambda sim: valToBit(self.isRd(sim.read)))
+        self._bindValueHook(
+            RdSyncedAgent, "wrRd", "wrRdInt",
+            lambda sim, val: self.wrRd(sim.write, val))
+
     def getRd(self, intf):
         return intf.rd
 
     def isRd(self, readFn):
+        """
+        :param readFn: sim.read
+        :note: agent uses :meth:`~.isRdInt`, which calls this method
+            if it is overridden
+        """
         return readFn(self._rd)
 
+    def isRdInt(self, sim):
+        """
+        Same as :meth:`~.isRd` but value is read by sim.readInt
+
+        :return: 1/0 or None if value is invalid
+        """
+        return sim.readInt(self._rd)
+
     def wrRd(self, writeFn, val):
         writeFn(val, self._rd)
 
+    def wrRdInt(self, sim, val):
+        """
+        Same as :meth:`~.wrRd` but value is written by sim.writeInt
+        """
+        sim.writeInt(val, self._rd)
+
     def setEnable_asMonitor(self, en, sim):
         super(RdSyncedAgent, self).setEnable_asMonitor(en, sim)
         if not en:
-            self.wrRd(sim.write, 0)
+            self.wrRdInt(sim, 0)
 
     def monitor(self, sim):
         """Collect data from interface"""
         if self.notReset(sim) and self._enabled:
-            self.wrRd(sim.write, 1)
+            self.wrRdInt(sim, 1)
 
             yield sim.waitOnCombUpdate()
 
             d = self.doRead(sim)
             self.data.append(d)
         else:
-            self.wrRd(sim.write, 0)
+            self.wrRdInt(sim, 0)
 
     def doRead(self, sim):
         """extract data from interface"""
@@ -50,7 +78,6 @@ class RdSyncedAgent(SyncAgentBase):
 
     def driver(self, sim):
         """Push data to interface"""
-        r = sim.read
         if self.actualData is NOP and self.data:
             self.actualData = self.data.popleft()
 
@@ -67,13 +94,13 @@ class RdSyncedAgent(SyncAgentBase):
 
         yield sim.waitOnCombUpdate()
 
-        rd = self.isRd(r)
+        rd = self.isRdInt(sim)
         if en:
-            assert rd.vldMask, (
+            assert rd is not None, (
                 ("%r: ready signal for interface %r is in invalid state,"
                  " this would cause desynchronization") %
                 (sim.now, self.intf))
-        if rd.val:
+        if rd:
             if self._debugOutput is not None:
                 self._debugOutput.write("%s, wrote, %d: %r\n" % (
                                            self.intf._getFullName(),
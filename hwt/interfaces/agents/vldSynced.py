@@ -2,6 +2,8 @@ from collections import deque
 
 from hwt.hdl.constants import NOP
 from hwt.simulator.agentBase import SyncAgentBase
+from hwt.simulator.agentConnector import valToBit
+from hwt.simulator.shortcuts import IDLE_FOREVER
 
 
 class VldSyncedAgent(SyncAgentBase):
@@ -10,6 +12,16 @@ class VldSyncedAgent(SyncAgentBase):
         super(VldSyncedAgent, self).__init__(intf,
                                              allowNoReset=allowNoReset)
         self.data = deque()
+        # callback function(sim) called after data was read by monitor
+        self._afterRead = None
+
+        # subclasses may override only hooks which work with Value instances
+        self._bindValueHook(
+            VldSyncedAgent, "doReadVld", "doReadVldInt",
+            lambda sim: valToBit(self.doReadVld(sim.read)))
+        self._bindValueHook(
+            VldSyncedAgent, "doWriteVld", "doWriteVldInt",
+            lambda sim, val: self.doWriteVld(sim.write, val))
 
     def doRead(self, s):
         return s.read(self.intf.data)
@@ -18,27 +30,67 @@ class VldSyncedAgent(SyncAgentBase):
         s.write(data, self.intf.data)
 
     def doReadVld(self, readFn):
+        """
+        :param readFn: sim.read
+        :note: agent uses :meth:`~.doReadVldInt`, which calls this method
+            if it is overridden
+        """
         return readFn(self.intf.vld)
 
+    def doReadVldInt(self, sim):
+        """
+        Same as :meth:`~.doReadVld` but value is read by sim.readInt
+
+        :return: 1/0 or None if value is invalid
+        """
+        return sim.readInt(self.intf.vld)
+
     def doWriteVld(self, writeFn, val):
         return writeFn(val, self.intf.vld)
 
+    def doWriteVldInt(self, sim, val):
+        """
+        Same as :meth:`~.doWriteVld` but value is written by sim.writeInt
+        """
+        sim.writeInt(val, self.intf.vld)
+
     def setEnable_asDriver(self, en, sim):
         super(VldSyncedAgent, self).setEnable_asDriver(en, sim)
         if not en:
-            self.wrVld(sim.write, 0)
-            self._lastVld = 0
+            self.doWriteVldInt(sim, 0)
+
+    def monitorIdleUntil(self, sim):
+        """
+        Monitor is idle if there is no valid data on interface
+        """
+        if self.notReset(sim):
+            vld = self.doReadVldInt(sim)
+            if vld is None or vld:
+                return None
+        return IDLE_FOREVER
+
+    def driverIdleUntil(self, sim):
+        """
+        Driver is idle until its queue is refilled if it does not have
+        any data and interface is already in idle state
+        """
+        if self.data:
+            return None
+        vld = self.doReadVldInt(sim)
+        if vld is None or vld or sim.read(self.intf.data).vldMask:
+            return None
+        return IDLE_FOREVER
 
     def monitor(self, sim):
         yield sim.waitOnCombUpdate()
         if self.notReset(sim):
             intf = self.intf
-            vld = self.doReadVld(sim.read)
-            assert vld.vldMask, (
+            vld = self.doReadVldInt(sim)
+            assert vld is not None, (
                 ("valid signal for interface %r is in invalid state,"
                  " this would cause desynchronization in %d") % 
                 (intf, sim.now))
-            if vld.val:
+            if vld:
                 d = self.doRead(sim)
 
                 if self._debugOutput is not None:
@@ -46,21 +98,23 @@ class VldSyncedAgent(SyncAgentBase):
                         intf._getFullName(),
                         sim.now, d))
                 self.data.append(d)
+                if self._afterRead is not None:
+                    self._afterRead(sim)
 
     def driver(self, sim):
         if self.data and self.notReset(sim):
             d = self.data.popleft()
             if d is NOP:
                 self.doWrite(sim, None)
-                self.doWriteVld(sim.write, 0)
+                self.doWriteVldInt(sim, 0)
             else:
                 self.doWrite(sim, d)
-                self.doWriteVld(sim.write, 1)
+                self.doWriteVldInt(sim, 1)
                 if self._debugOutput is not None:
                     self._debugOutput.write("%s, wrote, %d: %r\n" % (
                         self.intf._getFullName(),
-                        sim.now, self.actualData))
+                        sim.now, d))
 
         else:
             self.doWrite(sim, None)
-            self.doWriteVld(sim.write, 0)
+            self.doWriteVldInt(sim, 0)
@@ -0,0 +1,329 @@
+from hwt.bitmask import mask
+from hwt.hdl.assignment import Assignment
+from hwt.hdl.ifContainter import IfContainer
+from hwt.hdl.operator import Operator
+from hwt.hdl.operatorDefs import AllOps
+from hwt.hdl.process import HWProcess
+from hwt.hdl.switchContainer import SwitchContainer
+from hwt.hdl.types.bits import Bits
+from hwt.hdl.types.bool import HBool
+from hwt.hdl.types.defs import SLICE
+from hwt.hdl.types.integer import Integer
+from hwt.hdl.value import Value
+from hwt.serializer.generic.context import SerializerCtx
+from hwt.serializer.generic.indent import getIndent
+from hwt.serializer.simModel.serializer import SimModelSerializer, env
+from hwt.synthesizer.param import Param, evalParam
+from hwt.synthesizer.rtlLevel.mainBases import RtlSignalBase
+
+
+processIntTmpl = env.get_template('processInt.py.template')
+
+
+class IntSerializationNotSupported(Exception):
+    """
+    Process contains construct which can not be evaluated
+    on plain python integers
+    """
+    pass
+
+
+class SimModelIntSerializer(SimModelSerializer):
+    """
+    Serializer which converts Unit instances to simulator code
+    where expressions are evaluated on plain python integers
+
+    Each process has two bodies, the fast path is used if all input signals
+    of the process are fully valid and it computes on values of the inputs
+    directly (masks and widths are resolved during serialization),
+    the other one is the Value based code from :class:`.SimModelSerializer`
+    which properly propagates invalid bits.
+
+    Processes with constructs which are not supported on integer level
+    (signed arithmetic, enums, arrays, indexing by signal, ...)
+    are serialized by :class:`.SimModelSerializer` only.
+    """
+
+    _intBinOps = {
+        AllOps.AND: "(%s & %s)",
+        AllOps.OR: "(%s | %s)",
+        AllOps.XOR: "(%s ^ %s)",
+        AllOps.EQ: "(%s == %s)",
+        AllOps.NEQ: "(%s != %s)",
+        AllOps.GT: "(%s > %s)",
+        AllOps.GE: "(%s >= %s)",
+        AllOps.LT: "(%s < %s)",
+        AllOps.LE: "(%s <= %s)",
+    }
+    _intArithOps = {
+        AllOps.ADD: "((%s + %s) & %d)",
+        AllOps.SUB: "((%s - %s) & %d)",
+    }
+
+    @classmethod
+    def _isIntType(cls, t):
+        return isinstance(t, HBool) or (
+            isinstance(t, Bits) and not t.signed)
+
+    @classmethod
+    def _intConstVal(cls, obj):
+        """
+        :return: Value if obj is constant else None
+        """
+        if isinstance(obj, Value):
+            return obj
+        elif isinstance(obj, Param):
+            return evalParam(obj)
+        elif isinstance(obj, RtlSignalBase) and obj._const:
+            return obj._val
+        else:
+            return None
+
+    @classmethod
+    def _intConst(cls, val: Value):
+        t = val._dtype
+        if (isinstance(t, Integer) or cls._isIntType(t))\
+                and val._isFullVld():
+            if isinstance(t, HBool):
+                return repr(bool(val.val))
+            else:
+                return "%d" % val.val
+        raise IntSerializationNotSupported(val)
+
+    @classmethod
+    def _intInput(cls, sig, ctx: SerializerCtx):
+        """
+        :return: index of input signal of currently serialized process
+        """
+        inputs = ctx.intInputs
+        try:
+            return inputs[sig]
+        except KeyError:
+            pass
+
+        if not cls._isIntType(sig._dtype):
+            raise IntSerializationNotSupported(sig)
+
+        i = len(inputs)
+        inputs[sig] = i
+        return i
+
+    @classmethod
+    def intExpr(cls, obj, ctx: SerializerCtx):
+        """
+        Convert expression to python code which evaluates it on ints
+        """
+        c = cls._intConstVal(obj)
+        if c is not None:
+            return cls._intConst(c)
+
+        if isinstance(obj, Operator):
+            return cls.intOperator(obj, ctx)
+        elif obj.hidden and hasattr(obj, "origin"):
+            return cls.intExpr(obj.origin, ctx)
+        else:
+            i = cls._intInput(obj, ctx)
+            ctx.intValUsed.add(i)
+            return "v%d" % i
+
+    @classmethod
+    def intOperator(cls, op: Operator, ctx: SerializerCtx):
+        ops = op.operands
+        o = op.operator
+
+        op_str = cls._intBinOps.get(o, None)
+        if op_str is not None:
+            return op_str % (cls.intExpr(ops[0], ctx),
+                             cls.intExpr(ops[1], ctx))
+
+        op_str = cls._intArithOps.get(o, None)
+        if op_str is not None:
+            t = ops[0]._dtype
+            if not cls._isIntType(t):
+                raise IntSerializationNotSupported(op)
+            return op_str % (cls.intExpr(ops[0], ctx),
+                             cls.intExpr(ops[1], ctx),
+                             mask(t.bit_length()))
+
+        if o == AllOps.NOT:
+            t = ops[0]._dtype
+            a = cls.intExpr(ops[0], ctx)
+            if isinstance(t, HBool):
+                return "(not %s)" % a
+            else:
+                return "(%s ^ %d)" % (a, mask(t.bit_length()))
+        elif o == AllOps.CONCAT:
+            return "((%s << %d) | %s)" % (cls.intExpr(ops[0], ctx),
+                                          ops[1]._dtype.bit_length(),
+                                          cls.intExpr(ops[1], ctx))
+        elif o == AllOps.INDEX:
+            if not isinstance(ops[0]._dtype, Bits):
+                raise IntSerializationNotSupported(op)
+            index = cls._intConstVal(ops[1])
+            if index is None or not index._isFullVld():
+                raise IntSerializationNotSupported(op)
+
+            a = cls.intExpr(ops[0], ctx)
+            if index._dtype == SLICE:
+                upper = evalParam(index.val[0]).val
+                lower = evalParam(index.val[1]).val
+                m = mask(upper - lower)
+            else:
+                lower = index.val
+                m = 1
+
+            if lower == 0:
+                return "(%s & %d)" % (a, m)
+            else:
+                return "((%s >> %d) & %d)" % (a, lower, m)
+        elif o == AllOps.TERNARY:
+            cond, ifTrue, ifFalse = map(lambda x: cls.intExpr(x, ctx), ops)
+            return "(%s if %s else %s)" % (ifTrue, cond, ifFalse)
+        elif o in (AllOps.BitsAsUnsigned, AllOps.BitsAsVec):
+            # operand is always unsigned or vector, value does not change
+            return cls.intExpr(ops[0], ctx)
+        elif o in (AllOps.RISING_EDGE, AllOps.FALLING_EDGE):
+            s = ops[0]
+            if not cls._isSignalRef(s):
+                raise IntSerializationNotSupported(op)
+            i = cls._intInput(s, ctx)
+            ctx.intValUsed.add(i)
+            if o == AllOps.RISING_EDGE:
+                v = "v%d != 0"
+            else:
+                v = "v%d == 0"
+            return ("(s%d.updateTime == sim.now and " + v + ")") % (i, i)
+        else:
+            raise IntSerializationNotSupported(op)
+
+    @classmethod
+    def intStm(cls, stm, ctx: SerializerCtx):
+        if isinstance(stm, Assignment):
+            return cls.intAssignment(stm, ctx)
+        elif isinstance(stm, IfContainer):
+            return cls.intIfContainer(stm, ctx)
+        elif isinstance(stm, SwitchContainer):
+            return cls.intSwitchContainer(stm, ctx)
+        else:
+            raise IntSerializationNotSupported(stm)
+
+    @classmethod
+    def _intStms(cls, stms, ctx: SerializerCtx):
+        if not stms:
+            return getIndent(ctx.indent) + "pass"
+        return "\n".join([cls.intStm(stm, ctx) for stm in stms])
+
+    @classmethod
+    def intAssignment(cls, a: Assignment, ctx: SerializerCtx):
+        dst = a.dst
+        src = a.src
+        dstT = dst._dtype
+        if a.indexes is not None or not (dstT == src._dtype):
+            raise IntSerializationNotSupported(a)
+
+        dstSlot = ctx.outputSlots[dst]
+        c = cls._intConstVal(src)
+        if c is not None:
+            # use cached constant value
+            srcStr = cls.Value(c, ctx)
+        elif cls._isSignalRef(src):
+            # copy of signal, value object of input can be used directly
+            srcStr = "s%d" % cls._intInput(src, ctx)
+        elif isinstance(dstT, HBool):
+            srcStr = "HBoolVal(%s, BOOL, 1)" % cls.intExpr(src, ctx)
+        elif cls._isIntType(dstT):
+            srcStr = "BitsVal(%s, self.%s._dtype, %d)" % (
+                cls.intExpr(src, ctx), dst.name, mask(dstT.bit_length()))
+        else:
+            raise IntSerializationNotSupported(a)
+
+        return "%sio[%d] = (%s, %s)" % (
+            getIndent(ctx.indent), dstSlot, srcStr,
+            a._is_completly_event_dependent)
+
+    @classmethod
+    def intIfContainer(cls, ifc: IfContainer, ctx: SerializerCtx):
+        indent = getIndent(ctx.indent)
+        childCtx = ctx.withIndent()
+        buff = ["%sif %s:" % (indent, cls.intExpr(ifc.cond, ctx)),
+                cls._intStms(ifc.ifTrue, childCtx)]
+        for c, stms in ifc.elIfs:
+            buff.append("%selif %s:" % (indent, cls.intExpr(c, ctx)))
+            buff.append(cls._intStms(stms, childCtx))
+
+        if ifc.ifFalse:
+            buff.append("%selse:" % indent)
+            buff.append(cls._intStms(ifc.ifFalse, childCtx))
+
+        return "\n".join(buff)
+
+    @classmethod
+    def intSwitchContainer(cls, sw: SwitchContainer, ctx: SerializerCtx):
+        indent = getIndent(ctx.indent)
+        childCtx = ctx.withIndent()
+        buff = []
+        switchOn = cls.intExpr(sw.switchOn, ctx)
+        if not cls._isSignalRef(sw.switchOn):
+            # evaluate expression only once
+            tmp = "t%d" % ctx.intTmpCnt[0]
+            ctx.intTmpCnt[0] += 1
+            buff.append("%s%s = %s" % (indent, tmp, switchOn))
+            switchOn = tmp
+
+        for i, (key, stms) in enumerate(sw.cases):
+            buff.append("%s%s %s == %s:" % (
+                indent,
+                "if" if i == 0 else "elif",
+                switchOn,
+                cls._intConst(key)))
+            buff.append(cls._intStms(stms, childCtx))
+
+        if sw.default:
+            buff.append("%selse:" % indent)
+            buff.append(cls._intStms(sw.default, childCtx))
+
+        return "\n".join(buff)
+
+    @classmethod
+    def HWProcess(cls, proc: HWProcess, ctx: SerializerCtx):
+        body = proc.statements
+        try:
+            fastCtx = ctx.withIndent(3)
+            fastCtx.outputSlots = {o: i for i, o in enumerate(proc.outputs)}
+            # {input signal: index}
+            fastCtx.intInputs = {}
+            # indexes of inputs which are used as int
+            fastCtx.intValUsed = set()
+            fastCtx.intTmpCnt = [0, ]
+            fastBody = cls._intStms(body, fastCtx)
+            if not fastCtx.intValUsed:
+                # process only copies values, there is nothing to speed up
+                raise IntSerializationNotSupported(proc)
+        except IntSerializationNotSupported:
+            return super(SimModelIntSerializer, cls).HWProcess(proc, ctx)
+
+        proc.name = ctx.scope.checkedName(proc.name, proc)
+        sensitivityList = sorted(
+            map(cls.sensitivityListItem, proc.sensitivityList))
+
+        inputs = sorted(fastCtx.intInputs.items(), key=lambda x: x[1])
+        fastCond = " and ".join([
+            "s%d.vldMask == %d" % (i, mask(s._dtype.bit_length()))
+            for s, i in inputs])
+        if not fastCond:
+            fastCond = "True"
+
+        slowCtx = fastCtx.withIndent(0)
+        slowBody = "\n".join([
+            cls.stmAsHdl(stm, slowCtx)
+            for stm in body])
+
+        return processIntTmpl.render(
+            name=proc.name,
+            sensitivityList=sensitivityList,
+            inputs=[("s%d" % i, s.name) for s, i in inputs],
+            intValUsed=sorted(fastCtx.intValUsed),
+            fastCond=fastCond,
+            fastBody=fastBody,
+            slowBody=slowBody,
+        )
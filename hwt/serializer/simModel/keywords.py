@@ -25,13 +25,13 @@ SIMMODEL_KEYWORDS = keyword.kwlist + [
     'SIM_INT',
     'simBitsT',
     'SIM_BIT',
+    'simHArray',
+    'SimArrayVal',
     'convertSimBits__val',
     'SimModel',
     'sensitivity',
     'connectSimPort',
     'simEvalCond',
-    'mkUpdater',
-    'mkArrayUpdater'
     'power'
     'RtlNetlist'
     'SimSignal'
@@ -0,0 +1,577 @@
+from hwt.bitmask import mask
+from hwt.hdl.assignment import Assignment
+from hwt.hdl.ifContainter import IfContainer
+from hwt.hdl.operator import Operator
+from hwt.hdl.operatorDefs import AllOps
+from hwt.hdl.process import HWProcess
+from hwt.hdl.switchContainer import SwitchContainer
+from hwt.hdl.types.bits import Bits
+from hwt.hdl.types.bool import HBool
+from hwt.hdl.types.defs import SLICE
+from hwt.hdl.types.integer import Integer
+from hwt.serializer.exceptions import SerializerException
+from hwt.serializer.generic.context import SerializerCtx
+from hwt.serializer.generic.indent import getIndent
+from hwt.serializer.simModel.intSerializer import SimModelIntSerializer, \
+    IntSerializationNotSupported
+from hwt.serializer.simModel.serializer import env
+from hwt.synthesizer.param import evalParam
+
+
+processLaneTmpl = env.get_template('processLane.py.template')
+
+
+class SimModelLaneSerializer(SimModelIntSerializer):
+    """
+    Serializer which converts Unit instances to simulator code
+    where each signal holds values of multiple independent lanes
+    (instances of the unit) and a single evaluation of process
+    updates all lanes
+
+    Values of all lanes are packed in a single python int, each lane
+    occupies a slot of width of the widest expression in the model
+    + 1 guard bit. Lanes are evaluated by bitwise tricks on this int
+    (there is no branching on lane values) and validity is tracked
+    per lane (lane is valid only if all its bits are valid).
+    Number of lanes and width of the lane slot are resolved when model
+    is instantiated, see :func:`hwt.simulator.laneSimModel.initLaneSimModel`.
+
+    Signals used in edge operators (clock) are common for all lanes
+    and they are not packed.
+
+    :attention: there is no Value based fallback, signed arithmetic,
+        arrays, enums, indexing by signal, ... raise SerializerException
+    """
+    _laneBinOps = {
+        AllOps.AND: "(%s & %s)",
+        AllOps.OR: "(%s | %s)",
+        AllOps.XOR: "(%s ^ %s)",
+    }
+
+    @classmethod
+    def _laneWidth(cls, t, ctx: SerializerCtx) -> int:
+        """
+        :return: width of type in lane slot
+        """
+        if not cls._isIntType(t):
+            raise IntSerializationNotSupported(t)
+        w = t.bit_length()
+        if w > ctx.laneWidth[0]:
+            ctx.laneWidth[0] = w
+        return w
+
+    @classmethod
+    def _laneConst(cls, v: int, ctx: SerializerCtx) -> str:
+        """
+        :return: name of local variable with constant replicated to all lanes
+        """
+        if v == 0:
+            return "0"
+        elif v == 1:
+            return "L"
+        consts = ctx.laneConsts
+        try:
+            return consts[v]
+        except KeyError:
+            name = "c%d" % len(consts)
+            consts[v] = name
+            return name
+
+    @classmethod
+    def _laneTmp(cls, expr: str, ctx: SerializerCtx, prefix="t") -> str:
+        """
+        Store value of expression in temporary variable
+        (line is emitted before currently serialized statement)
+        """
+        name = "%s%d" % (prefix, ctx.laneTmpCnt[0])
+        ctx.laneTmpCnt[0] += 1
+        ctx.lanePre.append("%s = %s" % (name, expr))
+        return name
+
+    @classmethod
+    def _laneFlush(cls, ctx: SerializerCtx):
+        """
+        :return: lines with temporary variables for current statement
+        """
+        indent = getIndent(ctx.indent)
+        lines = [indent + line for line in ctx.lanePre]
+        ctx.lanePre.clear()
+        return lines
+
+    @staticmethod
+    def _laneVld(vld):
+        """
+        :param vld: set of names of lane validity masks
+        :return: expression of lanes where all items of vld are valid
+            or None if all lanes are always valid
+        """
+        if not vld:
+            return None
+        return "(%s)" % " & ".join(sorted(vld))
+
+    @staticmethod
+    def _laneEdgeOp(cond):
+        """
+        :return: edge operator if cond is a edge of a signal else None
+        """
+        while not isinstance(cond, Operator):
+            if getattr(cond, "hidden", False) and hasattr(cond, "origin"):
+                cond = cond.origin
+            else:
+                return None
+
+        if cond.operator in (AllOps.RISING_EDGE, AllOps.FALLING_EDGE):
+            return cond
+        return None
+
+    @classmethod
+    def _laneHasScalarCond(cls, stms):
+        for stm in stms:
+            if isinstance(stm, IfContainer):
+                if cls._laneEdgeOp(stm.cond) is not None:
+                    return True
+                for c, _stms in stm.elIfs:
+                    if cls._laneEdgeOp(c) is not None:
+                        return True
+                branches = [stm.ifTrue, stm.ifFalse or []]
+                branches.extend(_stms for _, _stms in stm.elIfs)
+            elif isinstance(stm, SwitchContainer):
+                branches = [_stms for _, _stms in stm.cases]
+                branches.append(stm.default or [])
+            else:
+                continue
+
+            for b in branches:
+                if cls._laneHasScalarCond(b):
+                    return True
+
+        return False
+
+    @classmethod
+    def _laneScalarCond(cls, cond, ctx: SerializerCtx):
+        """
+        :return: python expression of condition which is same for all lanes
+            (edge of clock signal) or None if condition is evaluated per lane
+        """
+        op = cls._laneEdgeOp(cond)
+        if op is None:
+            return None
+
+        s = op.operands[0]
+        if not cls._isSignalRef(s):
+            raise IntSerializationNotSupported(op)
+        i = cls._intInput(s, ctx)
+        if op.operator == AllOps.RISING_EDGE:
+            v = "s%d.val != 0"
+        else:
+            v = "s%d.val == 0"
+        return ("(s%d.updateTime == sim.now and " + v + ")") % (i, i)
+
+    @classmethod
+    def laneExpr(cls, obj, ctx: SerializerCtx, width=None):
+        """
+        Convert expression to python code which evaluates it on packed lanes
+
+        :param width: width of result, required for integer constants
+        :return: tuple (value expression, set of names of lane validity masks)
+        """
+        c = cls._intConstVal(obj)
+        if c is not None:
+            t = c._dtype
+            if not c.vldMask:
+                return "0", frozenset(["0"])
+            elif not c._isFullVld():
+                raise IntSerializationNotSupported(c)
+            elif isinstance(t, Integer):
+                if width is None:
+                    raise IntSerializationNotSupported(c)
+                v = int(c.val) & mask(width)
+            else:
+                cls._laneWidth(t, ctx)
+                v = int(c.val)
+            return cls._laneConst(v, ctx), frozenset()
+
+        if isinstance(obj, Operator):
+            return cls.laneOperator(obj, ctx)
+        elif obj.hidden and hasattr(obj, "origin"):
+            return cls.laneExpr(obj.origin, ctx, width)
+        else:
+            cls._laneWidth(obj._dtype, ctx)
+            i = cls._intInput(obj, ctx)
+            ctx.intValUsed.add(i)
+            ctx.laneVldUsed.add(i)
+            return "v%d" % i, frozenset(["u%d" % i])
+
+    @classmethod
+    def _laneOperandsWidth(cls, ops, ctx: SerializerCtx):
+        for o in ops:
+            if not isinstance(o._dtype, Integer):
+                return cls._laneWidth(o._dtype, ctx)
+        raise IntSerializationNotSupported(ops)
+
+    @classmethod
+    def _laneGe(cls, a: str, b: str, w: int, ctx: SerializerCtx):
+        """
+        :return: lanes where a >= b (guard bit is not borrowed by subtraction)
+        """
+        g = cls._laneConst(1 << w, ctx)
+        return "((((%s | %s) - %s) >> %d) & L)" % (a, g, b, w)
+
+    @classmethod
+    def _laneNe(cls, a: str, b: str, w: int, ctx: SerializerCtx):
+        """
+        :return: lanes where a != b (non zero lane carries to guard bit)
+        """
+        m = cls._laneConst(mask(w), ctx)
+        return "((((%s ^ %s) + %s) >> %d) & L)" % (a, b, m, w)
+
+    @classmethod
+    def laneOperator(cls, op: Operator, ctx: SerializerCtx):
+        ops = op.operands
+        o = op.operator
+        resW = cls._laneWidth(op.result._dtype, ctx)
+
+        op_str = cls._laneBinOps.get(o, None)
+        if op_str is not None:
+            a, aVld = cls.laneExpr(ops[0], ctx, resW)
+            b, bVld = cls.laneExpr(ops[1], ctx, resW)
+            return op_str % (a, b), aVld | bVld
+
+        if o in (AllOps.EQ, AllOps.NEQ, AllOps.LT, AllOps.LE,
+                 AllOps.GT, AllOps.GE):
+            w = cls._laneOperandsWidth(ops, ctx)
+            a, aVld = cls.laneExpr(ops[0], ctx, w)
+            b, bVld = cls.laneExpr(ops[1], ctx, w)
+            if o == AllOps.EQ:
+                res = "(%s ^ L)" % cls._laneNe(a, b, w, ctx)
+            elif o == AllOps.NEQ:
+                res = cls._laneNe(a, b, w, ctx)
+            elif o == AllOps.GE:
+                res = cls._laneGe(a, b, w, ctx)
+            elif o == AllOps.LT:
+                res = "(%s ^ L)" % cls._laneGe(a, b, w, ctx)
+            elif o == AllOps.LE:
+                res = cls._laneGe(b, a, w, ctx)
+            else:
+                res = "(%s ^ L)" % cls._laneGe(b, a, w, ctx)
+            return res, aVld | bVld
+        elif o in (AllOps.ADD, AllOps.SUB):
+            a, aVld = cls.laneExpr(ops[0], ctx, resW)
+            b, bVld = cls.laneExpr(ops[1], ctx, resW)
+            m = cls._laneConst(mask(resW), ctx)
+            if o == AllOps.ADD:
+                res = "((%s + %s) & %s)" % (a, b, m)
+            else:
+                g = cls._laneConst(1 << resW, ctx)
+                res = "(((%s | %s) - %s) & %s)" % (a, g, b, m)
+            return res, aVld | bVld
+        elif o == AllOps.NOT:
+            a, aVld = cls.laneExpr(ops[0], ctx, resW)
+            return "(%s ^ %s)" % (a, cls._laneConst(mask(resW), ctx)), aVld
+        elif o == AllOps.CONCAT:
+            wb = cls._laneWidth(ops[1]._dtype, ctx)
+            a, aVld = cls.laneExpr(ops[0], ctx)
+            b, bVld = cls.laneExpr(ops[1], ctx)
+            return "((%s << %d) | %s)" % (a, wb, b), aVld | bVld
+        elif o == AllOps.INDEX:
+            if not isinstance(ops[0]._dtype, Bits):
+                raise IntSerializationNotSupported(op)
+            index = cls._intConstVal(ops[1])
+            if index is None or not index._isFullVld():
+                raise IntSerializationNotSupported(op)
+
+            a, aVld = cls.laneExpr(ops[0], ctx)
+            if index._dtype == SLICE:
+                upper = evalParam(index.val[0]).val
+                lower = evalParam(index.val[1]).val
+                m = mask(upper - lower)
+            else:
+                lower = index.val
+                m = 1
+
+            m = cls._laneConst(m, ctx)
+            if lower == 0:
+                return "(%s & %s)" % (a, m), aVld
+            else:
+                return "((%s >> %d) & %s)" % (a, lower, m), aVld
+        elif o == AllOps.TERNARY:
+            c, cVld = cls.laneExpr(ops[0], ctx)
+            a, aVld = cls.laneExpr(ops[1], ctx, resW)
+            b, bVld = cls.laneExpr(ops[2], ctx, resW)
+            # operands are used twice
+            a = cls._laneTmp(a, ctx)
+            b = cls._laneTmp(b, ctx)
+            return ("(%s ^ ((%s ^ %s) & (%s * %d)))" % (
+                    b, a, b, c, mask(resW)),
+                    cVld | aVld | bVld)
+        elif o in (AllOps.BitsAsUnsigned, AllOps.BitsAsVec):
+            # operand is always unsigned or vector, value does not change
+            return cls.laneExpr(ops[0], ctx, resW)
+        else:
+            raise IntSerializationNotSupported(op)
+
+    @classmethod
+    def _laneStms(cls, stms, ctx: SerializerCtx, m):
+        lines = []
+        for stm in stms:
+            if isinstance(stm, Assignment):
+                lines.extend(cls.laneAssignment(stm, ctx, m))
+            elif isinstance(stm, IfContainer):
+                lines.extend(cls.laneIfContainer(stm, ctx, m))
+            elif isinstance(stm, SwitchContainer):
+                lines.extend(cls.laneSwitchContainer(stm, ctx, m))
+            else:
+                raise IntSerializationNotSupported(stm)
+        return lines
+
+    @classmethod
+    def _laneSetEv(cls, slot: int, ev: bool, ctx: SerializerCtx):
+        if ctx.laneEv.setdefault(slot, ev) != ev:
+            raise IntSerializationNotSupported(slot)
+
+    @classmethod
+    def laneAssignment(cls, a: Assignment, ctx: SerializerCtx, m):
+        """
+        :param m: name of variable with mask of lanes where statement
+            is active or None if it is active in all lanes
+        """
+        dst = a.dst
+        if a.indexes is not None:
+            raise IntSerializationNotSupported(a)
+        w = cls._laneWidth(dst._dtype, ctx)
+        if cls._laneWidth(a.src._dtype, ctx) != w:
+            raise IntSerializationNotSupported(a)
+
+        val, vld = cls.laneExpr(a.src, ctx, w)
+        vld = cls._laneVld(vld)
+        j = ctx.outputSlots[dst]
+        cls._laneSetEv(j, a._is_completly_event_dependent, ctx)
+
+        indent = getIndent(ctx.indent)
+        lines = cls._laneFlush(ctx)
+        if m is None:
+            lines.append("%so%d = %s" % (indent, j, val))
+            lines.append("%sou%d = %s" % (indent, j,
+                                          "L" if vld is None else vld))
+        else:
+            ctx.laneMerged.add(j)
+            lines.append("%so%d ^= (o%d ^ %s) & (%s * %d)" % (
+                indent, j, j, val, m, mask(w)))
+            if vld is None:
+                lines.append("%sou%d |= %s" % (indent, j, m))
+            else:
+                lines.append("%sou%d ^= (ou%d ^ %s) & %s" % (
+                    indent, j, j, vld, m))
+
+        if ctx.laneScalar:
+            lines.append("%sw%d = True" % (indent, j))
+
+        return lines
+
+    @classmethod
+    def _laneInvalidate(cls, stm, m: str, ctx: SerializerCtx):
+        """
+        Invalidate outputs of statement in lanes specified by mask m
+        """
+        indent = getIndent(ctx.indent)
+        lines = []
+        for o in stm._outputs:
+            j = ctx.outputSlots[o]
+            cls._laneSetEv(j, stm._is_completly_event_dependent, ctx)
+            ctx.laneMerged.add(j)
+            lines.append("%sou%d &= ~%s" % (indent, j, m))
+            if ctx.laneScalar:
+                lines.append("%sw%d = True" % (indent, j))
+        return lines
+
+    @classmethod
+    def _laneBranch(cls, stms, m: str, ctx: SerializerCtx):
+        """
+        Serialize statements which are active only in lanes specified by m
+        """
+        if not stms:
+            return []
+        body = cls._laneStms(stms, ctx.withIndent(), m)
+        # skip evaluation if no lane is active
+        return ["%sif %s:" % (getIndent(ctx.indent), m)] + body
+
+    @classmethod
+    def _laneValidMask(cls, vld, m, stm, ctx: SerializerCtx):
+        """
+        Resolve lanes where condition is valid and invalidate outputs
+        of statement in lanes where it is not
+
+        :return: tuple (lines, name of mask of lanes where condition is valid)
+        """
+        base = "L" if m is None else m
+        if vld is None:
+            return [], base
+
+        indent = getIndent(ctx.indent)
+        vm = cls._laneTmp("%s & %s" % (base, vld), ctx, "m")
+        inv = cls._laneTmp("%s ^ %s" % (base, vm), ctx, "m")
+        lines = cls._laneFlush(ctx)
+        lines.append("%sif %s:" % (indent, inv))
+        lines.extend(cls._laneInvalidate(stm, inv, ctx.withIndent()))
+        return lines, vm
+
+    @classmethod
+    def laneIfContainer(cls, ifc: IfContainer, ctx: SerializerCtx, m):
+        indent = getIndent(ctx.indent)
+        cond = cls._laneScalarCond(ifc.cond, ctx)
+        if cond is not None:
+            # condition common for all lanes (clock edge)
+            childCtx = ctx.withIndent()
+            lines = ["%sif %s:" % (indent, cond)]
+            lines.extend(cls._laneStms(ifc.ifTrue, childCtx, m)
+                         or [getIndent(childCtx.indent) + "pass"])
+            for c, stms in ifc.elIfs:
+                cond = cls._laneScalarCond(c, ctx)
+                if cond is None:
+                    raise IntSerializationNotSupported(ifc)
+                lines.append("%selif %s:" % (indent, cond))
+                lines.extend(cls._laneStms(stms, childCtx, m)
+                             or [getIndent(childCtx.indent) + "pass"])
+            if ifc.ifFalse:
+                lines.append("%selse:" % indent)
+                lines.extend(cls._laneStms(ifc.ifFalse, childCtx, m))
+            return lines
+
+        lines = []
+        rest = m
+        for c, stms in [(ifc.cond, ifc.ifTrue)] + list(ifc.elIfs):
+            if cls._laneWidth(c._dtype, ctx) != 1:
+                raise IntSerializationNotSupported(c)
+            c, vld = cls.laneExpr(c, ctx)
+            c = cls._laneTmp(c, ctx)
+            _lines, vm = cls._laneValidMask(cls._laneVld(vld), rest, ifc, ctx)
+            lines.extend(_lines)
+            mT = cls._laneTmp("%s & %s" % (c, vm), ctx, "m")
+            rest = cls._laneTmp("%s ^ %s" % (vm, mT), ctx, "m")
+            lines.extend(cls._laneFlush(ctx))
+            lines.extend(cls._laneBranch(stms, mT, ctx))
+
+        lines.extend(cls._laneBranch(ifc.ifFalse, rest, ctx))
+        return lines
+
+    @classmethod
+    def laneSwitchContainer(cls, sw: SwitchContainer, ctx: SerializerCtx, m):
+        w = cls._laneWidth(sw.switchOn._dtype, ctx)
+        switchOn, vld = cls.laneExpr(sw.switchOn, ctx)
+        switchOn = cls._laneTmp(switchOn, ctx)
+        lines, rest = cls._laneValidMask(cls._laneVld(vld), m, sw, ctx)
+        for key, stms in sw.cases:
+            if not key._isFullVld():
+                raise IntSerializationNotSupported(key)
+            k = cls._laneConst(int(key.val) & mask(w), ctx)
+            eq = "(%s ^ L)" % cls._laneNe(switchOn, k, w, ctx)
+            mCase = cls._laneTmp("%s & %s" % (eq, rest), ctx, "m")
+            rest = cls._laneTmp("%s ^ %s" % (rest, mCase), ctx, "m")
+            lines.extend(cls._laneFlush(ctx))
+            lines.extend(cls._laneBranch(stms, mCase, ctx))
+
+        lines.extend(cls._laneBranch(sw.default, rest, ctx))
+        return lines
+
+    @classmethod
+    def _laneInputVld(cls, sig, i: int, ctx: SerializerCtx) -> str:
+        """
+        :return: expression of lanes where input is fully valid
+        """
+        w = sig._dtype.bit_length()
+        if w == 1:
+            return "s%d.vldMask" % i
+        m = cls._laneConst(mask(w), ctx)
+        return "L ^ ((((s%d.vldMask ^ %s) + %s) >> %d) & L)" % (i, m, m, w)
+
+    @classmethod
+    def HWProcess(cls, proc: HWProcess, ctx: SerializerCtx):
+        if cls._isCopyProcess(proc):
+            # value of signal is copied as it is (with all lanes)
+            return super(SimModelIntSerializer, cls).HWProcess(proc, ctx)
+
+        outputs = proc.outputs
+        bodyCtx = ctx.withIndent(2)
+        bodyCtx.outputSlots = {o: i for i, o in enumerate(outputs)}
+        # {input signal: index}
+        bodyCtx.intInputs = {}
+        # indexes of inputs which values/lane validity masks are used
+        bodyCtx.intValUsed = set()
+        bodyCtx.laneVldUsed = set()
+        # {constant: name of variable with constant replicated to all lanes}
+        bodyCtx.laneConsts = {}
+        bodyCtx.laneTmpCnt = [0, ]
+        bodyCtx.lanePre = []
+        bodyCtx.laneWidth = [1, ]
+        # indexes of outputs which are merged with its previous value
+        bodyCtx.laneMerged = set()
+        # {index of output: is event dependent}
+        bodyCtx.laneEv = {}
+        # outputs are written only if statement was executed
+        # if there is a condition common for all lanes
+        bodyCtx.laneScalar = cls._laneHasScalarCond(proc.statements)
+        try:
+            body = cls._laneStms(proc.statements, bodyCtx, None)
+            for j, o in enumerate(outputs):
+                cls._laneWidth(o._dtype, bodyCtx)
+                if j not in bodyCtx.laneEv:
+                    bodyCtx.laneMerged.add(j)
+                if j in bodyCtx.laneMerged:
+                    # lanes which are not written keep previous value
+                    i = cls._intInput(o, bodyCtx)
+                    bodyCtx.intValUsed.add(i)
+                    bodyCtx.laneVldUsed.add(i)
+        except IntSerializationNotSupported as e:
+            raise SerializerException(
+                "Process %s can not be serialized for lane simulation"
+                % proc.name, e)
+
+        proc.name = ctx.scope.checkedName(proc.name, proc)
+        sensitivityList = sorted(
+            map(cls.sensitivityListItem, proc.sensitivityList))
+
+        indent = getIndent(bodyCtx.indent)
+        inputs = sorted(bodyCtx.intInputs.items(), key=lambda x: x[1])
+        head = ["%ss%d = self.%s._oldVal" % (indent, i, s.name)
+                for s, i in inputs]
+        vals = ["%sv%d = s%d.val" % (indent, i, i)
+                for i in sorted(bodyCtx.intValUsed)]
+        vals.extend("%su%d = %s" % (indent, i, cls._laneInputVld(s, i, bodyCtx))
+                    for s, i in inputs if i in bodyCtx.laneVldUsed)
+        for v, name in sorted(bodyCtx.laneConsts.items(), key=lambda x: x[1]):
+            head.append("%s%s = L * %d" % (indent, name, v))
+        head.extend(vals)
+
+        for j, o in enumerate(outputs):
+            if j in bodyCtx.laneMerged:
+                i = bodyCtx.intInputs[o]
+                head.append("%so%d = v%d" % (indent, j, i))
+                head.append("%sou%d = u%d" % (indent, j, i))
+            if bodyCtx.laneScalar:
+                head.append("%sw%d = False" % (indent, j))
+
+        tail = []
+        for j, o in enumerate(outputs):
+            t = o._dtype
+            if isinstance(t, HBool):
+                v = "HBoolVal(o%d, BOOL, ou%d)" % (j, j)
+            else:
+                w = t.bit_length()
+                if w == 1:
+                    vld = "ou%d" % j
+                else:
+                    vld = "ou%d * %d" % (j, mask(w))
+                v = "BitsVal(o%d, self.%s._dtype, %s)" % (j, o.name, vld)
+            line = "io[%d] = (%s, %s)" % (j, v, bodyCtx.laneEv.get(j, False))
+            if bodyCtx.laneScalar:
+                tail.append("%sif w%d:" % (indent, j))
+                tail.append("%s    %s" % (indent, line))
+            else:
+                tail.append(indent + line)
+
+        return processLaneTmpl.render(
+            name=proc.name,
+            sensitivityList=sensitivityList,
+            lines=head + body + tail,
+            laneWidth=bodyCtx.laneWidth[0],
+        )
@@ -10,10 +10,14 @@ from hwt.hdl.operator import Operator
 from hwt.hdl.operatorDefs import AllOps, sensitivityByOp
 from hwt.hdl.process import HWProcess
 from hwt.hdl.switchContainer import SwitchContainer
+from hwt.bitmask import mask
 from hwt.hdl.types.bits import Bits
+from hwt.hdl.types.defs import SLICE
 from hwt.hdl.types.enum import HEnum
 from hwt.hdl.types.enumVal import HEnumVal
+from hwt.hdl.types.integer import Integer
 from hwt.hdl.types.typeCast import toHVal
+from hwt.hdl.value import Value
 from hwt.pyUtils.arrayQuery import arr_any
 from hwt.serializer.exceptions import SerializerException
 from hwt.serializer.generic.constCache import ConstCache
@@ -26,7 +30,8 @@ from hwt.serializer.simModel.ops import SimModelSerializer_ops
 from hwt.serializer.simModel.types import SimModelSerializer_types
 from hwt.serializer.simModel.value import SimModelSerializer_value
 from hwt.serializer.utils import maxStmId
-from hwt.synthesizer.param import evalParam
+from hwt.synthesizer.param import Param, evalParam
+from hwt.synthesizer.rtlLevel.mainBases import RtlSignalBase
 
 
 env = Environment(loader=PackageLoader('hwt', 'serializer/simModel/templates'))
@@ -57,6 +62,33 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops,
             raise NotImplementedError("Not implemented for %s" % (repr(obj)))
         return serFn(obj, ctx)
 
+    @classmethod
+    def _isSignalRef(cls, obj):
+        """
+        :return: True if obj is signal which is represented
+            by SimSignal in sim model (not an expression or constant)
+        """
+        return (isinstance(obj, RtlSignalBase)
+                and not isinstance(obj, Param)
+                and not obj._const
+                and not (obj.hidden and hasattr(obj, "origin")))
+
+    @classmethod
+    def _isCopyProcess(cls, proc: HWProcess):
+        """
+        :return: True if process only copies value of signal
+            to other signal of same type (f.e. port-to-port connection)
+        """
+        if len(proc.statements) != 1:
+            return False
+
+        a = proc.statements[0]
+        return (isinstance(a, Assignment)
+                and a.indexes is None
+                and not a._is_completly_event_dependent
+                and cls._isSignalRef(a.src)
+                and a.src._dtype == a.dst._dtype)
+
     @classmethod
     def Architecture(cls, arch: Architecture, ctx: SerializerCtx):
         cls.Entity_prepare(arch.entity, ctx, serialize=False)
@@ -112,22 +144,108 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops,
             processes=procs,
             processObjects=arch.processes,
             processesNames=map(lambda p: p.name, arch.processes),
+            copyProcesses=[(p.name,
+                            p.statements[0].src.name,
+                            p.statements[0].dst.name)
+                           for p in arch.processes
+                           if cls._isCopyProcess(p)],
             componentInstances=arch.componentInstances,
-            isOp=lambda x: isinstance(x, Operator),
-            sensitivityByOp=sensitivityByOp,
+            serialize_sensitivity=cls.sensitivityRegistration,
             serialize_io=cls.sensitivityListItem,
         )
 
+    @classmethod
+    def _collectReadBits(cls, sig, readBits: dict, seen: set) -> None:
+        """
+        Collect bits of signals which are read in expression
+
+        :param readBits: dictionary {signal: mask of read bits
+            or None if all bits are read}
+        """
+        if isinstance(sig, Value) or sig in seen:
+            return
+        seen.add(sig)
+        if isinstance(sig, Param) or sig._const:
+            return
+
+        if cls._isSignalRef(sig):
+            readBits[sig] = None
+            return
+
+        op = sig.origin
+        if not isinstance(op, Operator):
+            readBits[sig] = None
+            return
+
+        if op.operator == AllOps.INDEX:
+            src, index = op.operands
+            if (cls._isSignalRef(src)
+                    and isinstance(src._dtype, Bits)
+                    and isinstance(index, Value)
+                    and index._isFullVld()):
+                if isinstance(index._dtype, Integer):
+                    m = 1 << int(index)
+                elif index._dtype == SLICE:
+                    low = int(index.val[1])
+                    m = mask(index._size()) << low
+                else:
+                    m = None
+
+                if m is not None:
+                    try:
+                        prev = readBits[src]
+                    except KeyError:
+                        prev = 0
+
+                    if prev is not None:
+                        readBits[src] = prev | m
+                    return
+
+        for o in op.operands:
+            cls._collectReadBits(o, readBits, seen)
+
+    @classmethod
+    def sensitivityRegistration(cls, proc: HWProcess) -> str:
+        """
+        :return: arguments for registration of sensitivity of process
+            in sim model, signals from which only some bits are read
+            are specified with mask of these bits,
+            so process is not woken up on change of other bits
+        """
+        readBits = {}
+        seen = set()
+        for stm in proc.statements:
+            for i in stm._inputs:
+                cls._collectReadBits(i, readBits, seen)
+
+        items = []
+        for s in proc.sensitivityList:
+            if isinstance(s, Operator):
+                items.append("(%s, self.%s)" % (
+                    sensitivityByOp(s.operator), s.operands[0].name))
+                continue
+
+            m = readBits.get(s, None)
+            if m is None or m == s._dtype.all_mask():
+                items.append("self.%s" % s.name)
+            else:
+                items.append("(%s, self.%s, 0x%x)" % (
+                    SENSITIVITY.ANY, s.name, m))
+
+        return ", ".join(items)
+
     @classmethod
     def Assignment(cls, a: Assignment, ctx: SerializerCtx):
         dst = a.dst
         indentStr = getIndent(ctx.indent)
         ev = a._is_completly_event_dependent
+        # outputs of process are written to slots of io list
+        dstSlot = ctx.outputSlots[dst]
 
         srcStr = "%s" % cls.Value(a.src, ctx)
         if a.indexes is not None:
-            return "%sio.%s = (%s, (%s,), %s)" % (
-                indentStr, dst.name, srcStr,
+            return "%sio[%d] = (%s, (%s,), %s)" % (
+                indentStr, dstSlot, srcStr,
                 ", ".join(map(lambda x: cls.asHdl(x, ctx),
                               a.indexes)),
                 ev)
@@ -142,11 +260,11 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops,
                     if srcT.forceVector != dstT.forceVector:
                         _0 = cls.Value(toHVal(0), ctx)
                         if srcT.forceVector:
-                            return "%sio.%s = ((%s)._getitem__val(%s), %s)"\
-                                % (indentStr, dst.name, srcStr, _0, ev)
+                            return "%sio[%d] = ((%s)._getitem__val(%s), %s)"\
+                                % (indentStr, dstSlot, srcStr, _0, ev)
                         else:
-                            return "%sio.%s = (%s, (%s,), %s)" % (
-                                indentStr, dst.name, srcStr, _0, ev)
+                            return "%sio[%d] = (%s, (%s,), %s)" % (
+                                indentStr, dstSlot, srcStr, _0, ev)
 
                 raise SerializerException(
                     ("%s <= %s  is not valid assignment\n"
@@ -154,8 +272,8 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops,
                     (cls.asHdl(dst, ctx), srcStr,
                      dst._dtype, a.src._dtype))
             else:
-                return "%sio.%s = (%s, %s)" % (
-                    indentStr, dst.name, srcStr, ev)
+                return "%sio[%d] = (%s, %s)" % (
+                    indentStr, dstSlot, srcStr, ev)
 
     @classmethod
     def comment(cls, comentStr: str):
@@ -267,6 +385,8 @@ class SimModelSerializer(SimModelSerializer_value, SimModelSerializer_ops,
             map(cls.sensitivityListItem, proc.sensitivityList))
 
         childCtx = ctx.withIndent(2)
+        # {signal: index of slot in io list}
+        childCtx.outputSlots = {o: i for i, o in enumerate(proc.outputs)}
         _body = "\n".join([
             cls.stmAsHdl(stm, childCtx)
             for stm in body])
@@ -1,4 +1,5 @@
 from hwt.hdl.types.integerVal import IntegerVal
+from hwt.simulator.types.simArray import isSimHArrayCompatible
 from hwt.synthesizer.param import evalParam
 
 
@@ -46,6 +47,12 @@ class SimModelSerializer_types():
     @classmethod
     def HdlType_array(cls, typ, ctx, declaration=False):
         assert not declaration
-        return "HArray(%s, %d)" % (cls.HdlType(typ.elmType, ctx,
-                                               declaration=declaration),
-                                   evalParam(typ.size).val)
+        if isSimHArrayCompatible(typ):
+            # memory with items stored in flat arrays of integers
+            arrT = "simHArray"
+        else:
+            arrT = "HArray"
+        return "%s(%s, %d)" % (arrT,
+                               cls.HdlType(typ.elmType, ctx,
+                                           declaration=declaration),
+                               evalParam(typ.size).val)
@@ -1,6 +1,7 @@
 from hwt.hdl.variables import SignalItem
 from hwt.serializer.generic.indent import getIndent
 from hwt.serializer.generic.value import GenericSerializer_Value
+from hwt.simulator.types.simArray import isSimHArrayCompatible
 from hwt.synthesizer.param import Param, evalParam
 from hwt.hdl.types.enum import HEnum
 
@@ -61,7 +62,12 @@ class SimModelSerializer_value(GenericSerializer_Value):
 
     @classmethod
     def HArrayValAsHdl(cls, t, val, ctx):
-        return "HArrayVal(%s, %s, %d)" % (
+        if isSimHArrayCompatible(t):
+            valCls = "SimArrayVal"
+        else:
+            valCls = "HArrayVal"
+        return "%s(%s, %s, %d)" % (
+            valCls,
             cls.Dict_valAsHdl(val.val, ctx),
             cls.HdlType(t, ctx),
             val.vldMask)
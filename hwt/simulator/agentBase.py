@@ -26,6 +26,22 @@ class AgentBase():
     def _debug(self, out):
         self._debugOutput = out
 
+    def _bindValueHook(self, baseCls, valueHook: str, intHook: str,
+                       compatFn) -> None:
+        """
+        If class of this agent overrides hook which works with Value instances
+        (called with sim.read/sim.write) and does not override its int variant
+        (which is used by agent internally), replace the int variant
+        by compatFn which calls the overridden hook
+
+        :param baseCls: class which defines both hooks
+        :param compatFn: function with same signature as int variant
+        """
+        cls = self.__class__
+        if getattr(cls, valueHook) is not getattr(baseCls, valueHook)\
+                and getattr(cls, intHook) is getattr(baseCls, intHook):
+            setattr(self, intHook, compatFn)
+
     def getDrivers(self):
         """
         Called before simulation to collect all drivers of interfaces
@@ -54,6 +70,26 @@ class AgentBase():
         """
         raise NotImplementedError()
 
+    def driverIdleUntil(self, sim):
+        """
+        Implement this method to allow simulator to skip clock cycles
+        where driver has nothing to do
+        (:class:`hwt.simulator.cycleSimulator.CycleHdlSimulator`)
+
+        :return: None if next execution of driver can change state
+            of agent or value of any signal, else time until which
+            execution of driver does not change anything if signals
+            read by it do not change (IDLE_FOREVER if driver is idle until
+            its queue is refilled)
+        """
+        return None
+
+    def monitorIdleUntil(self, sim):
+        """
+        Same as :meth:`~.driverIdleUntil` just for monitor
+        """
+        return None
+
 
 class AgentWitReset(AgentBase):
     def __init__(self, intf, allowNoReset=False):
@@ -101,8 +137,10 @@ class SyncAgentBase(AgentWitReset):
 
         # run monitor, driver only on rising edge of clk
         c = self.SELECTED_EDGE_CALLBACK
-        self.monitor = c(self.clk, self.monitor, self.getEnable)
-        self.driver = c(self.clk, self.driver, self.getEnable)
+        self.monitor = c(self.clk, self.monitor, self.getEnable,
+                         self.monitorIdleUntil)
+        self.driver = c(self.clk, self.driver, self.getEnable,
+                        self.driverIdleUntil)
 
     def setEnable_asDriver(self, en, sim):
         self._enabled = en
@@ -0,0 +1,378 @@
+from array import array
+from collections import deque
+import sys
+from typing import Dict, List, Optional, Tuple, Union
+
+from hwt.hdl.types.struct import HStruct
+from hwt.hdl.value import Value
+from hwt.simulator.intArray import intArrayTypecode, intArrayFull, \
+    intArrayToNumpy
+
+
+class BufferDataSource():
+    """
+    Queue of data for driver of agent which reads items from a buffer
+    (bytes, memoryview, array.array, NumPy array)
+    Items are converted to int only when they are popped, there is no python
+    object allocated for items in advance.
+
+    bytes and memoryview of bytes are byte stream, items of itemSize bytes
+    are decoded from it. Typed buffers (array.array, bytearray, NumPy array)
+    are consumed item by item, each item is one data word,
+    negative items are converted to two's complement of width bits.
+
+    Supports subset of deque interface used by agents (popleft, append,
+    extend, len, iteration), appended items are sent after items
+    of the buffer.
+
+    :cvar COMPACT_THRESHOLD: minimal number of consumed items
+        after which consumed part of buffer is released
+        (remaining items are copied if they are at most half of the buffer)
+    :ivar _mv: memoryview of the buffer
+    :ivar _itemSize: size of item in bytes if items are decoded from raw bytes
+        by int.from_bytes, None if items are read from _mv directly
+    :ivar _byteorder: byte order of items in raw bytes
+    :ivar _mask: mask of width bits or None if items are not masked
+    :ivar _i: index of next item in buffer
+    :ivar _size: number of items in buffer
+    :ivar _tail: deque of items appended after buffer
+    """
+    COMPACT_THRESHOLD = 1 << 16
+
+    def __init__(self, data, itemSize: Optional[int]=None,
+                 byteorder: str="little", width: Optional[int]=None):
+        """
+        :param data: bytes or memoryview of bytes (byte stream split
+            into items of itemSize bytes) or typed buffer (array.array,
+            bytearray, 1D NumPy array of integers) with an item per data word
+        :param itemSize: size of item in bytes (for byte stream)
+        :param byteorder: byte order of items (for byte stream)
+        :param width: width of data word in bits, if specified items
+            of typed buffer are masked to it
+        """
+        isByteStream = isinstance(data, (bytes, memoryview))
+        mv = memoryview(data)
+        if mv.ndim != 1:
+            raise ValueError("Only one dimensional buffers are supported",
+                             mv.ndim)
+
+        self._byteorder = byteorder
+        if width is None:
+            self._mask = None
+        else:
+            self._mask = (1 << width) - 1
+
+        if isByteStream and mv.format in ("B", "b", "c"):
+            mv = mv.cast("B")
+            if itemSize is None:
+                itemSize = 1
+            if mv.nbytes % itemSize:
+                raise ValueError("Size of buffer is not multiple of itemSize",
+                                 mv.nbytes, itemSize)
+            tc = intArrayTypecode(itemSize * 8, False)
+            if tc is not None and array(tc).itemsize == itemSize\
+                    and (itemSize == 1 or byteorder == sys.byteorder)\
+                    and mv.c_contiguous:
+                # items can be read directly from buffer
+                if itemSize != 1:
+                    mv = mv.cast(tc)
+                self._itemSize = None
+            else:
+                self._itemSize = itemSize
+            # items of byte stream are unsigned and they have itemSize bytes
+            self._mask = None
+        else:
+            if mv.format == "c":
+                mv = mv.cast("B")
+            elif mv.format.lstrip("@=") not in ("b", "B", "h", "H", "i", "I",
+                                               "l", "L", "q", "Q"):
+                raise ValueError(
+                    "Unsupported format of items, integers in native"
+                    " byte order are required", mv.format)
+            self._itemSize = None
+
+        self._mv = mv
+        self._i = 0
+        if self._itemSize is None:
+            self._size = len(mv)
+        else:
+            self._size = len(mv) // self._itemSize
+        self._tail = deque()
+
+    def _get(self, i: int) -> int:
+        s = self._itemSize
+        if s is None:
+            v = self._mv[i]
+            m = self._mask
+            if m is not None:
+                v = int(v) & m
+            return v
+        else:
+            return int.from_bytes(self._mv[i * s:(i + 1) * s],
+                                  self._byteorder)
+
+    def _compact(self) -> None:
+        """
+        Release consumed part of the buffer
+        """
+        mv = self._mv
+        i = self._i
+        if self._itemSize is not None:
+            i *= self._itemSize
+        rest = mv[i:]
+        try:
+            mv = memoryview(rest.tobytes()).cast("B").cast(mv.format)
+        except (TypeError, ValueError):
+            # format can not be used for cast (f.e. non native byte order),
+            # at least drop the reference to consumed part
+            mv = rest
+        self._mv = mv
+        self._size -= self._i
+        self._i = 0
+
+    def popleft(self):
+        i = self._i
+        if i < self._size:
+            self._i = i + 1
+            v = self._get(i)
+            if i >= self.COMPACT_THRESHOLD and i * 2 >= self._size:
+                self._compact()
+            return v
+        return self._tail.popleft()
+
+    def append(self, item) -> None:
+        self._tail.append(item)
+
+    def extend(self, items) -> None:
+        self._tail.extend(items)
+
+    def clear(self) -> None:
+        self._mv = self._mv[:0]
+        self._i = 0
+        self._size = 0
+        self._tail.clear()
+
+    def __len__(self):
+        return self._size - self._i + len(self._tail)
+
+    def __bool__(self):
+        return self._i < self._size or bool(self._tail)
+
+    def __iter__(self):
+        for i in range(self._i, self._size):
+            yield self._get(i)
+        yield from self._tail
+
+    def __repr__(self):
+        return "<%s, %d items>" % (self.__class__.__name__, len(self))
+
+
+def _structFields(structT: HStruct) -> List[Tuple[str, int, int]]:
+    """
+    :return: list of tuples (name, offset, width) for non padding fields
+        of struct (first field is on least significant bits)
+    """
+    fields = []
+    offset = 0
+    for f in structT.fields:
+        w = f.dtype.bit_length()
+        if f.name is not None:
+            fields.append((f.name, offset, w))
+        offset += w
+    return fields
+
+
+class IntDataBuffer():
+    """
+    Growable buffer for data collected by monitor of agent,
+    values are stored as ints in compact arrays
+    instead of Value instances
+
+    Supports subset of deque interface used by agents and tests (append,
+    popleft, pop, len, indexing, iteration), items are ints or None if value
+    is not fully valid.
+
+    :ivar width: width of items in bits
+    :ivar fields: list of tuples (name, offset, width) of fields of items
+        (from HStruct) or None
+    :ivar vals: array of values (list for items wider than 64b)
+    :ivar vldMasks: array of validity masks
+    :ivar _start: index of first item (items before were popped)
+    :ivar _len: number of used items in vals and vldMasks
+    :cvar COMPACT_THRESHOLD: minimal number of popped items after which
+        they are removed from storage (if they are at least half of it)
+    """
+    COMPACT_THRESHOLD = 1 << 16
+
+    def __init__(self, width: int, capacity: int=0,
+                 fields: Optional[HStruct]=None):
+        """
+        :param width: width of items in bits
+        :param capacity: number of items to preallocate
+        :param fields: optional HStruct type of items used to decode fields
+        """
+        self.width = width
+        self._mask = (1 << width) - 1
+        if fields is not None:
+            assert fields.bit_length() == width, (fields, width)
+            fields = _structFields(fields)
+        self.fields = fields
+
+        self._typecode = intArrayTypecode(width, False)
+        self.vals = intArrayFull(self._typecode, capacity)
+        self.vldMasks = intArrayFull(self._typecode, capacity)
+        self._start = 0
+        self._len = 0
+
+    def _grow(self) -> None:
+        add = max(len(self.vals), 1024)
+        self.vals.extend(intArrayFull(self._typecode, add))
+        self.vldMasks.extend(intArrayFull(self._typecode, add))
+
+    def append(self, v: Union[Value, int, None]) -> None:
+        """
+        :param v: Value instance, int (fully valid) or None (invalid)
+        """
+        if isinstance(v, Value):
+            val = v.val
+            m = v.vldMask
+        elif v is None:
+            val = 0
+            m = 0
+        else:
+            val = v
+            m = self._mask
+
+        i = self._len
+        if i == len(self.vals):
+            self._grow()
+        self.vals[i] = val
+        self.vldMasks[i] = m
+        self._len = i + 1
+
+    def extend(self, values) -> None:
+        for v in values:
+            self.append(v)
+
+    def _item(self, i: int) -> Optional[int]:
+        if self.vldMasks[i] == self._mask:
+            return self.vals[i]
+        return None
+
+    def popleft(self) -> Optional[int]:
+        i = self._start
+        if i >= self._len:
+            raise IndexError("pop from an empty buffer")
+        v = self._item(i)
+        i += 1
+        if i >= self.COMPACT_THRESHOLD and i * 2 >= self._len:
+            # remove popped items from storage
+            del self.vals[:i]
+            del self.vldMasks[:i]
+            self._len -= i
+            i = 0
+        self._start = i
+        return v
+
+    def pop(self) -> Optional[int]:
+        i = self._len - 1
+        if i < self._start:
+            raise IndexError("pop from an empty buffer")
+        self._len = i
+        return self._item(i)
+
+    def clear(self) -> None:
+        self._start = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len - self._start
+
+    def __bool__(self):
+        return self._len > self._start
+
+    def __getitem__(self, index: int) -> Optional[int]:
+        n = len(self)
+        if index < 0:
+            index += n
+        if index < 0 or index >= n:
+            raise IndexError(index)
+        return self._item(self._start + index)
+
+    def __iter__(self):
+        for i in range(self._start, self._len):
+            yield self._item(i)
+
+    def toInts(self) -> List[Optional[int]]:
+        """
+        :return: list of values (None for value which is not fully valid)
+        """
+        return list(self)
+
+    def _getFields(self) -> List[Tuple[str, int, int]]:
+        fields = self.fields
+        if fields is None:
+            raise ValueError(
+                "%r was created without fields, use toInts/toNumpy" % self)
+        return fields
+
+    def fieldValues(self, name: str) -> List[Optional[int]]:
+        """
+        :return: list of values of field of items
+            (None for value which is not fully valid)
+        :raise ValueError: if buffer was created without fields
+        """
+        for fName, offset, width in self._getFields():
+            if fName == name:
+                break
+        else:
+            raise KeyError(name)
+
+        m = (1 << width) - 1
+        res = []
+        vals = self.vals
+        vldMasks = self.vldMasks
+        for i in range(self._start, self._len):
+            if (vldMasks[i] >> offset) & m == m:
+                res.append((vals[i] >> offset) & m)
+            else:
+                res.append(None)
+        return res
+
+    def toNumpy(self):
+        """
+        :return: tuple of numpy arrays (vals, vldMasks),
+            values wider than 64b are in arrays of python ints (dtype=object)
+        """
+        s = slice(self._start, self._len)
+        return intArrayToNumpy(self.vals[s]), intArrayToNumpy(self.vldMasks[s])
+
+    def fieldsToNumpy(self) -> Dict[str, tuple]:
+        """
+        :return: dictionary {field name: (vals, vld)} where vals is numpy
+            array of values of field and vld is boolean numpy array
+            which is True if all bits of field are valid
+        :raise ValueError: if buffer was created without fields
+        """
+        fields = self._getFields()
+        import numpy as np
+        vals, vldMasks = self.toNumpy()
+        res = {}
+        for name, offset, width in fields:
+            m = (1 << width) - 1
+            if self._typecode is None or width > 64:
+                v = np.array([(int(x) >> offset) & m for x in vals],
+                             dtype=object)
+                vld = np.array([(int(x) >> offset) & m == m
+                                for x in vldMasks], dtype=bool)
+            else:
+                dt = np.dtype(intArrayTypecode(width, False))
+                sh = vals.dtype.type(offset)
+                mk = vals.dtype.type(m)
+                v = ((vals >> sh) & mk).astype(dt)
+                vld = ((vldMasks >> sh) & mk) == mk
+            res[name] = (v, vld)
+        return res
+
+    def __repr__(self):
+        return "<%s, %d items>" % (self.__class__.__name__, len(self))
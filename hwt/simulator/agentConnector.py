@@ -1,15 +1,27 @@
+from collections import deque
+from inspect import isgenerator
+
 from hwt.hdl.constants import INTF_DIRECTION
+from hwt.hdl.types.arrayVal import HArrayVal
+from hwt.hdl.value import Value
+from hwt.simulator.agentBuffers import IntDataBuffer
+from hwt.simulator.types.simArray import SimArrayVal
 
 
-def autoAddAgents(unit):
+def autoAddAgents(unit, interfaces=None):
     """
     Walk all interfaces on unit and instantiate agent for every interface.
 
+    :param interfaces: optional list of interfaces of unit which should
+        get agents (default all interfaces)
     :return: all monitor/driver functions which should be added to simulation
          as processes
     """
+    if interfaces is None:
+        interfaces = unit._interfaces
+
     proc = []
-    for intf in unit._interfaces:
+    for intf in interfaces:
         if not intf._isExtern:
             continue
 
@@ -35,6 +47,9 @@ def valuesToInts(values):
     """
     Iterable of values to ints (nonvalid = None)
     """
+    if isinstance(values, IntDataBuffer):
+        return values.toInts()
+
     res = []
     append = res.append
     for d in values:
@@ -52,6 +67,44 @@ def valToInt(v):
         return None
 
 
+def valToBit(v):
+    """
+    Value of 1b signal (f.e. from sim.read) to 1/0 or None if value
+    is invalid (same as sim.readInt)
+    """
+    if not v.vldMask:
+        return None
+    return int(v.val)
+
+
+def allValuesToInts(sequenceOrVal):
+    if isinstance(sequenceOrVal, SimArrayVal):
+        if sequenceOrVal._dtype.rowSize == 1:
+            return sequenceOrVal.toInts()
+        return [allValuesToInts(v) for v in sequenceOrVal]
+    elif isinstance(sequenceOrVal, HArrayVal):
+        sequenceOrVal = sequenceOrVal.val
+    elif isinstance(sequenceOrVal, IntDataBuffer):
+        return sequenceOrVal.toInts()
+
+    if isinstance(sequenceOrVal, Value):
+        return valToInt(sequenceOrVal)
+    elif not sequenceOrVal:
+        return sequenceOrVal
+    elif (isinstance(sequenceOrVal, (list, tuple, deque))
+          or isgenerator(sequenceOrVal)):
+        seq = []
+        for i in sequenceOrVal:
+            seq.append(allValuesToInts(i))
+
+        if isinstance(sequenceOrVal, tuple):
+            return tuple(seq)
+
+        return seq
+    else:
+        return sequenceOrVal
+
+
 def agInts(interface):
     """
     Convert all values which has agent collected in time >=0 to integer array.
@@ -0,0 +1,533 @@
+"""
+Binary trace format (all numbers are little endian)
+
+* header: BIN_TRACE_MAGIC, u32 version
+* blocks of change records, records are never split between blocks,
+  record: i64 time, u32 signal id, value, validity mask
+  (value and validity mask have 1, 2, 4 or 8 bytes for signals up to 64b
+  and (width + 7) // 8 bytes for wider signals, value of HEnum
+  is stored as index of value)
+* index:
+    * u32 length of metadata + metadata in json
+      (time resolution and names and types of signals)
+    * u32 number of blocks + for each block: u64 offset, u32 size,
+      i64 time of first record, i64 time of last record,
+      u32 number of records
+    * for each signal: u32 number of blocks + indexes of blocks
+      which contain records of this signal
+* trailer: u64 offset of index, BIN_TRACE_MAGIC
+"""
+import json
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from fnmatch import fnmatchcase
+from struct import Struct
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from hwt.bitmask import mask
+from hwt.hdl.types.bits import Bits
+from hwt.hdl.types.bool import HBool
+from hwt.hdl.types.enum import HEnum
+from hwt.hdl.value import Value
+from hwt.simulator.hdlSimConfig import HdlSimConfig
+from hwt.simulator.simModel import simModelScopes
+from pyDigitalWaveTools.vcd.common import VCD_SIG_TYPE
+from pyDigitalWaveTools.vcd.writer import VcdWriter, vcdBitsFormatter, \
+    vcdEnumFormatter
+
+BIN_TRACE_MAGIC = b"HWTTRACE"
+BIN_TRACE_VERSION = 1
+
+_HEADER = Struct("<8sI")
+_RECORD_HEADER = Struct("<qI")
+_U32 = Struct("<I")
+_BLOCK_INFO = Struct("<QIqqI")
+_TRAILER = Struct("<Q8s")
+
+
+class _TraceValue():
+    """
+    Value loaded from trace (for formatters of VcdWriter)
+    """
+    __slots__ = ["val", "vldMask"]
+
+    def __init__(self, val, vldMask):
+        self.val = val
+        self.vldMask = vldMask
+
+
+class BinTraceSignal():
+    """
+    Description of signal in binary trace and its value codec
+
+    :ivar id: index of signal in trace
+    :ivar name: hierarchical name of signal (f.e. "top.sub0.a_data")
+    :ivar width: bit width of value
+    :ivar signed: if True value is signed
+    :ivar enumValues: tuple of names of values if signal is HEnum else None
+    :ivar blocks: indexes of blocks which contain records of this signal
+    """
+
+    def __init__(self, id: int, name: str, width: int,
+                 signed: bool=False, enumValues: Optional[Tuple[str]]=None):
+        self.id = id
+        self.name = name
+        self.width = width
+        self.signed = signed
+        self.enumValues = enumValues
+        self.blocks = []
+
+        self._mask = mask(width)
+        nb = (width + 7) // 8
+        for code, size in (("B", 1), ("H", 2), ("I", 4), ("Q", 8)):
+            if nb <= size:
+                self._struct = Struct("<qI" + code + code)
+                self._valSize = size
+                break
+        else:
+            self._struct = None
+            self._valSize = nb
+        self.recordSize = _RECORD_HEADER.size + 2 * self._valSize
+
+        if enumValues is not None:
+            self._enumIndex = {v: i for i, v in enumerate(enumValues)}
+            self._enumIndex[None] = 0
+        else:
+            self._enumIndex = None
+
+    def encode(self, time: int, v: Value) -> bytes:
+        """
+        :return: change record for value v in specified time
+        """
+        val = v.val
+        if self._enumIndex is not None:
+            val = self._enumIndex[val]
+        else:
+            val = int(val) & self._mask
+
+        st = self._struct
+        if st is not None:
+            return st.pack(time, self.id, val, v.vldMask)
+        else:
+            s = self._valSize
+            return (_RECORD_HEADER.pack(time, self.id)
+                    + val.to_bytes(s, "little")
+                    + v.vldMask.to_bytes(s, "little"))
+
+    def decode(self, buff: bytes, offset: int) -> Tuple[int, int]:
+        """
+        :param offset: offset of value in buff (after record header)
+        :return: tuple (value, validity mask) (value is name for HEnum)
+        """
+        s = self._valSize
+        val = int.from_bytes(buff[offset:offset + s], "little")
+        vld = int.from_bytes(buff[offset + s:offset + 2 * s], "little")
+        if self.enumValues is not None:
+            val = self.enumValues[val] if vld else None
+        elif self.signed and val >> (self.width - 1):
+            val -= 1 << self.width
+        return val, vld
+
+    def toJson(self) -> dict:
+        return {
+            "name": self.name,
+            "width": self.width,
+            "signed": self.signed,
+            "enumValues": self.enumValues,
+        }
+
+    @classmethod
+    def fromJson(cls, id: int, d: dict) -> "BinTraceSignal":
+        enumValues = d["enumValues"]
+        if enumValues is not None:
+            enumValues = tuple(enumValues)
+        return cls(id, d["name"], d["width"], d["signed"], enumValues)
+
+    def __repr__(self):
+        return "<%s %d %s>" % (self.__class__.__name__, self.id, self.name)
+
+
+class BinTraceHdlSimConfig(HdlSimConfig):
+    """
+    Simulator config which dumps value changes to compact binary trace
+    (alternative to VcdHdlSimConfig, see BinTraceReader and binTraceToVcd)
+
+    Change records are written in blocks of approximately blockSize bytes,
+    index of blocks and signals is written after each run of simulation,
+    which allows reader to load only blocks for selected time window
+    and selected signals.
+
+    Usage:
+
+    .. code-block:: python
+
+        with open("trace.bin", "wb") as f:
+            sim = HdlSimulator(BinTraceHdlSimConfig(f))
+            sim.simUnit(model, 1000 * Time.ns, procs)
+
+        with open("trace.bin", "rb") as f:
+            r = BinTraceReader(f)
+            for t, sig, val, vld in r.changes(100 * Time.ns, 200 * Time.ns,
+                                              ["top.b_data"]):
+                ...
+
+    :ivar traceGlobs: optional list of glob patterns of hierarchical names
+        of dumped signals, if None all supported signals are dumped
+    :ivar blockSize: size of block of records in bytes
+    :attention: output file has to be binary and seekable
+        if simulation is run multiple times (index written by previous
+        run is overwritten)
+    """
+    supported_type_classes = (HBool, Bits, HEnum)
+
+    def __init__(self, dumpFile, traceGlobs: Optional[List[str]]=None,
+                 blockSize: int=1 << 16):
+        super(BinTraceHdlSimConfig, self).__init__()
+
+        self.dumpFile = dumpFile
+        self.traceGlobs = traceGlobs
+        self.blockSize = blockSize
+        self._timeResolution = 1
+        self._signals = []
+        # {SimSignal: BinTraceSignal}
+        self._sigInfo = {}
+        # list of tuples (offset, size, first time, last time, records)
+        self._blocks = []
+        self._block = bytearray()
+        self._blockRecords = 0
+        self._blockFirstTime = None
+        self._blockLastTime = None
+        # offset of end of written blocks
+        self._offset = 0
+        self._indexWritten = False
+
+    def _isTraced(self, name: str) -> bool:
+        globs = self.traceGlobs
+        if globs is None:
+            return True
+
+        for g in globs:
+            if fnmatchcase(name, g):
+                return True
+        return False
+
+    def beforeSim(self, simulator, synthesisedUnit):
+        self._timeResolution = simulator.timeResolution
+        for m, scope in simModelScopes(synthesisedUnit).items():
+            for s in sorted(m._ctx.signals, key=lambda s: s.name):
+                t = s._dtype
+                if (s in self._sigInfo
+                        or not isinstance(t, self.supported_type_classes)):
+                    continue
+                name = "%s.%s" % (scope, s.name)
+                if not self._isTraced(name):
+                    continue
+
+                if isinstance(t, HEnum):
+                    i = BinTraceSignal(len(self._signals), name,
+                                       t.bit_length(),
+                                       enumValues=t._allValues)
+                else:
+                    i = BinTraceSignal(len(self._signals), name,
+                                       t.bit_length(),
+                                       signed=bool(getattr(t, "signed",
+                                                           False)))
+                self._signals.append(i)
+                self._sigInfo[s] = i
+
+        self.dumpFile.write(_HEADER.pack(BIN_TRACE_MAGIC, BIN_TRACE_VERSION))
+        self._offset = _HEADER.size
+
+    def logChange(self, nowTime, sig, nextVal):
+        try:
+            s = self._sigInfo[sig]
+        except KeyError:
+            # not dumped signal
+            return
+
+        blocks = s.blocks
+        blockId = len(self._blocks)
+        if not blocks or blocks[-1] != blockId:
+            blocks.append(blockId)
+
+        if self._blockFirstTime is None:
+            self._blockFirstTime = nowTime
+        self._blockLastTime = nowTime
+        self._blockRecords += 1
+        b = self._block
+        b += s.encode(nowTime, nextVal)
+        if len(b) >= self.blockSize:
+            self._flushBlock()
+
+    def _flushBlock(self):
+        b = self._block
+        if not b:
+            return
+
+        f = self.dumpFile
+        if self._indexWritten:
+            # overwrite index from previous run
+            f.seek(self._offset)
+            self._indexWritten = False
+        f.write(b)
+
+        self._blocks.append((self._offset, len(b), self._blockFirstTime,
+                             self._blockLastTime, self._blockRecords))
+        self._offset += len(b)
+        self._block = bytearray()
+        self._blockRecords = 0
+        self._blockFirstTime = None
+        self._blockLastTime = None
+
+    def afterRun(self, simulator):
+        """
+        Write all records and index of trace to the file
+        """
+        self._flushBlock()
+        f = self.dumpFile
+        if self._indexWritten:
+            f.seek(self._offset)
+
+        meta = json.dumps({
+            "timeResolution": self._timeResolution,
+            "signals": [s.toJson() for s in self._signals],
+        }).encode("utf-8")
+        index = [_U32.pack(len(meta)), meta, _U32.pack(len(self._blocks))]
+        index.extend(_BLOCK_INFO.pack(*b) for b in self._blocks)
+        for s in self._signals:
+            index.append(_U32.pack(len(s.blocks)))
+            index.append(Struct("<%dI" % len(s.blocks)).pack(*s.blocks))
+        index.append(_TRAILER.pack(self._offset, BIN_TRACE_MAGIC))
+
+        # index only grows, new index always overwrites whole previous one
+        f.write(b"".join(index))
+        f.flush()
+        self._indexWritten = True
+
+
+class BinTraceReader():
+    """
+    Reader of binary trace written by BinTraceHdlSimConfig,
+    only index of the trace is loaded on construction, records are loaded
+    from the file on demand for selected time window and signals
+
+    :ivar timeResolution: time resolution of simulator which produced trace
+    :ivar signals: list of BinTraceSignal
+    :ivar signalByName: dictionary {hierarchical name: BinTraceSignal}
+    :ivar blocks: list of tuples (offset, size, time of first record,
+        time of last record, number of records)
+    """
+
+    def __init__(self, file):
+        """
+        :param file: binary seekable file
+        """
+        self.file = file
+        file.seek(0)
+        magic, version = _HEADER.unpack(file.read(_HEADER.size))
+        if magic != BIN_TRACE_MAGIC:
+            raise ValueError("Not a binary trace file", magic)
+        if version != BIN_TRACE_VERSION:
+            raise ValueError("Unsupported version of binary trace", version)
+
+        file.seek(-_TRAILER.size, 2)
+        indexOffset, magic = _TRAILER.unpack(file.read(_TRAILER.size))
+        if magic != BIN_TRACE_MAGIC:
+            raise ValueError("Binary trace file is incomplete")
+
+        file.seek(indexOffset)
+        metaLen, = _U32.unpack(file.read(_U32.size))
+        meta = json.loads(file.read(metaLen).decode("utf-8"))
+        self.timeResolution = meta["timeResolution"]
+        self.signals = [BinTraceSignal.fromJson(i, s)
+                        for i, s in enumerate(meta["signals"])]
+        self.signalByName = {s.name: s for s in self.signals}
+
+        blockCnt, = _U32.unpack(file.read(_U32.size))
+        data = file.read(blockCnt * _BLOCK_INFO.size)
+        self.blocks = list(_BLOCK_INFO.iter_unpack(data))
+        self._blockFirstTimes = [b[2] for b in self.blocks]
+        self._blockLastTimes = [b[3] for b in self.blocks]
+        for s in self.signals:
+            cnt, = _U32.unpack(file.read(_U32.size))
+            s.blocks = list(Struct("<%dI" % cnt).unpack(
+                file.read(cnt * _U32.size)))
+
+    def _resolveSignals(self, signals) -> Optional[List[BinTraceSignal]]:
+        if signals is None:
+            return None
+        res = []
+        for s in signals:
+            if isinstance(s, str):
+                s = self.signalByName[s]
+            res.append(s)
+        return res
+
+    def readBlock(self, blockIndex: int
+                  ) -> Iterator[Tuple[int, BinTraceSignal, object, int]]:
+        """
+        :return: generator of records (time, signal, value, validity mask)
+            from specified block
+        """
+        offset, size, _, _, _ = self.blocks[blockIndex]
+        f = self.file
+        f.seek(offset)
+        buff = f.read(size)
+        signals = self.signals
+        unpackHeader = _RECORD_HEADER.unpack_from
+        hSize = _RECORD_HEADER.size
+        i = 0
+        while i < size:
+            t, sId = unpackHeader(buff, i)
+            s = signals[sId]
+            val, vld = s.decode(buff, i + hSize)
+            yield t, s, val, vld
+            i += s.recordSize
+
+    def changes(self, start: int=0, end: Optional[int]=None,
+                signals: Optional[List[Union[str, BinTraceSignal]]]=None
+                ) -> Iterator[Tuple[int, BinTraceSignal, object, int]]:
+        """
+        :param start: only changes in time >= start are returned
+        :param end: if not None only changes in time <= end are returned
+        :param signals: optional list of signals or their names,
+            if None changes of all signals are returned
+        :return: generator of records (time, signal, value, validity mask)
+            ordered by time
+        """
+        lo = bisect_left(self._blockLastTimes, start)
+        if end is None:
+            hi = len(self.blocks)
+        else:
+            hi = bisect_right(self._blockFirstTimes, end)
+
+        signals = self._resolveSignals(signals)
+        if signals is None:
+            blockIndexes = range(lo, hi)
+        else:
+            selected = set(s.id for s in signals)
+            blockIndexes = set()
+            for s in signals:
+                b = s.blocks
+                blockIndexes.update(b[bisect_left(b, lo):bisect_left(b, hi)])
+            blockIndexes = sorted(blockIndexes)
+
+        for bi in blockIndexes:
+            for rec in self.readBlock(bi):
+                t = rec[0]
+                if t < start:
+                    continue
+                elif end is not None and t > end:
+                    return
+                elif signals is None or rec[1].id in selected:
+                    yield rec
+
+    def valueAt(self, signal: Union[str, BinTraceSignal], time: int
+                ) -> Optional[Tuple[object, int]]:
+        """
+        :return: tuple (value, validity mask) of signal in specified time
+            (after all changes in this time)
+            or None if there was not any change before this time
+        """
+        if isinstance(signal, str):
+            signal = self.signalByName[signal]
+
+        blocks = signal.blocks
+        # last block of signal with first record <= time
+        lastBlock = bisect_right(self._blockFirstTimes, time) - 1
+        i = bisect_right(blocks, lastBlock) - 1
+        while i >= 0:
+            res = None
+            for t, s, val, vld in self.readBlock(blocks[i]):
+                if t > time:
+                    break
+                elif s is signal:
+                    res = (val, vld)
+            if res is not None:
+                return res
+            i -= 1
+
+        return None
+
+    def valuesAt(self, time: int,
+                 signals: Optional[List[Union[str, BinTraceSignal]]]=None
+                 ) -> Dict[BinTraceSignal, Tuple[object, int]]:
+        """
+        :return: dictionary {signal: (value, validity mask)} with values
+            of signals in specified time (signals without any change
+            before this time are not present)
+        """
+        signals = self._resolveSignals(signals)
+        if signals is None:
+            signals = self.signals
+
+        res = {}
+        for s in signals:
+            v = self.valueAt(s, time)
+            if v is not None:
+                res[s] = v
+        return res
+
+
+def binTraceToVcd(reader: BinTraceReader, vcdFile, start: int=0,
+                  end: Optional[int]=None,
+                  signals: Optional[List[Union[str, BinTraceSignal]]]=None
+                  ) -> None:
+    """
+    Convert binary trace (or its part) to VCD
+
+    :param reader: BinTraceReader of converted trace
+    :param vcdFile: output text file
+    :param start: start of converted time window, values of all signals
+        in this time are dumped at the beginning
+    :param end: optional end of converted time window
+    :param signals: optional list of converted signals or their names
+    """
+    signals = reader._resolveSignals(signals)
+    if signals is None:
+        signals = reader.signals
+
+    vcd = VcdWriter(vcdFile)
+    vcd.date(datetime.now())
+    timeResolution = reader.timeResolution
+    vcd.timescale(timeResolution)
+
+    # {scope name: (subscopes, signals)}
+    root = ({}, [])
+    for s in signals:
+        scopes, sigs = root
+        path = s.name.split(".")
+        for p in path[:-1]:
+            try:
+                scopes, sigs = scopes[p]
+            except KeyError:
+                sc = ({}, [])
+                scopes[p] = sc
+                scopes, sigs = sc
+        sigs.append((path[-1], s))
+
+    def registerScope(parent, scope):
+        scopes, sigs = scope
+        for name, s in sigs:
+            if s.enumValues is None:
+                parent.addVar(s, name, VCD_SIG_TYPE.WIRE, s.width,
+                              vcdBitsFormatter)
+            else:
+                parent.addVar(s, name, VCD_SIG_TYPE.REAL, 1,
+                              vcdEnumFormatter)
+        for name, sc in scopes.items():
+            with parent.varScope(name) as subScope:
+                registerScope(subScope, sc)
+
+    for name, sc in root[0].items():
+        with vcd.varScope(name) as scope:
+            registerScope(scope, sc)
+    vcd.enddefinitions()
+
+    if start > 0:
+        for s, (val, vld) in reader.valuesAt(start, signals).items():
+            vcd.logChange(start // timeResolution, s, _TraceValue(val, vld))
+        start += 1
+
+    for t, s, val, vld in reader.changes(start, end, signals):
+        vcd.logChange(t // timeResolution, s, _TraceValue(val, vld))
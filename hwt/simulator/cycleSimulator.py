@@ -0,0 +1,509 @@
+from collections import deque
+
+from hwt.hdl.constants import Time
+from hwt.interfaces.agents.clk import OscilatorAgent
+from hwt.pyUtils.uniqList import UniqList
+from hwt.simulator.exceptions import SimException
+from hwt.simulator.hdlSimulator import HdlSimulator, Wait, Event, \
+    StopSimumulation, PRIORITY_NORMAL, applyUpdate, isEvDependentOn
+from hwt.simulator.levelization import LevelizedProcQueue, levelizeProcesses
+from hwt.simulator.shortcuts import CallbackLoopDispatcher, IDLE_FOREVER
+from hwt.simulator.simModel import _collectSimModels
+from hwt.simulator.simSignal import SimSignal
+
+
+class CycleHdlSimulator(HdlSimulator):
+    """
+    Cycle based simulator for designs with a single clock
+    and without asynchronous logic
+
+    It runs on the same simulation models as :class:`.HdlSimulator`
+    but there are no calendar events and delta steps for clock edges.
+    On each clock edge write callbacks of clock signal (per-cycle hooks
+    of the agents, f.e. :class:`hwt.simulator.agentBase.SyncAgentBase`)
+    are executed directly, combinational logic is evaluated in levelized
+    order until agents waiting on combinational update are satisfied
+    and then all processes sensitive to rising edge of clock are evaluated
+    at once and their outputs are committed.
+    Other simulation processes (f.e. reset driver) are scheduled
+    by time as in :class:`.HdlSimulator`.
+
+    Clock is generated by the simulator itself, the driver
+    of :class:`hwt.interfaces.agents.clk.OscilatorAgent` from extra processes
+    is replaced by it.
+
+    If skipIdleCycles is enabled the simulator detects quiescent state
+    of the design (no signal has changed in last clock period,
+    there is nothing to execute and all per-cycle hooks of agents
+    declared themselves idle, see
+    :meth:`hwt.simulator.agentBase.AgentBase.driverIdleUntil`)
+    and it fast-forwards the clock to the next time when something
+    can happen (next calendar event, end of idle time of agent or end
+    of simulation). The time and the number of clock cycles stays
+    the same as if all cycles were simulated.
+
+    :attention: SimException is raised for designs with multiple clocks,
+        falling edge or asynchronous processes or if clock is used as data
+    :note: clock signal is not toggled in skipped cycles, but its edges
+        are still reported to config (logChange), so the clock
+        in VCD/waveform dump is continuous
+
+    :ivar _clkSignals: clock signal and signals which are only copies of it
+        (f.e. clock input of sub unit)
+    :ivar _clkSeqProcs: processes sensitive to rising edge of clock
+    :ivar _clkCopyProcs: processes which only copy clock signal
+        (they are never evaluated)
+    :ivar _clkNextEdge: time of next clock edge
+    :ivar _clkNextRising: True if next clock edge is rising
+    :ivar _clkLowTime: duration of low level of the clock
+    :ivar _clkHighTime: duration of high level of the clock
+    :ivar _readyProcs: simulation processes which should be executed
+        in this time
+    :ivar _combWaiters: simulation processes (or functions(sim)
+        returned from callbacks of agents) which are waiting until
+        combinational logic settles in this time
+    :ivar skipIdleCycles: if True idle clock cycles are skipped
+    :ivar clkCycles: number of rising edges of clock
+        (including skipped ones)
+    :ivar skippedClkCycles: number of skipped clock cycles
+    :ivar _clkLastRising: time of last rising edge of clock
+    :ivar _stateSignals: all signals of the model except clock signals
+    :ivar _lastActiveSig: signal which was found to be changed
+        by last check of quiescence (it is checked first next time)
+    """
+
+    def __init__(self, config=None, timeResolution: int=Time.ps,
+                 skipIdleCycles: bool=True):
+        super(CycleHdlSimulator, self).__init__(
+            config=config, timeResolution=timeResolution, levelized=True)
+        self.skipIdleCycles = skipIdleCycles
+        self.clkCycles = 0
+        self.skippedClkCycles = 0
+        self._clkLastRising = None
+        self._stateSignals = []
+        self._lastActiveSig = None
+        # updates are always applied immediately, there is nothing to plan
+        self._applyValPlaned = True
+        self._combUpdateDoneEv = Event(self)
+        self._clkSignals = []
+        self._clkSeqProcs = []
+        self._clkCopyProcs = set()
+        self._clkNextEdge = None
+        self._clkNextRising = True
+        self._clkLowTime = None
+        self._clkHighTime = None
+        self._readyProcs = deque()
+        self._combWaiters = []
+
+    def waitOnCombUpdate(self) -> Event:
+        """
+        Sim processes can wait on combUpdateDone by:
+        yield sim.waitOnCombUpdate()
+
+        Sim process is then woken up when combinational logic
+        is settled in this time
+        """
+        return self._combUpdateDoneEv
+
+    def add_process(self, proc) -> None:
+        """
+        Add process to be executed in actual time
+        """
+        self._readyProcs.append(proc)
+
+    def _addHdlProcToRun(self, trigger: SimSignal, proc) -> None:
+        if self.now == 0 and isEvDependentOn(trigger, proc):
+            # pass event dependent on startup
+            return
+        self._combProcsToRun.append(proc)
+
+    def _initClk(self, model, clk: SimSignal, period: int,
+                 initWait: int) -> None:
+        """
+        Resolve signals and processes of clock domain
+        and check if design is supported by this simulator
+        """
+        models = []
+        _collectSimModels(model, models)
+        copyProcs = {}
+        for m in models:
+            copyProcs.update(m._copyProcesses)
+
+        # resolve signals which are copies of clock
+        clkSignals = UniqList([clk, ])
+        changed = True
+        while changed:
+            changed = False
+            for proc, (src, dst) in copyProcs.items():
+                if src in clkSignals and proc not in self._clkCopyProcs:
+                    clkSignals.append(dst)
+                    self._clkCopyProcs.add(proc)
+                    changed = True
+
+        seqProcs = UniqList()
+        for s in clkSignals:
+            if s.simFallingSensProcs:
+                raise SimException(
+                    "Falling edge dependent processes are not supported",
+                    s, s.simFallingSensProcs)
+            for p in s.simSensProcs:
+                if p not in self._clkCopyProcs:
+                    raise SimException(
+                        "Clock signal used as data is not supported", s, p)
+            seqProcs.extend(s.simRisingSensProcs)
+
+        for m in models:
+            for s in m._ctx.signals:
+                if s in clkSignals:
+                    continue
+                if s.simRisingSensProcs or s.simFallingSensProcs:
+                    raise SimException(
+                        "Multiple clock signals are not supported", s)
+                for p in s.simSensProcs:
+                    if p in seqProcs:
+                        raise SimException(
+                            "Asynchronous processes are not supported", p)
+
+        self._clkSignals = list(clkSignals)
+        self._clkSeqProcs = list(seqProcs)
+        self._stateSignals = [s for m in models for s in m._ctx.signals
+                              if s not in clkSignals]
+
+        p = self.toSimTime(period)
+        self._clkLowTime = p // 2
+        self._clkHighTime = p - self._clkLowTime
+        self._clkNextEdge = self.toSimTime(initWait) + self._clkLowTime
+        self._clkNextRising = True
+        self._setClk(0)
+
+    def _initUnitSignals(self, unit) -> None:
+        for s in unit._ctx.signals:
+            if s.defVal.vldMask:
+                s.simApplyVal(self, s.defVal)
+
+        for u in unit._units:
+            self._initUnitSignals(u)
+
+        for p in unit._processes:
+            if p not in self._clkCopyProcs:
+                self._addHdlProcToRun(None, p)
+
+        for p, outputs in unit._outputs.items():
+            self._outputContainers[p] = (outputs, [None] * len(outputs))
+
+    def _setClk(self, val: int) -> None:
+        """
+        Set value of clock signals without propagation of the change
+        """
+        clk = self._clkSignals[0]
+        v = clk._dtype.getValueCls()(val, clk._dtype, 1, self.now)
+        log = self.config.logChange
+        for s in self._clkSignals:
+            s._val = s._oldVal = v
+            if log:
+                log(self.now, s, v)
+
+    def _clkEdge(self) -> None:
+        """
+        Perform edge of clock and run per-cycle hooks of agents
+        """
+        rising = self._clkNextRising
+        self._setClk(int(rising))
+        if rising:
+            self._clkLastRising = self.now
+            self.clkCycles += 1
+            self._clkNextEdge += self._clkHighTime
+        else:
+            self._clkNextEdge += self._clkLowTime
+        self._clkNextRising = not rising
+
+        ready = self._readyProcs
+        for s in self._clkSignals:
+            if s._writeCallbacksToEn:
+                s._loadWriteCallbacks()
+
+            for c in s._writeCallbacks:
+                if not c:
+                    continue
+                d = getattr(c, "__self__", None)
+                if not isinstance(d, CallbackLoopDispatcher):
+                    ready.append(c(self))
+                    continue
+
+                # run callbacks of agents directly
+                for loop in d.activeLoops(self):
+                    if loop.isGenerator:
+                        ready.append(loop.fn(self))
+                    else:
+                        afterComb = loop.fn(self)
+                        if afterComb is not None:
+                            self._combWaiters.append(afterComb)
+
+        if rising:
+            self._seqProcsToRun.extend(self._clkSeqProcs)
+
+    def _clkIdleUntil(self):
+        """
+        Resolve if clock cycle which starts now can be skipped
+
+        :return: None if there can be some change in this clock cycle
+            else time until which clock cycles can be skipped
+        """
+        lastRising = self._clkLastRising
+        if (lastRising is None
+                or self._readyProcs
+                or self._combWaiters
+                or self._seqProcsToRun):
+            return None
+
+        idleUntil = self._events.peekTime()
+        if idleUntil is None:
+            idleUntil = IDLE_FOREVER
+
+        for s in self._clkSignals:
+            if s._writeCallbacksToEn:
+                return None
+            for c in s._writeCallbacks:
+                if not c:
+                    continue
+                d = getattr(c, "__self__", None)
+                if not isinstance(d, CallbackLoopDispatcher):
+                    return None
+                t = d.idleUntil(self)
+                if t is None or t <= self.now:
+                    return None
+                idleUntil = min(idleUntil, t)
+
+        # check if there was any change in last clock period
+        s = self._lastActiveSig
+        if s is not None and s._val.updateTime >= lastRising:
+            return None
+        for s in self._stateSignals:
+            if s._val.updateTime >= lastRising:
+                self._lastActiveSig = s
+                return None
+
+        return idleUntil
+
+    def _skipIdleCycles(self, until: int) -> None:
+        """
+        Skip whole clock periods before until or before time when some
+        agent stops to be idle or some calendar event happens
+        """
+        idleUntil = self._clkIdleUntil()
+        if idleUntil is None:
+            return
+
+        idleUntil = min(idleUntil, until)
+        period = self._clkLowTime + self._clkHighTime
+        cycles = (idleUntil - self.now) // period
+        if cycles > 0:
+            if self.config.logChange:
+                self._logSkippedClkEdges(cycles)
+            self._clkNextEdge += cycles * period
+            self.clkCycles += cycles
+            self.skippedClkCycles += cycles
+
+    def _logSkippedClkEdges(self, cycles: int) -> None:
+        """
+        Report edges of clock in skipped clock cycles to config
+        (VCD, waveform...), so the clock in the trace is continuous
+        """
+        clkSignals = self._clkSignals
+        t = clkSignals[0]._dtype
+        valCls = t.getValueCls()
+        period = self._clkLowTime + self._clkHighTime
+        rising = self._clkNextEdge
+        end = rising + cycles * period
+        v = None
+        while rising < end:
+            for time, val in ((rising, 1), (rising + self._clkHighTime, 0)):
+                log = self.config.logChange
+                if not log:
+                    # f.e. end of time window of VCD
+                    rising = end
+                    break
+                # same as _setClk
+                v = valCls(val, t, 1, time)
+                for s in clkSignals:
+                    s._val = s._oldVal = v
+                    log(time, s, v)
+            rising += period
+
+        if v is not None and v.val:
+            # clock is low before next rising edge
+            v = valCls(0, t, 1, v.updateTime)
+            for s in clkSignals:
+                s._val = s._oldVal = v
+
+    def _runProcess(self, proc) -> None:
+        """
+        Run simulation process until it blocks
+        """
+        while True:
+            try:
+                ev = next(proc)
+            except StopIteration:
+                return
+
+            if isinstance(ev, Wait):
+                self._events.push(self.now + ev.time, PRIORITY_NORMAL, proc)
+                return
+            elif isinstance(ev, Event):
+                self._combWaiters.append(proc)
+                return
+            else:
+                # new process spotted
+                self._readyProcs.append(ev)
+
+    def _settleComb(self) -> None:
+        """
+        Evaluate scheduled combinational processes in levelized order
+        """
+        q = self._combProcsToRun
+        addSp = self._seqProcsToRun.append
+        outputContainers = self._outputContainers
+        while q:
+            proc = q.pop()
+            outputs, io = outputContainers[proc]
+            proc(self, io)
+            for i, update in enumerate(io):
+                if update is not None:
+                    io[i] = None
+                    if update[-1]:
+                        # isEvDependent on startup
+                        addSp(proc)
+                    else:
+                        applyUpdate(self, outputs[i], update)
+
+    def _commitSeqProcesses(self) -> None:
+        """
+        Evaluate all event dependent processes and apply their outputs
+        """
+        updates = []
+        outputContainers = self._outputContainers
+        for proc in self._seqProcsToRun:
+            try:
+                outContainer = outputContainers[proc]
+            except KeyError:
+                # processes does not have to have outputs
+                proc(self, None)
+                continue
+
+            proc(self, outContainer[1])
+            updates.append(outContainer)
+
+        self._seqProcsToRun = UniqList()
+
+        for outputs, io in updates:
+            for i, update in enumerate(io):
+                if update is not None:
+                    io[i] = None
+                    applyUpdate(self, outputs[i], update)
+
+    def _evalTimeStep(self) -> None:
+        """
+        Run ready simulation processes, settle combinational logic
+        and commit event dependent processes in actual time
+        """
+        ready = self._readyProcs
+        runProcess = self._runProcess
+        while True:
+            while ready:
+                runProcess(ready.popleft())
+
+            self._settleComb()
+
+            if self._combWaiters:
+                waiters = self._combWaiters
+                self._combWaiters = []
+                for p in waiters:
+                    if callable(p):
+                        # continuation of callback of agent
+                        p(self)
+                    else:
+                        runProcess(p)
+            elif self._seqProcsToRun:
+                self._commitSeqProcesses()
+            elif not ready:
+                return
+
+    def run(self, until: int) -> None:
+        """
+        Run simulation until specified time
+        :note: can be used to run simulation again after it ends
+            from time when it ends
+        """
+        until = self.toSimTime(until)
+        assert until > self.now
+        events = self._events
+        ready = self._readyProcs
+        try:
+            while True:
+                procTime = events.peekTime()
+                if procTime is not None and procTime <= self._clkNextEdge:
+                    t = procTime
+                else:
+                    t = self._clkNextEdge
+                    procTime = None
+
+                if t >= until:
+                    self.now = until
+                    return
+
+                self.now = t
+                if procTime is None:
+                    if self._clkNextRising and self.skipIdleCycles:
+                        self._skipIdleCycles(until)
+                        if self._clkNextEdge != t:
+                            continue
+                    self._clkEdge()
+                else:
+                    while events.peekTime() == t:
+                        ready.append(events.pop()[2])
+
+                self._evalTimeStep()
+        except StopSimumulation:
+            return
+        finally:
+            afterRun = self.config.afterRun
+            if afterRun is not None:
+                afterRun(self)
+
+    def simUnit(self, synthesisedUnit, until: int, extraProcesses=[]):
+        """
+        Run simulation for Unit instance
+
+        :param extraProcesses: simulation processes (driver of OscilatorAgent
+            for clock of the unit is required)
+        """
+        clkAgent = None
+        procs = []
+        for p in extraProcesses:
+            if getattr(p, "__func__", None) is OscilatorAgent.driver:
+                if clkAgent is not None:
+                    raise SimException(
+                        "Multiple clock signals are not supported",
+                        clkAgent.intf, p.__self__.intf)
+                clkAgent = p.__self__
+            else:
+                procs.append(p)
+
+        if clkAgent is None:
+            raise SimException("Clock driver (OscilatorAgent) not found")
+
+        beforeSim = self.config.beforeSim
+        if beforeSim is not None:
+            beforeSim(self, synthesisedUnit)
+
+        self._initClk(synthesisedUnit, clkAgent.intf,
+                      clkAgent.period, clkAgent.initWait)
+        self._combProcsToRun = LevelizedProcQueue(
+            levelizeProcesses(synthesisedUnit))
+
+        for p in procs:
+            self._readyProcs.append(p(self))
+
+        self._initUnitSignals(synthesisedUnit)
+        self._evalTimeStep()
+        self.run(until)
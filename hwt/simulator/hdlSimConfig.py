@@ -2,13 +2,23 @@
 class HdlSimConfig():
     """
     Container of configuration of hdl simulator
+
+    Subclasses override hook methods and call __init__ of this class,
+    hooks which are not overridden are set to None and they are not called
+    by simulator at all.
+
+    :cvar HOOKS: names of hook methods called by simulator
     """
+    HOOKS = ("beforeSim", "logChange", "logPropagation",
+             "logApplyingValues", "afterRun")
+
     def __init__(self):
-        # set to None to prevent redundant calls
-        self.beforeSim = None
-        self.logChange = None
-        self.logPropagation = None
-        self.logApplyingValues = None
+        # hooks which are not overridden in subclass are set to None
+        # to prevent redundant calls
+        cls = self.__class__
+        for name in self.HOOKS:
+            if getattr(cls, name) is getattr(HdlSimConfig, name):
+                setattr(self, name, None)
 
     def beforeSim(self, simulator, synthesisedUnit):
         """
@@ -29,3 +39,8 @@ class HdlSimConfig():
         """
         Log simulator value quantum applied
         """
+
+    def afterRun(self, simulator):
+        """
+        called after each run of simulation (f.e. to flush output files)
+        """
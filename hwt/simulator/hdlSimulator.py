@@ -1,10 +1,14 @@
+from collections import deque
 from heapq import heappush, heappop
-from typing import Tuple, Generator, Callable
+from typing import Tuple, Generator, Optional
 
+from hwt.hdl.constants import Time
+from hwt.hdl.types.bitValFunctions import signFix
+from hwt.hdl.types.bool import HBool
 from hwt.hdl.value import Value
 from hwt.pyUtils.uniqList import UniqList
 from hwt.simulator.hdlSimConfig import HdlSimConfig
-from hwt.simulator.simModel import mkUpdater, mkArrayUpdater
+from hwt.simulator.levelization import LevelizedProcQueue, levelizeProcesses
 from hwt.simulator.simSignal import SimSignal
 from hwt.simulator.utils import valueHasChanged
 from hwt.synthesizer.unit import Unit
@@ -21,20 +25,18 @@ def isEvDependentOn(sig, process) -> bool:
         or process in sig.simRisingSensProcs
 
 
-class IoContainer():
+def applyUpdate(sim, sig: SimSignal, update: tuple) -> None:
     """
-    Container for outputs of process
-    """
-    __slots__ = ["_all_signals"]
+    Apply update written by hdl process to io slot of signal
 
-    def __init__(self, dstSignalsTuples):
-        """
-        :param dstSignalsTuples: tuples (name, signal)
-        """
-        self._all_signals = []
-        for name, s in dstSignalsTuples:
-            setattr(self, name, None)
-            self._all_signals.append([name, s])
+    :param update: tuple (value, isEvDependent)
+        or (item value, indexes, isEvDependent) for update of array item
+    """
+    if len(update) == 3:
+        val, indexes, _ = update
+        sig.simApplyItemVal(sim, indexes, val)
+    else:
+        sig.simApplyVal(sim, update[0])
 
 
 class Wait(BaseException):
@@ -42,6 +44,9 @@ class Wait(BaseException):
     Container for wait time of processes
 
     next activation of process will be now + time
+
+    :note: use HdlSimulator.wait() to create it, it rounds the time
+        to integer time of the simulator
     """
 
     def __init__(self, time):
@@ -84,40 +89,81 @@ def raise_StopSimulation(sim):
     yield
 
 
-class CalendarItem():
-    def __init__(self, time, priority, value):
-        self.key = (time, priority)
-        self.value = value
-
-    def __lt__(self, other):
-        return self.key < other.key
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = PRIORITY_URGENT + 1
+# updating of combinational signals (wire updates)
+PRIORITY_APPLY_COMB = PRIORITY_NORMAL + 1
+# simulation agents waiting for combUpdate event
+PRIORITY_AGENTS_UPDATE_DONE = PRIORITY_APPLY_COMB + 1
+# updateing of event dependent signals (writing in gegisters,rams etc)
+PRIORITY_APPLY_SEQ = PRIORITY_AGENTS_UPDATE_DONE + 1
+PRIORITY_CNT = PRIORITY_APPLY_SEQ + 1
 
 
 class SimCalendar():
     """
     Priority queue where key is time and priority
+
+    Events are stored in buckets (one bucket for each time),
+    bucket has FIFO for every priority level. Heap is used only to keep
+    distinct times of buckets ordered.
+
+    :ivar _times: heap of times of buckets
+    :ivar _buckets: dictionary {time: tuple of deque for each priority}
     """
+    __slots__ = ["_times", "_buckets", "_priorityCnt"]
 
-    def __init__(self):
-        self._q = []
+    def __init__(self, priorityCnt: int=PRIORITY_CNT):
+        self._times = []
+        self._buckets = {}
+        self._priorityCnt = priorityCnt
 
-    def push(self, time: float, priority: int, value):
-        item = CalendarItem(time, priority, value)
-        heappush(self._q, item)
+    def push(self, time: int, priority: int, value):
+        try:
+            b = self._buckets[time]
+        except KeyError:
+            b = tuple(deque() for _ in range(self._priorityCnt))
+            self._buckets[time] = b
+            heappush(self._times, time)
 
-    def pop(self) -> Tuple[float, int, object]:
-        item = heappop(self._q)
-        return (*item.key, item.value)
+        b[priority].append(value)
 
+    def pop(self) -> Tuple[int, int, object]:
+        times = self._times
+        buckets = self._buckets
+        while True:
+            # raises IndexError if calendar is empty (same as heappop)
+            time = times[0]
+            for priority, q in enumerate(buckets[time]):
+                if q:
+                    return (time, priority, q.popleft())
 
-PRIORITY_URGENT = 0
-PRIORITY_NORMAL = PRIORITY_URGENT + 1
-# updating of combinational signals (wire updates)
-PRIORITY_APPLY_COMB = PRIORITY_NORMAL + 1
-# simulation agents waiting for combUpdate event
-PRIORITY_AGENTS_UPDATE_DONE = PRIORITY_APPLY_COMB + 1
-# updateing of event dependent signals (writing in gegisters,rams etc)
-PRIORITY_APPLY_SEQ = PRIORITY_AGENTS_UPDATE_DONE + 1
+            # bucket is empty, there is nothing to do in this time
+            heappop(times)
+            del buckets[time]
+
+    def __len__(self) -> int:
+        """
+        :return: number of events in calendar
+        """
+        return sum(len(q) for b in self._buckets.values() for q in b)
+
+    def peekTime(self) -> Optional[int]:
+        """
+        :return: time of the first event or None if calendar is empty
+        """
+        times = self._times
+        buckets = self._buckets
+        while times:
+            time = times[0]
+            for q in buckets[time]:
+                if q:
+                    return time
+
+            heappop(times)
+            del buckets[time]
+
+        return None
 
 
 class HdlSimulator():
@@ -128,8 +174,9 @@ class HdlSimulator():
         Every signal is initialized at start with its default value
 
     .. note:: *Communication between processes*
-        For each output for every process there is an IoContainer instance
-        which is container container of updates to signals.
+        For every process there is an io list with slot for each output
+        of process, process writes updates of signals to slots
+        of this list by index.
         Every process has (generated) sensitivity-list.
         Process is reevaluated when there is a new value on any signal
         from sensitivity list.
@@ -163,7 +210,10 @@ class HdlSimulator():
         and then can not write in this time. (Agent can be realized by multiple
         simulation processes.)
 
-    :ivar now: actual simulation time
+    :ivar now: actual simulation time (int, in units of
+        :class:`hwt.hdl.constants.Time`, multiple of timeResolution)
+    :ivar timeResolution: smallest time step of simulation
+        (in units of :class:`hwt.hdl.constants.Time`)
     :ivar _combUpdateDonePlaned: flag, True if event for combinational
         update is planed, this event is triggered
         when there are not any combinational signal updates in this time
@@ -174,22 +224,31 @@ class HdlSimulator():
     :ivar _valuesToApply: is container of values
         which should be applied in this delta step
     :ivar _combProcsToRun: list of hdl processes to run
+        (LevelizedProcQueue if levelized)
+    :ivar levelized: if True combinational processes are evaluated
+        in topological order resolved in simUnit, outputs of process
+        are applied immediately and each process is evaluated at most once
+        per settle of combinational logic (if there is not any
+        combinational loop)
     :ivar _seqProcsToRun: list of rising/falling event dependent processes
         which should be evaluated after all combinational changes are applied
-    :ivar _outputContainers: dictionary {SimSignal:IoContainer} for each hdl process
-    :ivar _events: heap of simulation events and processes
+    :ivar _outputContainers: dictionary {hdl process: (tuple of output
+        signals, io list with slot for every output)}
+    :ivar _events: calendar of simulation events and processes
     """
 
-    wait = Wait
-
-    def __init__(self, config=None):
+    def __init__(self, config=None, timeResolution: int=Time.ps,
+                 levelized: bool=False):
         super(HdlSimulator, self).__init__()
         if config is None:
             # default config
             config = HdlSimConfig()
 
         self.config = config
-        self.now = 0.0
+        assert isinstance(timeResolution, int) and timeResolution > 0, \
+            timeResolution
+        self.timeResolution = timeResolution
+        self.now = 0
 
         self._combUpdateDonePlaned = False
         self._applyValPlaned = False
@@ -205,6 +264,32 @@ class HdlSimulator():
         self._outputContainers = {}
         self._events = SimCalendar()
 
+        self.levelized = levelized
+        if levelized:
+            self._runCombProcesses = self._runCombProcessesLevelized
+
+    def toSimTime(self, time) -> int:
+        """
+        Convert time to integer simulation time
+        (round it to nearest multiple of timeResolution)
+        """
+        res = self.timeResolution
+        if isinstance(time, int):
+            if res == 1:
+                return time
+            return ((time + res // 2) // res) * res
+        else:
+            return int(round(time / res)) * res
+
+    def wait(self, time) -> Wait:
+        """
+        Sim processes can wait by:
+        yield sim.wait(time)
+
+        :param time: time to wait, rounded to timeResolution
+        """
+        return Wait(self.toSimTime(time))
+
     def _add_process(self, proc, priority) -> None:
         """
         Schedule process on actual time with specified priority
@@ -253,8 +338,7 @@ class HdlSimulator():
         # set initial value to all signals and propagate it
         for s in unit._ctx.signals:
             if s.defVal.vldMask:
-                v = s.defVal.clone()
-                s.simUpdateVal(self, mkUpdater(v, False))
+                s.simApplyVal(self, s.defVal)
 
         for u in unit._units:
             self._initUnitSignals(u)
@@ -263,14 +347,7 @@ class HdlSimulator():
             self._addHdlProcToRun(None, p)
 
         for p, outputs in unit._outputs.items():
-            # name has to be explicit because it may be possible that signal
-            # with has this name was replaced by signal from parent/child
-            containerNames = list(map(lambda x: x[0], outputs))
-
-            class SpecificIoContainer(IoContainer):
-                __slots__ = containerNames
-
-            self._outputContainers[p] = SpecificIoContainer(outputs)
+            self._outputContainers[p] = (outputs, [None] * len(outputs))
 
     def __deleteCombUpdateDoneEv(self) -> Generator[None, None, None]:
         """
@@ -309,45 +386,54 @@ class HdlSimulator():
         self._add_process(self._runSeqProcesses(), PRIORITY_APPLY_SEQ)
         self._runSeqProcessesPlaned = True
 
-    def _conflictResolveStrategy(self, newValue: set)\
-            -> Tuple[Callable[[Value], bool], bool]:
-        """
-        This functions resolves write conflicts for signal
-
-        :param actionSet: set of actions made by process
-        """
-
-        invalidate = False
-        resLen = len(newValue)
-        if resLen == 3:
-            # update for item in array
-            val, indexes, isEvDependent = newValue
-            return (mkArrayUpdater(val, indexes, invalidate), isEvDependent)
-        else:
-            # update for simple signal
-            val, isEvDependent = newValue
-            return (mkUpdater(val, invalidate), isEvDependent)
-
     def _runCombProcesses(self) -> None:
         """
         Delta step for combinational processes
         """
+        va = self._valuesToApply
         for proc in self._combProcsToRun:
-            cont = self._outputContainers[proc]
-            proc(self, cont)
-            for sigName, sig in cont._all_signals:
-                newVal = getattr(cont, sigName)
-                if newVal is not None:
-                    res = self._conflictResolveStrategy(newVal)
+            outputs, io = self._outputContainers[proc]
+            proc(self, io)
+            for i, update in enumerate(io):
+                if update is not None:
                     # prepare update
-                    updater, isEvDependent = res
-                    self._valuesToApply.append(
-                        (sig, updater, isEvDependent, proc))
-                    setattr(cont, sigName, None)
-                    # else value is latched
+                    va.append((outputs[i], update, proc))
+                    io[i] = None
+                # else value is latched
 
         self._combProcsToRun = UniqList()
 
+    def _runCombProcessesLevelized(self) -> None:
+        """
+        Delta step for combinational processes in levelized mode,
+        processes are evaluated in topological order and their outputs
+        are applied immediately
+        """
+        q = self._combProcsToRun
+        addSp = self._seqProcsToRun.append
+        lav = self.config.logApplyingValues
+        # updates are applied in this delta step,
+        # there is no need to plan next one
+        self._applyValPlaned = True
+        while q:
+            proc = q.pop()
+            outputs, io = self._outputContainers[proc]
+            proc(self, io)
+            for i, update in enumerate(io):
+                if update is not None:
+                    io[i] = None
+                    sig = outputs[i]
+                    if lav:
+                        lav(self, [(sig, update, proc)])
+
+                    if update[-1]:
+                        # isEvDependent, now=0 and this was process
+                        # initialization or async reg
+                        addSp(proc)
+                    else:
+                        applyUpdate(self, sig, update)
+        self._applyValPlaned = False
+
     def _runSeqProcesses(self) -> Generator[None, None, None]:
         """
         Delta step for event dependent processes
@@ -358,24 +444,20 @@ class HdlSimulator():
                 outContainer = self._outputContainers[proc]
             except KeyError:
                 # processes does not have to have outputs
-                outContainer = None
+                proc(self, None)
+                continue
 
-            proc(self, outContainer)
-
-            if outContainer is not None:
-                updates.append(outContainer)
+            proc(self, outContainer[1])
+            updates.append(outContainer)
 
         self._seqProcsToRun = UniqList()
         self._runSeqProcessesPlaned = False
 
-        for cont in updates:
-            for sigName, sig in cont._all_signals:
-                newVal = getattr(cont, sigName)
-                if newVal is not None:
-                    v = self._conflictResolveStrategy(newVal)
-                    updater, _ = v
-                    sig.simUpdateVal(self, updater)
-                    setattr(cont, sigName, None)
+        for outputs, io in updates:
+            for i, update in enumerate(io):
+                if update is not None:
+                    io[i] = None
+                    applyUpdate(self, outputs[i], update)
         return
         yield
 
@@ -396,13 +478,14 @@ class HdlSimulator():
         # but each signal should be driven by only one process and
         # it should resolve value collision
         addSp = self._seqProcsToRun.append
-        for s, vUpdater, isEventDependent, comesFrom in va:
-            if isEventDependent:
+        for s, update, comesFrom in va:
+            if update[-1]:
+                # isEvDependent,
                 # now=0 and this was process initialization or async reg
                 addSp(comesFrom)
             else:
                 # regular combinational process
-                s.simUpdateVal(self, vUpdater)
+                applyUpdate(self, s, update)
 
         self._runCombProcesses()
 
@@ -416,13 +499,16 @@ class HdlSimulator():
     def read(self, sig) -> Value:
         """
         Read value from signal or interface
+
+        :attention: returned value is shared with the signal
+            (values in signals are not modified, new value object is set
+            on each change), it should not be modified,
+            use clone() if you need to do so
         """
         try:
-            v = sig._val
+            return sig._val
         except AttributeError:
-            v = sig._sigInside._val
-
-        return v.clone()
+            return sig._sigInside._val
 
     def write(self, val, sig: SimSignal)-> None:
         """
@@ -435,19 +521,84 @@ class HdlSimulator():
             sig = sig._sigInside
             simSensProcs = sig.simSensProcs
 
-        # type cast of input value
-        t = sig._dtype
-
         if isinstance(val, Value):
-            v = val.clone()
-            v = v._auto_cast(t)
+            # type cast of input value
+            # (value is copied only if it is applied)
+            sig.simApplyVal(self, val._auto_cast(sig._dtype))
+        else:
+            cur = sig._oldVal
+            if not (isinstance(val, int)
+                    and cur.val == val
+                    and cur._isFullVld()):
+                v = sig._dtype.fromPy(val)
+                if valueHasChanged(cur, v):
+                    # v is a new object, there is no need to copy it
+                    sig.simSetNewVal(self, v)
+
+        self._afterWrite(sig, simSensProcs)
+
+    def readInt(self, sig) -> Optional[int]:
+        """
+        Read value of signal or interface as int
+        (for Bits/HBool signals, faster than read() + valToInt())
+
+        :return: value or None if value is not fully valid
+        """
+        try:
+            v = sig._val
+        except AttributeError:
+            v = sig._sigInside._val
+
+        if v._isFullVld():
+            return v.val
+        return None
+
+    def writeInt(self, val: Optional[int], sig,
+                 vldMask: Optional[int]=None) -> None:
+        """
+        Write int to signal or interface
+        (for Bits/HBool signals, faster than write(), because there is no
+        type conversion and new value object is created only on change)
+
+        :param val: value or None for invalid value, value is masked
+            to the width of the signal (and its invalid bits are cleared)
+            and converted to bool for HBool signal as in fromPy()
+        :param vldMask: validity mask, if None value is fully valid
+        """
+        try:
+            simSensProcs = sig.simSensProcs
+        except AttributeError:
+            sig = sig._sigInside
+            simSensProcs = sig.simSensProcs
+
+        t = sig._dtype
+        if val is None:
+            val = 0
+            vldMask = 0
         else:
-            v = t.fromPy(val)
+            allMask = t.all_mask()
+            if vldMask is None:
+                vldMask = allMask
+            else:
+                vldMask &= allMask
 
-        # can not update value in signal directly due singnal proxies
-        sig.simUpdateVal(self, lambda curentV: (
-            valueHasChanged(curentV, v), v))
+            if isinstance(t, HBool):
+                val = bool(val) and bool(vldMask)
+            else:
+                val &= vldMask
+                if t.signed:
+                    val = signFix(val, t.bit_length())
+
+        cur = sig._oldVal
+        if cur.vldMask != vldMask or cur.val != val:
+            sig.simSetNewVal(self, t.getValueCls()(val, t, vldMask))
+
+        self._afterWrite(sig, simSensProcs)
 
+    def _afterWrite(self, sig: SimSignal, simSensProcs) -> None:
+        """
+        Plan delta step after write from simulation process if required
+        """
         if not self._applyValPlaned:
             if not (simSensProcs or
                     sig.simRisingSensProcs or
@@ -463,11 +614,12 @@ class HdlSimulator():
                 # updateComplete event
                 self._scheduleApplyValues()
 
-    def run(self, until: float) -> None:
+    def run(self, until: int) -> None:
         """
         Run simulation until specified time
         :note: can be used to run simulation again after it ends from time when it ends
         """
+        until = self.toSimTime(until)
         assert until > self.now
         events = self._events
         schedule = events.push
@@ -510,6 +662,10 @@ class HdlSimulator():
 
         except StopSimumulation:
             return
+        finally:
+            afterRun = self.config.afterRun
+            if afterRun is not None:
+                afterRun(self)
 
     def add_process(self, proc) -> None:
         """
@@ -517,7 +673,7 @@ class HdlSimulator():
         """
         self._events.push(self.now, PRIORITY_NORMAL, proc)
 
-    def simUnit(self, synthesisedUnit, until: float, extraProcesses=[]):
+    def simUnit(self, synthesisedUnit, until: int, extraProcesses=[]):
         """
         Run simulation for Unit instance
         """
@@ -529,5 +685,9 @@ class HdlSimulator():
         for p in extraProcesses:
             add_proc(p(self))
 
+        if self.levelized:
+            self._combProcsToRun = LevelizedProcQueue(
+                levelizeProcesses(synthesisedUnit))
+
         self._initUnitSignals(synthesisedUnit)
         self.run(until)
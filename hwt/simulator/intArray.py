@@ -0,0 +1,39 @@
+from array import array
+from typing import Optional, Union
+
+
+def intArrayTypecode(width: int, signed: bool) -> Optional[str]:
+    """
+    :return: typecode of smallest array.array item which can hold value
+        of specified width or None if value does not fit to 64b
+    """
+    for tc in ("bhiq" if signed else "BHIQ"):
+        if array(tc).itemsize * 8 >= width:
+            return tc
+    return None
+
+
+def intArrayFull(typecode: Optional[str], n: int, v: int=0
+                 ) -> Union[array, list]:
+    """
+    :param typecode: typecode from :func:`~.intArrayTypecode`
+    :return: array of n items with value v, list of python ints
+        if typecode is None (items wider than 64b)
+    """
+    if typecode is None:
+        return [v for _ in range(n)]
+    if v == 0:
+        return array(typecode, bytes(n * array(typecode).itemsize))
+    return array(typecode, (v, )) * n
+
+
+def intArrayToNumpy(a: Union[array, list]):
+    """
+    :return: copy of array from :func:`~.intArrayFull` as numpy array,
+        list of python ints is converted to array with dtype=object
+    """
+    import numpy as np
+    if isinstance(a, list):
+        return np.array(a, dtype=object)
+    # copy, array.array can not grow while its buffer is exported
+    return np.array(a)
@@ -0,0 +1,200 @@
+from typing import Dict, List, Set
+
+from hwt.hdl.types.bits import Bits
+from hwt.hdl.types.bool import HBool
+from hwt.simulator.exceptions import SimException
+from hwt.simulator.simModel import SimModel, _collectSimModels
+from hwt.simulator.simSignal import SimSignal
+
+
+class LanePackProcess():
+    """
+    Hdl process which packs values of signals of all lanes
+    to a port signal of lane model
+
+    :ivar dtype: type of port signal
+    :ivar laneSignals: signals of lanes (lane 0 first)
+    :ivar stride: width of lane slot
+    """
+
+    def __init__(self, dtype, laneSignals: List[SimSignal], stride: int):
+        self.dtype = dtype
+        self.laneSignals = laneSignals
+        self.stride = stride
+
+    def __call__(self, sim, io):
+        val = 0
+        vld = 0
+        offset = 0
+        stride = self.stride
+        for s in self.laneSignals:
+            v = s._oldVal
+            val |= v.val << offset
+            vld |= v.vldMask << offset
+            offset += stride
+
+        t = self.dtype
+        io[0] = (t.getValueCls()(val, t, vld), False)
+
+
+class LaneUnpackProcess():
+    """
+    Hdl process which splits value of port signal of lane model
+    to signals of lanes
+
+    :ivar src: port signal
+    :ivar stride: width of lane slot
+    :ivar lanes: number of lanes
+    """
+
+    def __init__(self, src: SimSignal, stride: int, lanes: int):
+        self.src = src
+        self.stride = stride
+        self.lanes = lanes
+
+    def __call__(self, sim, io):
+        v = self.src._oldVal
+        t = self.src._dtype
+        valCls = t.getValueCls()
+        m = t.all_mask()
+        val = v.val
+        vld = v.vldMask
+        stride = self.stride
+        for i in range(self.lanes):
+            io[i] = (valCls(val & m, t, vld & m), False)
+            val >>= stride
+            vld >>= stride
+
+
+def laneClockSignals(models: List[SimModel]) -> Set[SimSignal]:
+    """
+    :return: signals which are used as clock (they are used in edge
+        sensitivity or they are copy of such signal),
+        these signals are common for all lanes
+    """
+    copyProcs = {}
+    for m in models:
+        copyProcs.update(m._copyProcesses)
+
+    clkSignals = set()
+    for m in models:
+        for s in m._ctx.signals:
+            if s.simRisingSensProcs or s.simFallingSensProcs:
+                clkSignals.add(s)
+
+    changed = True
+    while changed:
+        changed = False
+        for src, dst in copyProcs.values():
+            # clock can be connected through ports in both directions
+            if (src in clkSignals) != (dst in clkSignals):
+                clkSignals.add(src)
+                clkSignals.add(dst)
+                changed = True
+
+    for m in models:
+        for p, outputs in m._outputs.items():
+            if p in copyProcs:
+                continue
+            for o in outputs:
+                if o in clkSignals:
+                    raise SimException(
+                        "Clock signal driven by logic is not supported"
+                        " in lane simulation", o)
+
+    for s in clkSignals:
+        for p in s.simSensProcs:
+            if p not in copyProcs:
+                raise SimException(
+                    "Clock signal used as data is not supported"
+                    " in lane simulation", s, p)
+
+    return clkSignals
+
+
+def initLaneSimModel(model: SimModel, lanes: int
+                     ) -> Dict[SimSignal, List[SimSignal]]:
+    """
+    Configure instance of model generated by SimModelLaneSerializer
+    to simulate specified number of independent lanes
+
+    For each port (except clock) a signal is created for every lane
+    and hdl process which packs/unpacks lane values from/to the port
+    is added to model, default values of all signals are replicated
+    to all lanes
+
+    :return: dictionary {port signal: list of signals of lanes}
+        (clock signals are common for all lanes and they are not present)
+    """
+    assert lanes > 0, lanes
+    models = []
+    _collectSimModels(model, models)
+    clkSignals = laneClockSignals(models)
+
+    width = 1
+    for m in models:
+        for p in m._processes:
+            if p in m._copyProcesses:
+                continue
+            try:
+                w = p.laneWidth
+            except AttributeError:
+                raise SimException(
+                    "Model was not generated by SimModelLaneSerializer", p)
+            width = max(width, w)
+
+        for s in m._ctx.signals:
+            if isinstance(s._dtype, (Bits, HBool)):
+                width = max(width, s._dtype.bit_length())
+
+    # + guard bit for carries of arithmetic and comparisons
+    stride = width + 1
+    laneOnes = 0
+    for i in range(lanes):
+        laneOnes |= 1 << (i * stride)
+
+    driven = set()
+    for p, outputs in model._outputs.items():
+        driven.update(outputs)
+
+    laneSignals = {}
+    for p in model._ports:
+        if p in clkSignals:
+            continue
+        laneSignals[p] = [SimSignal(model._ctx, "%s_%d" % (p.name, i),
+                                    p._dtype, defVal=p.defVal)
+                          for i in range(lanes)]
+
+    allLaneSignals = set()
+    for sigs in laneSignals.values():
+        allLaneSignals.update(sigs)
+
+    for m in models:
+        m._laneOnes = laneOnes
+        for s in m._ctx.signals:
+            if s in clkSignals or s in allLaneSignals:
+                continue
+            if not isinstance(s._dtype, (Bits, HBool)):
+                raise SimException(
+                    "Type is not supported in lane simulation", s)
+            d = s.defVal
+            s.defVal = d.__class__(int(d.val) * laneOnes, d._dtype,
+                                   d.vldMask * laneOnes)
+            s._setDefValue()
+            # read bits are same in all lanes
+            for p, sm in s.simSensMasks.items():
+                s.simSensMasks[p] = sm * laneOnes
+
+    for p, sigs in laneSignals.items():
+        if p in driven:
+            proc = LaneUnpackProcess(p, stride, lanes)
+            p.simSensProcs.add(proc)
+            model._outputs[proc] = tuple(sigs)
+        else:
+            proc = LanePackProcess(p._dtype, sigs, stride)
+            for s in sigs:
+                s.simSensProcs.add(proc)
+            model._outputs[proc] = (p, )
+        model._processes.append(proc)
+
+    return laneSignals
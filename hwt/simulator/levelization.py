@@ -0,0 +1,140 @@
+from heapq import heappush, heappop
+from typing import Dict, List
+
+
+def collectProcesses(unit, procs: List, outputs: Dict) -> None:
+    """
+    Collect hdl processes and their outputs from simulation model
+    and all its submodels
+
+    :param procs: list where processes should be appended
+    :param outputs: dictionary {process: tuple of output SimSignals}
+        where outputs of processes should be stored
+    """
+    procs.extend(unit._processes)
+    outputs.update(unit._outputs)
+    for u in unit._units:
+        collectProcesses(u, procs, outputs)
+
+
+def levelizeProcesses(unit) -> Dict[object, int]:
+    """
+    Topologically sort hdl processes of simulation model by dependencies
+    through combinational sensitivity (process q depends on process p
+    if q is sensitive to any output of p)
+
+    Processes in combinational loop (strongly connected component)
+    are placed next to each other, order in the loop is not defined.
+
+    :return: dictionary {process: order}, order is unique int for each process
+    """
+    procs = []
+    outputs = {}
+    collectProcesses(unit, procs, outputs)
+
+    successors = {}
+    for p in procs:
+        succ = []
+        for s in outputs.get(p, ()):
+            succ.extend(s.simSensProcs)
+        successors[p] = succ
+
+    sccs = _stronglyConnectedComponents(procs, successors)
+    # tarjan algorithm discovers components in reverse topological order
+    sccs.reverse()
+
+    order = {}
+    for scc in sccs:
+        for p in scc:
+            order[p] = len(order)
+
+    return order
+
+
+def _stronglyConnectedComponents(nodes, successors) -> List[List[object]]:
+    """
+    Tarjan's algorithm (iterative to avoid recursion limit on deep netlists)
+
+    :return: list of strongly connected components
+        in reverse topological order
+    """
+    index = {}
+    lowlink = {}
+    onStack = set()
+    stack = []
+    res = []
+
+    for root in nodes:
+        if root in index:
+            continue
+
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        onStack.add(root)
+        work = [(root, iter(successors.get(root, ())))]
+        while work:
+            n, succIt = work[-1]
+            for s in succIt:
+                if s not in index:
+                    index[s] = lowlink[s] = len(index)
+                    stack.append(s)
+                    onStack.add(s)
+                    work.append((s, iter(successors.get(s, ()))))
+                    break
+                elif s in onStack:
+                    lowlink[n] = min(lowlink[n], index[s])
+            else:
+                # all successors of n were resolved
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[n])
+
+                if lowlink[n] == index[n]:
+                    scc = []
+                    while True:
+                        s = stack.pop()
+                        onStack.discard(s)
+                        scc.append(s)
+                        if s is n:
+                            break
+                    scc.reverse()
+                    res.append(scc)
+
+    return res
+
+
+class LevelizedProcQueue():
+    """
+    Queue of hdl processes which returns processes in order resolved
+    by :func:`~.levelizeProcesses` (each process is present only once)
+
+    :ivar _order: dictionary {process: order}
+    :ivar _procs: dictionary {order: process}
+    :ivar _heap: heap of orders of scheduled processes
+    :ivar _present: set of orders of scheduled processes
+    """
+    __slots__ = ["_order", "_procs", "_heap", "_present"]
+
+    def __init__(self, order: Dict[object, int]):
+        self._order = order
+        self._procs = {o: p for p, o in order.items()}
+        self._heap = []
+        self._present = set()
+
+    def append(self, proc) -> None:
+        o = self._order[proc]
+        if o not in self._present:
+            self._present.add(o)
+            heappush(self._heap, o)
+
+    def pop(self):
+        o = heappop(self._heap)
+        self._present.remove(o)
+        return self._procs[o]
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,307 @@
+import json
+from time import perf_counter
+
+from hwt.simulator.cycleSimulator import CycleHdlSimulator
+from hwt.simulator.hdlSimConfig import HdlSimConfig
+from hwt.simulator.simModel import SimModel, simModelScopes
+
+
+class ProfiledHwProcess():
+    """
+    Wrapper of hdl process of simulation model which counts its
+    evaluations and time spent in it
+
+    :ivar proc: original hdl process
+    :ivar evaluations: number of evaluations of the process
+    :ivar time: cumulative time spent in the process (in seconds)
+    """
+    __slots__ = ["proc", "evaluations", "time"]
+
+    def __init__(self, proc):
+        self.proc = proc
+        self.evaluations = 0
+        self.time = 0.0
+
+    def __call__(self, sim, io):
+        t = perf_counter()
+        self.proc(sim, io)
+        self.time += perf_counter() - t
+        self.evaluations += 1
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.proc)
+
+
+def _uniqName(name: str, used: set) -> str:
+    if name in used:
+        i = 1
+        while "%s_%d" % (name, i) in used:
+            i += 1
+        name = "%s_%d" % (name, i)
+    used.add(name)
+    return name
+
+
+class ProfilingHdlSimConfig(HdlSimConfig):
+    """
+    Simulator config which collects statistics about simulation
+
+    * evaluation count and cumulative time for each hdl process
+    * number of value changes (toggles) for each signal
+    * number of delta steps in each time step (evaluation rounds
+      of combinational and event dependent processes)
+    * number of events in calendar (sampled on each time step)
+    * time spent in hdl processes (model), simulation processes (agents)
+      and in the simulator itself
+
+    All hooks are installed in beforeSim (when simulation starts),
+    there is no overhead if this config is not used.
+
+    Usage:
+
+    .. code-block:: python
+
+        conf = ProfilingHdlSimConfig()
+        sim = HdlSimulator(conf)
+        sim.simUnit(model, 1000 * Time.ns, procs)
+        with open("profile.json", "w") as f:
+            conf.writeReport(f)
+
+    :attention: in :class:`hwt.simulator.cycleSimulator.CycleHdlSimulator`
+        time of per-cycle hooks of agents which are not generators
+        is accounted to agents together with generation of clock edge
+    :attention: time measurement itself slows the simulation down,
+        the times are useful only for relative comparison
+
+    :ivar processes: list of wrapped hdl processes
+    :ivar toggles: dictionary {signal: number of value changes}
+    :ivar deltaStepsHist: dictionary {number of delta steps in time step:
+        number of such time steps}
+    :ivar calendarDepthMax: maximum number of events in calendar
+    :ivar calendarDepthSum: sum of sampled numbers of events in calendar
+    :ivar timeSteps: number of time steps with any delta step
+    :ivar runTime: time spent in simulator run method (in seconds)
+    :ivar agentTime: time spent in simulation processes (in seconds)
+    """
+
+    def __init__(self):
+        super(ProfilingHdlSimConfig, self).__init__()
+
+        self.sim = None
+        self.processes = []
+        self.toggles = {}
+        self.deltaStepsHist = {}
+        self.calendarDepthMax = 0
+        self.calendarDepthSum = 0
+        self.timeSteps = 0
+        self.runTime = 0.0
+        self.agentTime = 0.0
+        self._scopes = {}
+        self._lastTime = None
+        self._deltaSteps = 0
+
+    def logChange(self, nowTime, sig, nextVal):
+        try:
+            self.toggles[sig] += 1
+        except KeyError:
+            self.toggles[sig] = 1
+
+    def beforeSim(self, simulator, synthesisedUnit):
+        self.sim = simulator
+        simModelScopes(synthesisedUnit, scopes=self._scopes)
+        self._wrapHwProcesses(synthesisedUnit)
+        self._wrapSimulator(simulator)
+
+    def _wrapHwProcesses(self, model: SimModel):
+        """
+        Replace all hdl processes in model and in sensitivity of its signals
+        by ProfiledHwProcess
+        """
+        wrapped = {}
+
+        def wrap(proc):
+            try:
+                return wrapped[proc]
+            except KeyError:
+                p = ProfiledHwProcess(proc)
+                wrapped[proc] = p
+                self.processes.append(p)
+                return p
+
+        for m in self._scopes.keys():
+            m._processes = [wrap(p) for p in m._processes]
+            m._outputs = {wrap(p): outs for p, outs in m._outputs.items()}
+            m._copyProcesses = {wrap(p): io
+                                for p, io in m._copyProcesses.items()}
+
+        for m in self._scopes.keys():
+            for s in m._ctx.signals:
+                s.simSensProcs = set(map(wrap, s.simSensProcs))
+                s.simRisingSensProcs = set(map(wrap, s.simRisingSensProcs))
+                s.simFallingSensProcs = set(map(wrap, s.simFallingSensProcs))
+                s.simSensMasks = {wrap(p): mask
+                                  for p, mask in s.simSensMasks.items()}
+
+    def _profiledProcess(self, proc):
+        """
+        Wrap simulation process (python generator) and measure time
+        spent in it
+        """
+        while True:
+            t = perf_counter()
+            try:
+                ev = next(proc)
+            except StopIteration:
+                self.agentTime += perf_counter() - t
+                return
+            self.agentTime += perf_counter() - t
+            yield ev
+
+    def _onDeltaStep(self):
+        now = self.sim.now
+        if now != self._lastTime:
+            self._timeStepEnd()
+            self._lastTime = now
+            depth = len(self.sim._events)
+            self.calendarDepthSum += depth
+            if depth > self.calendarDepthMax:
+                self.calendarDepthMax = depth
+
+        self._deltaSteps += 1
+
+    def _timeStepEnd(self):
+        d = self._deltaSteps
+        if d:
+            self.deltaStepsHist[d] = self.deltaStepsHist.get(d, 0) + 1
+            self.timeSteps += 1
+            self._deltaSteps = 0
+
+    def _wrapSimulator(self, sim):
+        """
+        Install hooks to instance of simulator
+        """
+        run = sim.run
+
+        def profiledRun(until):
+            t = perf_counter()
+            try:
+                run(until)
+            finally:
+                self.runTime += perf_counter() - t
+
+        sim.run = profiledRun
+
+        def countDeltaStep(fn):
+            def deltaStep(*args):
+                self._onDeltaStep()
+                return fn(*args)
+
+            return deltaStep
+
+        if isinstance(sim, CycleHdlSimulator):
+            def timedAgents(fn):
+                def agentFn(*args):
+                    t = perf_counter()
+                    try:
+                        return fn(*args)
+                    finally:
+                        self.agentTime += perf_counter() - t
+
+                return agentFn
+
+            sim._runProcess = timedAgents(sim._runProcess)
+            sim._clkEdge = timedAgents(sim._clkEdge)
+            settleComb = sim._settleComb
+
+            def _settleComb():
+                if sim._combProcsToRun:
+                    self._onDeltaStep()
+                settleComb()
+
+            sim._settleComb = _settleComb
+            sim._commitSeqProcesses = countDeltaStep(
+                sim._commitSeqProcesses)
+        else:
+            addProcess = sim.add_process
+
+            def add_process(proc):
+                addProcess(self._profiledProcess(proc))
+
+            sim.add_process = add_process
+            sim._runCombProcesses = countDeltaStep(sim._runCombProcesses)
+            sim._runSeqProcesses = countDeltaStep(sim._runSeqProcesses)
+
+    def _procName(self, proc) -> str:
+        m = getattr(proc, "__self__", None)
+        name = getattr(proc, "__name__", proc.__class__.__name__)
+        scope = self._scopes.get(m, None)
+        if scope is None:
+            return name
+        return "%s.%s" % (scope, name)
+
+    def getReport(self) -> dict:
+        """
+        :return: dictionary with collected statistics
+            (can be serialized to json)
+        """
+        self._timeStepEnd()
+        sim = self.sim
+
+        sigScopes = {}
+        for m, scope in self._scopes.items():
+            for s in m._ctx.signals:
+                sigScopes[s] = scope
+
+        used = set()
+        processes = {}
+        modelTime = 0.0
+        for p in sorted(self.processes, key=lambda p: p.time, reverse=True):
+            modelTime += p.time
+            name = _uniqName(self._procName(p.proc), used)
+            processes[name] = {
+                "evaluations": p.evaluations,
+                "time": p.time,
+            }
+
+        used = set()
+        signals = {}
+        for s, cnt in sorted(self.toggles.items(), key=lambda x: x[1],
+                             reverse=True):
+            scope = sigScopes.get(s, None)
+            name = s.name if scope is None else "%s.%s" % (scope, s.name)
+            signals[_uniqName(name, used)] = {"toggles": cnt}
+
+        deltaSum = sum(k * v for k, v in self.deltaStepsHist.items())
+        timeSteps = self.timeSteps
+        return {
+            "simulator": None if sim is None else sim.__class__.__name__,
+            "simTime": None if sim is None else sim.now,
+            "timeResolution": None if sim is None else sim.timeResolution,
+            "time": {
+                "total": self.runTime,
+                "model": modelTime,
+                "agents": self.agentTime,
+                "simulator": self.runTime - modelTime - self.agentTime,
+            },
+            "deltaSteps": {
+                "timeSteps": timeSteps,
+                "total": deltaSum,
+                "max": max(self.deltaStepsHist.keys(), default=0),
+                "mean": deltaSum / timeSteps if timeSteps else 0,
+                "histogram": {str(k): v for k, v in
+                              sorted(self.deltaStepsHist.items())},
+            },
+            "calendarDepth": {
+                "max": self.calendarDepthMax,
+                "mean": (self.calendarDepthSum / timeSteps
+                         if timeSteps else 0),
+            },
+            "processes": processes,
+            "signals": signals,
+        }
+
+    def writeReport(self, file, indent: int=2) -> None:
+        """
+        Write report in json format to file
+        """
+        json.dump(self.getReport(), file, indent=indent)
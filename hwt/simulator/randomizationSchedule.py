@@ -0,0 +1,111 @@
+from _random import Random
+from array import array
+from typing import Iterator, Tuple
+
+from hwt.hdl.constants import Time
+
+
+class EnableSchedule():
+    """
+    Random enable/disable timeline of an agent generated in bulk
+    from a seed (in chunks, as it is consumed)
+
+    The timeline is the same as the one of
+    :meth:`hwt.simulator.simTestCase.SimTestCase.simpleRandomizationProcess`
+    with the same seed. In each time quantum enable is randomly selected
+    and then there is random delay of 0 or 1 time quantum.
+    Only the points where enable changes are stored.
+
+    :ivar times: array of times (relative to start of schedule)
+        of changes of enable in actual chunk
+    :ivar enables: values of enable for times (bytearray of 0/1)
+    :ivar chunkSize: number of random draws of enable per chunk
+    :ivar _random: random generator
+    :ivar _en: value of enable after last generated change
+    :ivar _t: time of next random draw
+    """
+
+    def __init__(self, seed: int, en: bool, timeQuantum: int,
+                 chunkSize: int=4096):
+        """
+        :param seed: seed of random generator
+        :param en: initial value of enable
+        :param timeQuantum: time step of the schedule
+        """
+        self._random = Random(seed)
+        self._en = bool(en)
+        self._t = 0
+        self.timeQuantum = timeQuantum
+        self.chunkSize = chunkSize
+        self.times = array("q")
+        self.enables = bytearray()
+
+    def _generateChunk(self) -> None:
+        """
+        Generate next chunk of changes of enable
+        """
+        r = self._random.random
+        q = self.timeQuantum
+        en = self._en
+        t = self._t
+        times = array("q")
+        enables = bytearray()
+        for _ in range(self.chunkSize):
+            _en = r() < 0.5
+            if _en != en:
+                en = _en
+                times.append(t)
+                enables.append(en)
+            t += int(r() * 2) * q
+
+        self._en = en
+        self._t = t
+        self.times = times
+        self.enables = enables
+
+    def __iter__(self) -> Iterator[Tuple[int, bool]]:
+        """
+        :return: infinite iterator of tuples (time, enable)
+            for changes of enable
+        """
+        while True:
+            self._generateChunk()
+            yield from zip(self.times, map(bool, self.enables))
+
+
+def scheduledRandomizationProcess(agent, seed: int,
+                                  timeQuantum: int=10 * Time.ns):
+    """
+    :return: simulation process which randomly disables and enables agent
+        using :class:`~.EnableSchedule`, the process is woken up
+        only when enable changes
+    :attention: the times of changes of enable are the same as in
+        :meth:`hwt.simulator.simTestCase.SimTestCase.simpleRandomizationProcess`
+        with the same seed, but the behaviour differs:
+        there is only a single wait(0) between changes in the same time
+        (simpleRandomizationProcess yields for each random draw)
+        and if enable of agent is changed by something else, it stays
+        until the next change in the schedule (simpleRandomizationProcess
+        overrides it on its next random draw)
+    """
+    def randomEnProc(sim):
+        # small space at start to modify agents when they are inactive
+        yield sim.wait(timeQuantum // 4)
+        schedule = iter(EnableSchedule(seed, agent.getEnable(),
+                                       timeQuantum))
+        now = 0
+        t, en = next(schedule)
+        while True:
+            if t != now:
+                yield sim.wait(t - now)
+                now = t
+            if agent.getEnable() != en:
+                agent.setEnable(en, sim)
+
+            t, en = next(schedule)
+            if t == now:
+                # multiple changes in same time, other processes
+                # have to run between them
+                yield sim.wait(0)
+
+    return randomEnProc
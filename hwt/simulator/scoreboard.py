@@ -0,0 +1,262 @@
+from collections import deque
+from itertools import islice
+from typing import Callable, Optional
+
+from hwt.simulator.agentConnector import allValuesToInts
+
+
+NOT_PULLED = object()
+
+
+class ScoreboardError(AssertionError):
+    """
+    Mismatch between expected and actual transaction found by scoreboard
+    """
+    pass
+
+
+class Scoreboard():
+    """
+    Streaming scoreboard which compares transactions collected by monitor
+    of agent with expected transactions incrementally, as they are read.
+    Compared transactions are removed from agent.data, so memory
+    does not grow with the length of simulation.
+
+    Usage:
+
+    .. code-block:: python
+
+        sb = Scoreboard(u.dataOut._ag, expected=(x + 1 for x in inputs))
+        self.runSim(1000 * Time.ns)
+        sb.checkDone()
+
+    Expected transactions are taken from:
+
+    * expected iterable (pulled lazily, it can be a generator)
+    * items added by :meth:`~.expect` (f.e. from reference model
+      connected to driver of input interface)
+    * refModel callable(actual) which returns expected transaction
+      for actual transaction (f.e. model of memory which computes
+      expected data from address in transaction)
+
+    Transactions are converted by allValuesToInts and compared by ==.
+
+    :ivar agent: monitor agent, it has to have _afterRead hook
+        (f.e. HandshakedAgent, VldSyncedAgent)
+    :ivar name: name used in error messages
+    :ivar key: optional function(transaction) -> key, if specified
+        transactions are matched out of order, actual transaction
+        is compared with the first expected transaction with the same key
+        (can not be used together with refModel)
+    :ivar maxPending: maximum number of expected transactions which are
+        waiting for the actual transaction with the same key
+        (= maximum reorder distance), expected transactions are not pulled
+        from expected iterator over this limit and transactions added
+        by :meth:`~.expect` over this limit are reported as error
+    :ivar failFast: if True ScoreboardError is raised on first mismatch
+        (which stops the simulation), else mismatches are only counted
+        and the first maxErrors of them are stored in errors
+    :ivar keepData: if True transactions are not removed from agent.data
+        (required f.e. for HandshakedReadListener which counts transactions
+        by length of agent.data)
+    :ivar matched: number of matching transactions
+    :ivar errors: list of error messages
+    :ivar errorCnt: number of mismatches
+    :ivar _expectedIt: iterator of expected transactions or None
+    :ivar _pending: deque of expected transactions (for key=None)
+        or dictionary {key: deque of expected transactions}
+    :ivar _pendingCnt: number of transactions in _pending
+    :ivar _expectedHead: transaction taken from expected iterator which
+        did not fit in to _pending (or NOT_PULLED)
+    """
+
+    def __init__(self, agent, expected=None,
+                 refModel: Optional[Callable]=None,
+                 key: Optional[Callable]=None,
+                 maxPending: int=1 << 16,
+                 failFast: bool=True,
+                 maxErrors: int=16,
+                 keepData: bool=False,
+                 name: Optional[str]=None):
+        assert expected is None or refModel is None, \
+            "expected and refModel are mutually exclusive"
+        assert key is None or refModel is None, \
+            "key and refModel are mutually exclusive"
+        self.agent = agent
+        if name is None:
+            name = agent.intf._getFullName()
+        self.name = name
+        self.refModel = refModel
+        self.key = key
+        self.maxPending = maxPending
+        self.failFast = failFast
+        self.maxErrors = maxErrors
+        self.keepData = keepData
+
+        self.matched = 0
+        self.errors = []
+        self.errorCnt = 0
+
+        if expected is None:
+            self._expectedIt = None
+        else:
+            self._expectedIt = iter(expected)
+        if key is None:
+            self._pending = deque()
+        else:
+            self._pending = {}
+        self._pendingCnt = 0
+        self._expectedHead = NOT_PULLED
+
+        self.original_afterRead = agent._afterRead
+        agent._afterRead = self._afterReadWrap
+
+    def expect(self, *transactions) -> None:
+        """
+        Add expected transactions
+        """
+        for t in transactions:
+            t = allValuesToInts(t)
+            if self._pendingCnt >= self.maxPending:
+                self._error(None, "too many pending expected transactions"
+                            " (%d), %r discarded" % (self._pendingCnt, t))
+            else:
+                self._addPending(t)
+
+    def _addPending(self, t) -> None:
+        if self.key is None:
+            self._pending.append(t)
+        else:
+            k = self.key(t)
+            try:
+                q = self._pending[k]
+            except KeyError:
+                q = self._pending[k] = deque()
+            q.append(t)
+        self._pendingCnt += 1
+
+    def _nextExpected(self):
+        """
+        :return: tuple (found, next transaction from expected iterator)
+        """
+        t = self._expectedHead
+        if t is not NOT_PULLED:
+            self._expectedHead = NOT_PULLED
+            return True, t
+
+        it = self._expectedIt
+        if it is None:
+            return False, None
+        try:
+            t = next(it)
+        except StopIteration:
+            self._expectedIt = None
+            return False, None
+        return True, allValuesToInts(t)
+
+    def _popExpected(self, actual):
+        """
+        :return: tuple (found, expected transaction for actual transaction)
+        """
+        if self.refModel is not None:
+            return True, allValuesToInts(self.refModel(actual))
+
+        pending = self._pending
+        if self.key is None:
+            if pending:
+                self._pendingCnt -= 1
+                return True, pending.popleft()
+            return self._nextExpected()
+
+        k = self.key(actual)
+        q = pending.get(k, None)
+        if q is not None:
+            t = q.popleft()
+            if not q:
+                del pending[k]
+            self._pendingCnt -= 1
+            return True, t
+
+        # skip expected transactions with other keys
+        # until the transaction with this key is found
+        while True:
+            found, t = self._nextExpected()
+            if not found:
+                return False, None
+            if self.key(t) == k:
+                return True, t
+            if self._pendingCnt >= self.maxPending:
+                # keep the transaction for next lookup
+                # (reported as missing by checkDone if never matched)
+                self._expectedHead = t
+                return False, None
+            self._addPending(t)
+
+    def _error(self, sim, msg: str) -> None:
+        self.errorCnt += 1
+        if sim is not None:
+            msg = "%s, %d: %s" % (self.name, sim.now, msg)
+        else:
+            msg = "%s: %s" % (self.name, msg)
+
+        if self.failFast:
+            raise ScoreboardError(msg)
+        if len(self.errors) < self.maxErrors:
+            self.errors.append(msg)
+
+    def _afterReadWrap(self, sim) -> None:
+        if self.original_afterRead is not None:
+            self.original_afterRead(sim)
+
+        data = self.agent.data
+        if self.keepData:
+            actual = data[-1]
+        else:
+            actual = data.pop()
+        actual = allValuesToInts(actual)
+
+        found, expected = self._popExpected(actual)
+        if not found:
+            if self._pendingCnt >= self.maxPending:
+                limit = ", maxPending=%d reached" % self.maxPending
+            else:
+                limit = ""
+            self._error(sim, "unexpected transaction %r (%d matched before%s)"
+                        % (actual, self.matched, limit))
+        elif expected != actual:
+            self._error(sim, "transaction %d mismatch, expected %r got %r"
+                        % (self.matched + self.errorCnt, expected, actual))
+        else:
+            self.matched += 1
+
+    def checkDone(self) -> None:
+        """
+        Check that all expected transactions were received and there was
+        not any mismatch
+
+        :raise ScoreboardError: if there was any mismatch
+            or some expected transactions are missing
+        """
+        if self.errorCnt:
+            raise ScoreboardError(
+                "%s: %d mismatches, first: %s" % (
+                    self.name, self.errorCnt,
+                    self.errors[0] if self.errors else ""))
+
+        if self.key is None:
+            missing = list(islice(self._pending, 4))
+        else:
+            missing = []
+            for q in self._pending.values():
+                missing.extend(q)
+                if len(missing) >= 4:
+                    break
+        if self._expectedHead is not NOT_PULLED:
+            missing.append(self._expectedHead)
+        if self._expectedIt is not None:
+            missing.extend(islice(self._expectedIt, 4))
+
+        if missing:
+            raise ScoreboardError(
+                "%s: missing transactions (%d matched), next expected %r"
+                % (self.name, self.matched, missing[:4]))
@@ -3,13 +3,16 @@ import inspect
 import os
 import sys
 from types import ModuleType
-from typing import Optional
+from typing import List, Optional
 
-from hwt.hdl.constants import Time
+from hwt.hdl.constants import Time, SENSITIVITY
+from hwt.serializer.simModel.laneSerializer import SimModelLaneSerializer
 from hwt.serializer.simModel.serializer import SimModelSerializer
 from hwt.simulator.agentConnector import autoAddAgents
-from hwt.simulator.hdlSimulator import HdlSimulator
-from hwt.simulator.simModel import SimModel
+from hwt.simulator.hdlSimulator import HdlSimulator, Event, Wait
+from hwt.simulator.laneSimModel import initLaneSimModel
+from hwt.simulator.simModel import SimModel, toFlattenedSimModelCls
+from hwt.simulator.simModelCache import SimModelCache, _walkInterfaces
 from hwt.simulator.simSignal import SimSignal
 from hwt.simulator.vcdHdlSimConfig import VcdHdlSimConfig
 from hwt.synthesizer.unit import Unit
@@ -19,7 +22,9 @@ from hwt.synthesizer.dummyPlatform import DummyPlatform
 
 def simPrepare(unit: Unit, modelCls: Optional[SimModel]=None,
                targetPlatform=DummyPlatform(),
-               dumpModelIn: str=None, onAfterToRtl=None):
+               dumpModelIn: str=None, onAfterToRtl=None,
+               serializer=SimModelSerializer, flatten: bool=False,
+               modelCache: Optional[SimModelCache]=None):
     """
     Create simulation model and connect it with interfaces of original unit
     and decorate it with agents
@@ -32,6 +37,14 @@ def simPrepare(unit: Unit, modelCls: Optional[SimModel]=None,
         (if is None sim model will be constructed only in memory)
     :param onAfterToRtl: callback fn(unit, modelCls) which will be called
         after unit will be synthesised to rtl
+    :param serializer: serializer class used to generate sim model
+        (f.e. SimModelIntSerializer for faster model evaluation)
+    :param flatten: if True hierarchy of sim model is inlined
+        into a single model (see :func:`~.toSimModel`)
+    :param modelCache: optional SimModelCache instance, if specified
+        model is loaded from cache if possible (see :func:`~.toSimModel`),
+        cache is not used if onAfterToRtl is specified because unit
+        is not synthesised on cache hit
 
     :return: tuple (fully loaded unit with connected sim model,
         connected simulation model,
@@ -39,8 +52,12 @@ def simPrepare(unit: Unit, modelCls: Optional[SimModel]=None,
         )
     """
     if modelCls is None:
+        if onAfterToRtl is not None:
+            # callback expects synthesised unit
+            modelCache = None
         modelCls = toSimModel(
-            unit, targetPlatform=targetPlatform, dumpModelIn=dumpModelIn)
+            unit, targetPlatform=targetPlatform, dumpModelIn=dumpModelIn,
+            serializer=serializer, flatten=flatten, modelCache=modelCache)
     else:
         # to instantiate hierarchy of unit
         toSimModel(unit)
@@ -54,7 +71,69 @@ def simPrepare(unit: Unit, modelCls: Optional[SimModel]=None,
     return unit, model, procs
 
 
-def toSimModel(unit, targetPlatform=DummyPlatform(), dumpModelIn=None):
+def simPrepareLanes(unitFactory, lanes: int, targetPlatform=DummyPlatform(),
+                    serializer=SimModelLaneSerializer, flatten: bool=False,
+                    modelCache: Optional[SimModelCache]=None):
+    """
+    Create simulation model which simulates multiple independent instances
+    (lanes) of the unit at once, each lane has its own unit instance
+    with agents
+
+    Values of all lanes are packed in signals of a single model
+    (see :class:`hwt.serializer.simModel.laneSerializer.SimModelLaneSerializer`)
+    so one evaluation of hdl process advances all lanes.
+    Clock signals are common for all lanes, their agents are added
+    only for the first lane.
+
+    :param unitFactory: function() -> Unit (f.e. class of the unit),
+        called once for each lane, all units has to have same configuration
+    :param lanes: number of lanes
+    :param serializer: serializer class used to generate lane sim model
+    :param flatten: if True hierarchy of sim model is inlined
+        into a single model (see :func:`~.toSimModel`)
+    :param modelCache: optional SimModelCache instance (see :func:`~.toSimModel`)
+
+    :return: tuple (list of units for each lane with connected sim model,
+        connected simulation model,
+        simulation processes of agents of all lanes
+        )
+    """
+    units = [unitFactory() for _ in range(lanes)]
+    unit = units[0]
+    modelCls = toSimModel(unit, targetPlatform=targetPlatform,
+                          serializer=serializer, flatten=flatten,
+                          modelCache=modelCache)
+    reconnectUnitSignalsToModel(unit, modelCls)
+    model = modelCls()
+    laneSignals = initLaneSimModel(model, lanes)
+    interfaces = SimModelCache._interfacesInfo(unit)
+
+    procs = []
+    for i, u in enumerate(units):
+        if i > 0:
+            # only declarations are loaded, all lanes use the same model
+            SimModelCache._bindInterfaces(u, modelCls, interfaces)
+
+        laneInterfaces = []
+        for intf in u._interfaces:
+            isShared = True
+            for _intf in _walkInterfaces([intf, ]):
+                if not _intf._interfaces:
+                    sigs = laneSignals.get(_intf._sigInside, None)
+                    if sigs is not None:
+                        _intf._sigInside = sigs[i]
+                        isShared = False
+            if i == 0 or not isShared:
+                laneInterfaces.append(intf)
+
+        procs.extend(autoAddAgents(u, laneInterfaces))
+
+    return units, model, procs
+
+
+def toSimModel(unit, targetPlatform=DummyPlatform(), dumpModelIn=None,
+               serializer=SimModelSerializer, flatten: bool=False,
+               modelCache: Optional[SimModelCache]=None):
     """
     Create a simulation model for unit
 
@@ -62,11 +141,26 @@ def toSimModel(unit, targetPlatform=DummyPlatform(), dumpModelIn=None):
     :param targetPlatform: target platform for this synthes
     :param dumpModelIn: folder to where put sim model files
         (otherwise sim model will be constructed only in memory)
+    :param serializer: serializer class used to generate sim model
+    :param flatten: if True, the returned model class inlines hierarchy
+        of sub models into itself after instantiation,
+        signals connected port-to-port are merged to a single signal
+        which removes the delta step for each level of hierarchy
+    :param modelCache: optional SimModelCache instance, if specified
+        and dumpModelIn is None model is loaded from this cache
+        (the unit is not synthesised on cache hit)
     """
+    if dumpModelIn is None and modelCache is not None:
+        modelCls = modelCache.getModelCls(
+            unit, targetPlatform=targetPlatform, serializer=serializer)
+        if flatten:
+            modelCls = toFlattenedSimModelCls(modelCls)
+        return modelCls
+
     sim_code = toRtl(unit,
                      targetPlatform=targetPlatform,
                      saveTo=dumpModelIn,
-                     serializer=SimModelSerializer)
+                     serializer=serializer)
     if dumpModelIn is not None:
         d = os.path.join(os.getcwd(), dumpModelIn)
         dInPath = d in sys.path
@@ -84,7 +178,11 @@ def toSimModel(unit, targetPlatform=DummyPlatform(), dumpModelIn=None):
         # it exceded it throws MemoryError: s_push: parser stack overflow
         exec(sim_code, simModule.__dict__)
 
-    return simModule.__dict__[unit._name]
+    modelCls = simModule.__dict__[unit._name]
+    if flatten:
+        modelCls = toFlattenedSimModelCls(modelCls)
+
+    return modelCls
 
 
 def reconnectUnitSignalsToModel(synthesisedUnitOrIntf, modelCls):
@@ -154,8 +252,175 @@ def _simUnitVcd(simModel, stimulFunctions, outputFile, until):
     return sim
 
 
+# callback is idle until its queue is refilled
+IDLE_FOREVER = float("inf")
+
+
+def _resumeCallback(ev, proc):
+    """
+    Simulation process which continues in execution of callback
+    which yielded something else than wait on combinational update
+    """
+    yield ev
+    yield from proc
+
+
+class CallbackLoopDispatcher(object):
+    """
+    Write callback of signal which executes all callback loops
+    registered on this signal (usually all agents of clock domain)
+
+    The edge of the signal is resolved only once and all callbacks
+    are executed in a single simulation process, callbacks waiting
+    on combinational update are resumed together after a single event.
+
+    :ivar sig: signal on which this dispatcher is registered
+    :ivar loops: list of registered callback loops
+    :ivar _loopsToEn: callback loops which were registered
+        but their enable was not resolved yet
+    """
+
+    def __init__(self, sig: SimSignal):
+        self.sig = sig
+        self.loops = []
+        self._loopsToEn = []
+
+    @classmethod
+    def forSignal(cls, sig: SimSignal) -> "CallbackLoopDispatcher":
+        """
+        Get dispatcher of the signal, create and register it
+        if it does not exist
+        """
+        callbacks = list(sig._writeCallbacks)
+        callbacks.extend(c for _, c, _ in sig._writeCallbacksToEn)
+        for c in callbacks:
+            d = getattr(c, "__self__", None)
+            if isinstance(d, cls):
+                return d
+
+        d = cls(sig)
+        sig.registerWriteCallback(d.onWriteCallback, lambda: True)
+        return d
+
+    def registerLoop(self, loop: "CallbackLoop") -> None:
+        """
+        Register callback loop, its enable is resolved on next write
+        to the signal
+        """
+        self.loops.append(loop)
+        self._loopsToEn.append(loop)
+
+    def _loadLoops(self) -> None:
+        for loop in self._loopsToEn:
+            loop._enabled = bool(loop.shouldBeEnabledFn())
+        self._loopsToEn = []
+
+    def activeLoops(self, sim) -> List["CallbackLoop"]:
+        """
+        :return: list of enabled callback loops which should be executed
+            for actual value of the signal
+        """
+        if self._loopsToEn:
+            self._loadLoops()
+
+        v = self.sig._val
+        rising = None
+        falling = None
+        loops = []
+        for loop in self.loops:
+            if not loop._enabled:
+                continue
+
+            edge = loop.EDGE
+            if edge == SENSITIVITY.RISING:
+                if rising is None:
+                    rising = bool(v._onRisingEdge__val(sim.now))
+                if not rising:
+                    continue
+            elif edge == SENSITIVITY.FALLING:
+                if falling is None:
+                    falling = bool(v._onFallingEdge__val(sim.now))
+                if not falling:
+                    continue
+
+            loops.append(loop)
+
+        return loops
+
+    def idleUntil(self, sim):
+        """
+        :return: minimum of idleUntil of enabled callback loops
+            or None if any of them is not idle
+        """
+        if self._loopsToEn:
+            return None
+
+        idleUntil = IDLE_FOREVER
+        for loop in self.loops:
+            if not loop._enabled:
+                continue
+            t = loop.idleUntil(sim)
+            if t is None:
+                return None
+            idleUntil = min(idleUntil, t)
+
+        return idleUntil
+
+    def _runCallback(self, sim, proc, waiting: list) -> None:
+        """
+        Run callback until it blocks, callbacks waiting on combinational
+        update are appended to waiting list, other are passed
+        to simulator as separate simulation processes
+        """
+        while True:
+            try:
+                ev = next(proc)
+            except StopIteration:
+                return
+
+            if isinstance(ev, Event):
+                waiting.append(proc)
+            elif isinstance(ev, Wait):
+                sim.add_process(_resumeCallback(ev, proc))
+            else:
+                # new process spotted
+                sim.add_process(ev)
+                continue
+            return
+
+    def onWriteCallback(self, sim):
+        waiting = []
+        runCallback = self._runCallback
+        for loop in self.activeLoops(sim):
+            if loop.isGenerator:
+                runCallback(sim, loop.fn(sim), waiting)
+            else:
+                afterComb = loop.fn(sim)
+                if afterComb is not None:
+                    waiting.append(afterComb)
+
+        while waiting:
+            # all callbacks of one round are resumed after the same
+            # combinational update and they see the same state of signals
+            # (as if they were separate processes waiting on the same event),
+            # their writes are visible in the next round
+            yield sim.waitOnCombUpdate()
+            procs = waiting
+            waiting = []
+            for p in procs:
+                if callable(p):
+                    # continuation of plain function callback
+                    p(sim)
+                else:
+                    runCallback(sim, p, waiting)
+
+
 class CallbackLoop(object):
-    def __init__(self, sig: SimSignal, fn, shouldBeEnabledFn):
+    # edge of the signal on which callback is executed
+    EDGE = SENSITIVITY.ANY
+
+    def __init__(self, sig: SimSignal, fn, shouldBeEnabledFn,
+                 idleUntilFn=None):
         """
         :param sig: signal on which write callback should be used
         :attention: if condFn is None callback function is always executed
@@ -163,16 +428,27 @@ class CallbackLoop(object):
         :ivra fn: function/generator which is callback which should be executed
         :ivar isGenerator: flag if callback function is generator
             or normal function
-        :ivar _callbackIndex: index of callback in write callbacks on sig,
+        :note: normal function can return function(sim) which is then
+            called when combinational update is done (the same as
+            yield sim.waitOnCombUpdate() in generator but without overhead
+            of generator)
+        :ivar _dispatcher: CallbackLoopDispatcher of sig,
             if is None callback was not registered yet
+        :ivar _enabled: flag which tells if callback is executed
         :ivar shouldBeEnabledFn: function() -> bool, which returns True if this
             callback loop should be enabled
+        :ivar idleUntilFn: optional function(sim) -> time until which
+            execution of callback does not change anything
+            if signals read by it do not change (None if callback is not idle),
+            see :meth:`hwt.simulator.agentBase.AgentBase.driverIdleUntil`
         """
         assert not isinstance(fn, CallbackLoop)
         self.fn = fn
         self.isGenerator = inspect.isgeneratorfunction(fn)
         self.shouldBeEnabledFn = shouldBeEnabledFn
-        self._callbackIndex = None
+        self.idleUntilFn = idleUntilFn
+        self._dispatcher = None
+        self._enabled = False
 
         try:
             # if sig is interface we need internal signal
@@ -181,50 +457,38 @@ class CallbackLoop(object):
             self.sig = sig
 
     def setEnable(self, en, sim):
-        if self._callbackIndex is None:
+        if self._dispatcher is None:
             return
 
-        if en:
-            c = self.onWriteCallback
-        else:
-            c = None
-        self.sig._writeCallbacks[self._callbackIndex] = c
+        self._enabled = en
 
-    def onWriteCallback(self, sim):
-        if self.isGenerator:
-            yield from self.fn(sim)
-        else:
-            self.fn(sim)
+    def idleUntil(self, sim):
+        """
+        :return: time until which this callback is idle or None
+            if it is not idle (or it does not know)
+        """
+        f = self.idleUntilFn
+        if f is None:
+            return None
+        return f(sim)
 
     def __call__(self, sim):
         """
         Process for injecting of this callback loop into simulator
         """
-        self._callbackIndex = self.sig.registerWriteCallback(
-            self.onWriteCallback,
-            self.shouldBeEnabledFn)
+        d = CallbackLoopDispatcher.forSignal(self.sig)
+        d.registerLoop(self)
+        self._dispatcher = d
         return
         yield
 
 
 class OnRisingCallbackLoop(CallbackLoop):
-
-    def onWriteCallback(self, sim):
-        if bool(sim.read(self.sig)._onRisingEdge__val(sim.now)):
-            if self.isGenerator:
-                yield from self.fn(sim)
-            else:
-                self.fn(sim)
+    EDGE = SENSITIVITY.RISING
 
 
 class OnFallingCallbackLoop(CallbackLoop):
-
-    def onWriteCallback(self, sim):
-        if bool(sim.read(self.sig)._onFallingEdge__val(sim.now)):
-            if self.isGenerator:
-                yield from self.fn(sim)
-            else:
-                self.fn(sim)
+    EDGE = SENSITIVITY.FALLING
 
 
 def oscilate(sig, period=10 * Time.ns, initWait=0):
@@ -234,13 +498,16 @@ def oscilate(sig, period=10 * Time.ns, initWait=0):
     """
     def oscillateStimul(s):
         s.write(False, sig)
-        halfPeriod = period / 2
+        # integer halves, odd period does not cause a drift
+        p = s.toSimTime(period)
+        lowTime = p // 2
+        highTime = p - lowTime
         yield s.wait(initWait)
 
         while True:
-            yield s.wait(halfPeriod)
+            yield s.wait(lowTime)
             s.write(True, sig)
-            yield s.wait(halfPeriod)
+            yield s.wait(highTime)
             s.write(False, sig)
 
     return oscillateStimul
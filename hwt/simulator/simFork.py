@@ -0,0 +1,127 @@
+import os
+import pickle
+import sys
+import traceback
+from typing import Callable, List, Optional
+
+from hwt.simulator.exceptions import SimException
+
+
+def _runVariant(sim, variant, wfd: int) -> None:
+    """
+    Body of forked process, run variant and send its result to parent
+    """
+    try:
+        res = (True, variant(sim))
+    except BaseException:
+        res = (False, traceback.format_exc())
+
+    try:
+        data = pickle.dumps(res)
+    except Exception:
+        data = pickle.dumps((False, traceback.format_exc()))
+
+    with os.fdopen(wfd, "wb") as f:
+        f.write(data)
+
+
+def _startVariant(sim, variant):
+    """
+    :return: tuple (pid of forked process, file from which result is read)
+    """
+    rfd, wfd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # child process
+        exitCode = 0
+        try:
+            os.close(rfd)
+            _runVariant(sim, variant, wfd)
+        except BaseException:
+            exitCode = 1
+        finally:
+            # skip cleanup of the parent state (atexit handlers, buffers)
+            os._exit(exitCode)
+
+    os.close(wfd)
+    return pid, os.fdopen(rfd, "rb")
+
+
+def _collectVariant(index: int, pid: int, f):
+    with f:
+        data = f.read()
+    os.waitpid(pid, 0)
+    if not data:
+        raise SimException("Forked simulation crashed", index)
+
+    ok, res = pickle.loads(data)
+    if not ok:
+        raise SimException("Forked simulation failed", index, res)
+    return res
+
+
+def forkSimulation(sim, variants: List[Callable],
+                   workers: Optional[int]=1) -> List[object]:
+    """
+    Run variants of simulation from current state of simulator
+
+    Each variant runs in a process forked from this process, which holds
+    the complete state of the simulation (signal values, pending events,
+    simulation processes, agents and their queues, write callbacks).
+    The state of simulator in this process is not modified, it works
+    as a checkpoint from which any number of variants can be started.
+
+    Usage:
+
+    .. code-block:: python
+
+        sim = HdlSimulator()
+        sim.simUnit(model, 100 * Time.ns, procs)  # common reset/init phase
+
+        def variant(sim):
+            u.a._ag.data.extend(...)
+            sim.run(1000 * Time.ns)
+            return allValuesToInts(u.b._ag.data)
+
+        results = forkSimulation(sim, [variant, variant2], workers=4)
+
+    :param sim: simulator, it should not be running (call it between runs)
+    :param variants: functions variant(sim) -> result, each is executed
+        in a separate process, it should modify stimulus, run simulation
+        and return picklable result
+    :param workers: maximum number of concurrently running variants,
+        if None number of cpus is used
+    :return: list of results of variants
+    :attention: requires os.fork (POSIX), output files of sim config
+        are shared by all processes
+    """
+    if not hasattr(os, "fork"):
+        raise SimException("Forking of simulation requires os.fork")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    assert workers > 0, workers
+
+    # buffered data would be written by each process otherwise
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    results = [None for _ in variants]
+    running = []
+    try:
+        for i, variant in enumerate(variants):
+            if len(running) >= workers:
+                index, pid, f = running.pop(0)
+                results[index] = _collectVariant(index, pid, f)
+            pid, f = _startVariant(sim, variant)
+            running.append((i, pid, f))
+
+        while running:
+            index, pid, f = running.pop(0)
+            results[index] = _collectVariant(index, pid, f)
+    finally:
+        for _, pid, f in running:
+            f.close()
+            os.waitpid(pid, 0)
+
+    return results
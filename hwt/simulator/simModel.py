@@ -1,18 +1,26 @@
-from typing import Tuple
+from typing import Dict, List, Optional
 
 from hwt.hdl.constants import DIRECTION, SENSITIVITY
 from hwt.hdl.process import HWProcess
-from hwt.hdl.value import Value
-from hwt.simulator.utils import valueHasChanged
+from hwt.simulator.simSignal import SimSignal
 
 
 def sensitivity(proc: HWProcess, *sensitiveTo):
     """
     register sensitivity for process
+
+    :param sensitiveTo: signals or tuples (SENSITIVITY, signal)
+        or (SENSITIVITY.ANY, signal, mask of bits read by process)
     """
     for s in sensitiveTo:
         if isinstance(s, tuple):
-            sen, s = s
+            if len(s) == 3:
+                sen, s, m = s
+                assert sen == SENSITIVITY.ANY, sen
+                s.simSensMasks[proc] = m
+            else:
+                sen, s = s
+
             if sen == SENSITIVITY.ANY:
                 s.simSensProcs.add(proc)
             elif sen == SENSITIVITY.RISING:
@@ -68,46 +76,183 @@ def connectSimPort(simUnit, subSimUnit, srcName, dstName, direction):
     subSimUnit._ctx.signals.remove(origPort)
 
 
-def mkUpdater(nextVal: Value, invalidate: bool):
+def _collectSimModels(model: SimModel, models: List[SimModel]) -> None:
+    models.append(model)
+    for u in model._units:
+        _collectSimModels(u, models)
+
+
+def simModelScopes(model: SimModel, name: Optional[str]=None,
+                   scopes: Optional[Dict[SimModel, str]]=None
+                   ) -> Dict[SimModel, str]:
     """
-    Create value updater for simulation
+    Collect hierarchical names of model and all its sub models
+    (f.e. "top.sub0.sub1", sub models are named by attribute in parent)
 
-    :param nextVal: instance of Value which will be asssiggned to signal
-    :param invalidate: flag which tells if value has been compromised
-        and if it should be invaidated
-    :return: function(value) -> tuple(valueHasChangedFlag, nextVal)
+    :return: dictionary {model: hierarchical name}
     """
+    if scopes is None:
+        scopes = {}
+    if name is None:
+        name = model._name
+
+    scopes[model] = name
+    for u in model._units:
+        uName = None
+        for n, v in vars(model).items():
+            if v is u:
+                uName = n
+                break
+        if uName is None:
+            uName = u._name
+        simModelScopes(u, "%s.%s" % (name, uName), scopes)
+
+    return scopes
 
-    def updater(currentVal):
-        _nextVal = nextVal.clone()
-        if invalidate:
-            _nextVal.vldMask = 0
-        return (valueHasChanged(currentVal, _nextVal), _nextVal)
-    return updater
+
+def _mergeSensMasks(dst: SimSignal, src: SimSignal) -> None:
+    """
+    Merge masks of read bits of processes sensitive to src
+    to dst (before merge of sensitivity of signals)
+    """
+    masks = dst.simSensMasks
+    for p in src.simSensProcs:
+        m = src.simSensMasks.get(p, None)
+        if p in dst.simSensProcs:
+            dm = masks.get(p, None)
+            if dm is None or m is None:
+                masks.pop(p, None)
+            else:
+                masks[p] = dm | m
+        elif m is not None:
+            masks[p] = m
 
 
-def mkArrayUpdater(nextItemVal: Value, indexes: Tuple[Value],
-                   invalidate: bool):
+def flattenSimModel(model: SimModel) -> None:
     """
-    Create value updater for simulation for value of array type
+    Inline hierarchy of simulation model instance into top model
 
-    :param nextVal: instance of Value which will be asssiggned to signal
-    :param indexes: tuple on indexes where value should be updated
-        in target array
+    * signals connected by processes which only copy value
+      (port-to-port connections) are merged to a single signal
+      and copy processes are removed
+    * all processes are moved to the top model, sub models are kept only
+      as scopes for signals (f.e. for waveform dump)
 
-    :return: function(value) -> tuple(valueHasChangedFlag, nextVal)
+    :attention: ports of the top model are never replaced because
+        they are connected to interfaces of the unit,
+        copy process between two top ports is kept
     """
-    def updater(currentVal):
-        if len(indexes) > 1:
-            raise NotImplementedError("[TODO] implement for more indexes")
+    models = []
+    _collectSimModels(model, models)
+    copyProcs = {}
+    for m in models:
+        copyProcs.update(m._copyProcesses)
+
+    # union-find of signals connected by copy processes,
+    # root of each group is its driver
+    parent = {}
+    groupPort = {}
+    for p in model._ports:
+        groupPort[p] = p
+
+    def find(s):
+        while True:
+            try:
+                s = parent[s]
+            except KeyError:
+                return s
+
+    removedProcs = set()
+    for proc, (src, dst) in copyProcs.items():
+        rootSrc = find(src)
+        rootDst = find(dst)
+        if rootSrc is rootDst:
+            continue
+        portSrc = groupPort.get(rootSrc, None)
+        portDst = groupPort.get(rootDst, None)
+        if portSrc is not None and portDst is not None:
+            continue
 
-        _nextItemVal = nextItemVal.clone()
-        if invalidate:
-            _nextItemVal.vldMask = 0
+        parent[rootDst] = rootSrc
+        if portDst is not None:
+            groupPort[rootSrc] = portDst
+        removedProcs.add(proc)
 
-        index = indexes[0]
-        change = valueHasChanged(currentVal._getitem__val(index), _nextItemVal)
-        currentVal._setitem__val(index, _nextItemVal)
-        return (change, currentVal)
+    # {merged signal: signal which replaces it}
+    replacement = {}
+    for s in parent.keys():
+        driver = find(s)
+        rep = groupPort.get(driver, driver)
+        if rep is not driver:
+            replacement[driver] = rep
+            # value of merged signal is driven by driver of the group
+            rep.defVal = driver.defVal
+        if rep is not s:
+            replacement[s] = rep
+
+    for old, rep in replacement.items():
+        _mergeSensMasks(rep, old)
+        rep.simSensProcs.update(old.simSensProcs)
+        rep.simRisingSensProcs.update(old.simRisingSensProcs)
+        rep.simFallingSensProcs.update(old.simFallingSensProcs)
+
+    for proc in removedProcs:
+        src = copyProcs[proc][0]
+        src = replacement.get(src, src)
+        src.simSensProcs.discard(proc)
+        src.simSensMasks.pop(proc, None)
+
+    processes = []
+    outputs = {}
+    remainingCopyProcs = {}
+    for m in models:
+        # replace signals in attributes of model
+        # (processes are accessing signals as attributes of self)
+        for cls in type(m).__mro__:
+            for name, v in vars(cls).items():
+                if isinstance(v, SimSignal) and v in replacement:
+                    setattr(m, name, replacement[v])
+
+        interfaces = []
+        for i in m._interfaces:
+            i = replacement.get(i, i)
+            if i not in interfaces:
+                interfaces.append(i)
+        m._interfaces = interfaces
+
+        signals = m._ctx.signals
+        for s in replacement.keys():
+            signals.discard(s)
+
+        for proc in m._processes:
+            if proc not in removedProcs:
+                processes.append(proc)
+
+        for proc, outs in m._outputs.items():
+            if proc not in removedProcs:
+                outputs[proc] = tuple(replacement.get(o, o) for o in outs)
+
+        for proc, (src, dst) in m._copyProcesses.items():
+            if proc not in removedProcs:
+                remainingCopyProcs[proc] = (replacement.get(src, src),
+                                            replacement.get(dst, dst))
+
+        m._processes = []
+        m._outputs = {}
+        m._copyProcesses = {}
+
+    model._processes = processes
+    model._outputs = outputs
+    model._copyProcesses = remainingCopyProcs
+
+
+def toFlattenedSimModelCls(modelCls):
+    """
+    Create subclass of simulation model class which flattens its hierarchy
+    after instantiation (:func:`~.flattenSimModel`)
+    """
+    def __init__(self):
+        modelCls.__init__(self)
+        flattenSimModel(self)
 
-    return updater
+    return type(modelCls.__name__, (modelCls, ), {"__init__": __init__})
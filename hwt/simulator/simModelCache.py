@@ -0,0 +1,376 @@
+import hashlib
+import importlib.util
+import inspect
+import json
+import marshal
+import os
+import sys
+import sysconfig
+from types import ModuleType
+from typing import Dict, List, Optional
+
+import hwt
+from hwt.hdl.constants import INTF_DIRECTION
+from hwt.synthesizer.dummyPlatform import DummyPlatform
+from hwt.synthesizer.param import Param, evalParam
+from hwt.synthesizer.unit import Unit
+from hwt.synthesizer.utils import toRtl
+
+
+_hwtSourcesDigest = None
+
+
+def hwtSourcesDigest() -> str:
+    """
+    :return: digest of all sources of hwt package
+        (resolved only once for each python process)
+    """
+    global _hwtSourcesDigest
+    if _hwtSourcesDigest is None:
+        h = hashlib.sha1()
+        root = os.path.dirname(hwt.__file__)
+        for dirPath, dirNames, fileNames in os.walk(root):
+            dirNames.sort()
+            for fn in sorted(fileNames):
+                if fn.endswith((".py", ".template")):
+                    p = os.path.join(dirPath, fn)
+                    h.update(os.path.relpath(p, root).encode())
+                    with open(p, "rb") as f:
+                        h.update(f.read())
+        _hwtSourcesDigest = h.hexdigest()
+
+    return _hwtSourcesDigest
+
+
+def _fileDigest(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _isInDir(f: str, d: str) -> bool:
+    try:
+        return os.path.commonpath([f, d]) == d
+    except ValueError:
+        # different drives
+        return False
+
+
+def _moduleSourceFile(m: ModuleType) -> Optional[str]:
+    """
+    :return: absolute path of source file of module or None if module
+        does not have source file or it is a part of hwt
+        or python standard library
+    """
+    try:
+        f = inspect.getsourcefile(m)
+    except TypeError:
+        # builtin
+        return None
+    if f is None:
+        return None
+    f = os.path.abspath(f)
+    if _isInDir(f, os.path.dirname(hwt.__file__)):
+        # covered by hwtSourcesDigest
+        return None
+
+    paths = sysconfig.get_paths()
+    if _isInDir(f, paths["purelib"]) or _isInDir(f, paths["platlib"]):
+        # installed package (site-packages is inside of stdlib dir)
+        return f
+    if _isInDir(f, paths["stdlib"]) or _isInDir(f, paths["platstdlib"]):
+        return None
+    return f
+
+
+def _walkInterfaces(interfaces):
+    for i in interfaces:
+        yield i
+        if i._interfaces:
+            yield from _walkInterfaces(i._interfaces)
+
+
+def _walkUnits(unit: Unit):
+    yield unit
+    for u in unit._units:
+        yield from _walkUnits(u)
+
+
+class SimModelCache():
+    """
+    Persistent on-disk cache of generated simulation models
+
+    Entry is addressed by digest of the unit class, values of its
+    configuration, serializer, target platform and sources of hwt.
+    It contains generated source, compiled bytecode of the model
+    and names of signals and directions of interfaces of the unit.
+    On cache hit the unit is not synthesised, only its declarations
+    are loaded and its interfaces are bound directly to signals of model.
+
+    Sources of modules of all unit and interface classes used in hierarchy
+    of the unit and of modules they import are checked on each load
+    and entry is discarded if any of them changed
+    (see :meth:`~._sourceDependencies`).
+
+    :attention: Dependencies are resolved from objects in the namespace
+        of modules, a plain constant imported by "from x import CONST"
+        or a module which is imported only inside of a function
+        is not tracked. Use :meth:`~.clear` to invalidate the cache
+        after change of such a dependency.
+    :attention: Unit with configuration which can not be converted
+        to stable string (its repr contains address of the object)
+        is not cached.
+    :attention: On cache hit the unit is only elaborated, it does not have
+        netlist, entity or architecture.
+
+    Loaded entries are also kept in memory, next load of the same model
+    in this process (f.e. in worker of ParallelSimTestRunner) only executes
+    its compiled code.
+
+    :ivar cacheDir: directory where cache entries are stored,
+        if None entries are kept only in memory
+    :ivar _loaded: dictionary {key: (meta, code object)} of loaded entries
+    """
+
+    def __init__(self, cacheDir: Optional[str]):
+        self.cacheDir = cacheDir
+        self._loaded = {}
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache (from memory and from cacheDir)
+        """
+        self._loaded.clear()
+        if self.cacheDir is None or not os.path.isdir(self.cacheDir):
+            return
+        for fn in os.listdir(self.cacheDir):
+            if fn.endswith((".json", ".code", ".py", ".tmp")):
+                try:
+                    os.remove(os.path.join(self.cacheDir, fn))
+                except OSError:
+                    # removed by other process
+                    pass
+
+    def _key(self, unit: Unit, targetPlatform, serializer) -> Optional[str]:
+        """
+        :return: key of cache entry for unit or None if unit can not be cached
+        """
+        cfg = []
+        for name, v in sorted(vars(unit).items(), key=lambda x: x[0]):
+            if name.startswith("_"):
+                continue
+            if isinstance(v, Param):
+                v = evalParam(v)
+            v = repr(v)
+            if " at 0x" in v:
+                return None
+            cfg.append((name, v))
+
+        cls = unit.__class__
+        h = hashlib.sha1()
+        for item in (cls.__module__,
+                     cls.__qualname__,
+                     repr(getattr(unit, "_name", None)),
+                     repr(cfg),
+                     serializer.__module__,
+                     serializer.__qualname__,
+                     targetPlatform.__class__.__module__,
+                     targetPlatform.__class__.__qualname__,
+                     hwtSourcesDigest(),
+                     repr(importlib.util.MAGIC_NUMBER)):
+            h.update(item.encode())
+            h.update(b"\0")
+
+        return h.hexdigest()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cacheDir, key + ext)
+
+    def _writeFile(self, key: str, ext: str, data: bytes) -> None:
+        # write to temporary file and rename it to prevent other processes
+        # from reading half written file
+        p = self._path(key, ext)
+        tmp = "%s.%d.tmp" % (p, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, p)
+
+    @staticmethod
+    def _sourceDependencies(unit: Unit) -> Dict[str, str]:
+        """
+        :return: dictionary {source file: digest} for modules of all classes
+            of units and interfaces in hierarchy of the unit and for modules
+            imported by them (except hwt and python standard library)
+
+        Imports are followed transitively only inside of top level packages
+        of unit and interface classes, modules from other packages
+        are checked but their imports are not followed.
+        """
+        classes = set()
+        for u in _walkUnits(unit):
+            classes.update(u.__class__.__mro__)
+            for i in _walkInterfaces(u._interfaces):
+                classes.update(i.__class__.__mro__)
+
+        toVisit = []
+        for c in classes:
+            m = sys.modules.get(c.__module__, None)
+            if m is not None:
+                toVisit.append(m)
+        rootPackages = set(m.__name__.split(".")[0] for m in toVisit)
+
+        seen = set()
+        deps = {}
+        while toVisit:
+            m = toVisit.pop()
+            if m.__name__ in seen:
+                continue
+            seen.add(m.__name__)
+
+            f = _moduleSourceFile(m)
+            if f is None:
+                continue
+            deps[f] = _fileDigest(f)
+            if m.__name__.split(".")[0] not in rootPackages:
+                continue
+
+            # follow modules, functions, classes and constants
+            # which this module imports
+            for v in list(vars(m).values()):
+                if isinstance(v, ModuleType):
+                    dep = v
+                else:
+                    depName = getattr(v, "__module__", None)
+                    if not isinstance(depName, str):
+                        continue
+                    dep = sys.modules.get(depName, None)
+                if dep is not None and dep.__name__ not in seen:
+                    toVisit.append(dep)
+
+        return deps
+
+    def _load(self, key: str):
+        """
+        :return: tuple (meta, code object) or None if entry is not valid
+        """
+        try:
+            with open(self._path(key, ".json")) as f:
+                meta = json.load(f)
+            with open(self._path(key, ".code"), "rb") as f:
+                code = marshal.loads(f.read())
+        except (OSError, ValueError, EOFError, TypeError):
+            return None
+
+        for f, digest in meta["deps"].items():
+            if _fileDigest(f) != digest:
+                return None
+
+        return meta, code
+
+    def _store(self, key: str, unit: Unit, code: str) -> object:
+        """
+        Store generated model in cache
+
+        :return: compiled code of model
+        """
+        if self.cacheDir is None:
+            compiled = compile(code, key + ".py", "exec")
+            meta = {
+                "name": unit._name,
+                "interfaces": self._interfacesInfo(unit),
+            }
+        else:
+            os.makedirs(self.cacheDir, exist_ok=True)
+            src = self._path(key, ".py")
+            compiled = compile(code, src, "exec")
+            meta = {
+                "name": unit._name,
+                "interfaces": self._interfacesInfo(unit),
+                "deps": self._sourceDependencies(unit),
+            }
+            self._writeFile(key, ".py", code.encode())
+            self._writeFile(key, ".code", marshal.dumps(compiled))
+            # meta is written last because its presence marks complete entry
+            self._writeFile(key, ".json", json.dumps(meta).encode())
+
+        self._loaded[key] = (meta, compiled)
+        return compiled
+
+    @staticmethod
+    def _interfacesInfo(unit: Unit) -> List:
+        """
+        :return: list of tuples (direction name, signal name or None)
+            for all interfaces of synthesised unit
+        """
+        interfaces = []
+        for i in _walkInterfaces(unit._interfaces):
+            if i._interfaces:
+                sigName = None
+            else:
+                sigName = i._sigInside.name
+            interfaces.append((i._direction.name, sigName))
+        return interfaces
+
+    @staticmethod
+    def _bindInterfaces(unit: Unit, modelCls, interfaces: List) -> None:
+        """
+        Set directions of interfaces of the unit and connect them
+        to signals of model as it would be after synthesis of the unit
+        """
+        unit._loadDeclarations()
+        allInterfaces = list(_walkInterfaces(unit._interfaces))
+        assert len(allInterfaces) == len(interfaces), (
+            "Cached model does not match the unit", unit)
+        for i, (d, sigName) in zip(allInterfaces, interfaces):
+            i._direction = INTF_DIRECTION[d]
+            if sigName is not None:
+                i._sigInside = getattr(modelCls, sigName)
+
+    def getModelCls(self, unit: Unit, targetPlatform=DummyPlatform(),
+                    serializer=None):
+        """
+        Load simulation model class for unit from cache
+        or generate it and store it in cache
+
+        :param unit: unit instance (declarations should not be loaded yet)
+        :param targetPlatform: target platform for synthesis
+        :param serializer: serializer class used to generate sim model
+        :return: class of simulation model
+        """
+        if serializer is None:
+            from hwt.serializer.simModel.serializer import SimModelSerializer
+            serializer = SimModelSerializer
+
+        key = self._key(unit, targetPlatform, serializer)
+        cached = None
+        if key is not None:
+            cached = self._loaded.get(key, None)
+            if cached is None and self.cacheDir is not None:
+                cached = self._load(key)
+                if cached is not None:
+                    self._loaded[key] = cached
+
+        if cached is None:
+            code = toRtl(unit, targetPlatform=targetPlatform,
+                         serializer=serializer)
+            if key is None:
+                compiled = compile(code, unit._name, "exec")
+            else:
+                compiled = self._store(key, unit, code)
+            name = unit._name
+        else:
+            meta, compiled = cached
+            name = meta["name"]
+
+        simModule = ModuleType('simModule')
+        simModule.__file__ = compiled.co_filename
+        exec(compiled, simModule.__dict__)
+        modelCls = simModule.__dict__[name]
+
+        if cached is not None:
+            unit._name = name
+            self._bindInterfaces(unit, modelCls, meta["interfaces"])
+
+        return modelCls
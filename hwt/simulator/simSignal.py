@@ -1,4 +1,9 @@
+from typing import Tuple
+
+from hwt.hdl.value import Value
 from hwt.hdl.variables import SignalItem
+from hwt.simulator.types.simArray import SimArrayVal
+from hwt.simulator.utils import valueHasChanged
 
 
 class SimSignal(SignalItem):
@@ -7,9 +12,13 @@ class SimSignal(SignalItem):
 
     :ivar _writeCallbacks: list of callback functions(signal, simulator)
         which is called when new (changed) value is written to this signal
+    :ivar simSensMasks: dictionary {process: mask of bits} for processes
+        from simSensProcs which are reading only some bits of this signal,
+        such process is woken up only if some of these bits has changed
     """
     __slots__ = ["name", "_val", "_oldVal", "_writeCallbacks",
-                 "simSensProcs", "simRisingSensProcs", "simFallingSensProcs"]
+                 "simSensProcs", "simRisingSensProcs", "simFallingSensProcs",
+                 "simSensMasks"]
 
     def __init__(self, ctx, name, dtype, defVal=None):
         ctx.signals.add(self)
@@ -17,6 +26,7 @@ class SimSignal(SignalItem):
         self._writeCallbacks = []
         self._writeCallbacksToEn = []
         self.simSensProcs = set()
+        self.simSensMasks = {}
         self.simRisingSensProcs = set()
         self.simFallingSensProcs = set()
         super(SimSignal, self).__init__(name, dtype, defVal)
@@ -45,6 +55,7 @@ class SimSignal(SignalItem):
 
     def simPropagateChanges(self, simulator):
         v = self._val
+        old = self._oldVal
         self._oldVal = v
 
         if self._writeCallbacksToEn:
@@ -53,8 +64,16 @@ class SimSignal(SignalItem):
         log = simulator.config.logPropagation
         if log:
             log(simulator, self, self.simSensProcs)
-        for p in self.simSensProcs:
-            simulator._addHdlProcToRun(self, p)
+        masks = self.simSensMasks
+        if masks and old is not v:
+            changed = (old.val ^ v.val) | (old.vldMask ^ v.vldMask)
+            for p in self.simSensProcs:
+                m = masks.get(p, None)
+                if m is None or m & changed:
+                    simulator._addHdlProcToRun(self, p)
+        else:
+            for p in self.simSensProcs:
+                simulator._addHdlProcToRun(self, p)
 
         # run write callbacks we have to create new list to allow
         # registering of new call backs in callbacks
@@ -85,13 +104,57 @@ class SimSignal(SignalItem):
         dirtyFlag, newVal = valUpdater(self._oldVal)
 
         if dirtyFlag:
-            self._val = newVal
-            newVal.updateTime = simulator.now
-            log = simulator.config.logChange
-            if log:
-                log(simulator.now, self, newVal)
+            self.simSetNewVal(simulator, newVal)
+
+    def simSetNewVal(self, simulator, newVal: Value):
+        """
+        Set changed value to this signal and propagate change
+
+        :attention: newVal is owned by this signal after this call
+            (its updateTime is modified, and it is returned from reads)
+            and it can not be shared with other signal or process
+        """
+        self._val = newVal
+        newVal.updateTime = simulator.now
+        log = simulator.config.logChange
+        if log:
+            log(simulator.now, self, newVal)
 
-            self.simPropagateChanges(simulator)
+        self.simPropagateChanges(simulator)
+
+    def simApplyVal(self, simulator, nextVal: Value):
+        """
+        Method called by simulator to apply value from hdl process
+        (same as simUpdateVal, but without updater function)
+
+        :note: nextVal is copied only if it differs from current value
+        """
+        if valueHasChanged(self._oldVal, nextVal):
+            self.simSetNewVal(simulator, nextVal.clone())
+
+    def simApplyItemVal(self, simulator, indexes: Tuple[Value],
+                        nextItemVal: Value):
+        """
+        Method called by simulator to apply value of item of array
+        from hdl process
+        """
+        currentVal = self._oldVal
+        if isinstance(currentVal, SimArrayVal):
+            # updated in place without clone of item
+            change = currentVal._updateItem__val(indexes, nextItemVal)
+        else:
+            if len(indexes) > 1:
+                raise NotImplementedError("[TODO] implement for more indexes")
+
+            index = indexes[0]
+            change = valueHasChanged(currentVal._getitem__val(index),
+                                     nextItemVal)
+            if change or not index._isFullVld():
+                # write on invalid index invalidates whole array
+                currentVal._setitem__val(index, nextItemVal)
+
+        if change:
+            self.simSetNewVal(simulator, currentVal)
 
     def __repr__(self):
         return "<%s, %s>" % (self.__class__.__name__, self.name)
@@ -1,43 +1,22 @@
 from _random import Random
-from collections import deque
-from inspect import isgenerator
 import os
 import unittest
 
 from hwt.hdl.constants import Time
-from hwt.hdl.types.arrayVal import HArrayVal
-from hwt.hdl.value import Value
-from hwt.simulator.agentConnector import valToInt
+from hwt.serializer.simModel.serializer import SimModelSerializer
+from hwt.simulator.agentConnector import allValuesToInts, valToInt
 from hwt.simulator.configVhdlTestbench import HdlSimConfigVhdlTestbench
+from hwt.simulator.hdlSimConfig import HdlSimConfig
 from hwt.simulator.hdlSimulator import HdlSimulator
-from hwt.simulator.shortcuts import simPrepare
+from hwt.simulator.randomizationSchedule import \
+    scheduledRandomizationProcess
+from hwt.simulator.shortcuts import simPrepare, simPrepareLanes
 from hwt.simulator.simSignal import SimSignal
-from hwt.simulator.vcdHdlSimConfig import VcdHdlSimConfig
+from hwt.simulator.vcdHdlSimConfig import VcdHdlSimConfig, VCD_TRACE_LEVEL, \
+    openVcdFile
 from hwt.synthesizer.dummyPlatform import DummyPlatform
 
 
-def allValuesToInts(sequenceOrVal):
-    if isinstance(sequenceOrVal, HArrayVal):
-        sequenceOrVal = sequenceOrVal.val
-
-    if isinstance(sequenceOrVal, Value):
-        return valToInt(sequenceOrVal)
-    elif not sequenceOrVal:
-        return sequenceOrVal
-    elif (isinstance(sequenceOrVal, (list, tuple, deque))
-          or isgenerator(sequenceOrVal)):
-        seq = []
-        for i in sequenceOrVal:
-            seq.append(allValuesToInts(i))
-
-        if isinstance(sequenceOrVal, tuple):
-            return tuple(seq)
-
-        return seq
-    else:
-        return sequenceOrVal
-
-
 class SimTestCase(unittest.TestCase):
     """
     This is TestCase class contains methods which are usually used during
@@ -45,34 +24,75 @@ class SimTestCase(unittest.TestCase):
 
     :attention: self.model, self.procs has to be specified before running
         runSim (you can use prepareUnit method)
+
+    :cvar _simModelCache: optional SimModelCache instance used by prepareUnit
+        to load simulation models generated by previous runs
+    :cvar _simulatorCls: class of simulator used by runSim
+        (f.e. CycleHdlSimulator for single clock synchronous designs)
+    :cvar _traceLevel: VCD_TRACE_LEVEL of VCD dumped by runSim
+    :cvar _traceGlobs: glob patterns of dumped signals
+        for VCD_TRACE_LEVEL.GLOB
+    :cvar _traceTimeWindow: optional tuple (start, end), only changes
+        in this time are dumped
+    :cvar _traceCompress: if True VCD is compressed by gzip
+    :cvar _traceBufferSize: size of write buffer of VCD (in characters)
+
+    :ivar traceFiles: list of names of trace files written by runSim
+        in this test
     """
     _defaultSeed = 317
+    _simModelCache = None
+    _simulatorCls = HdlSimulator
+    _traceLevel = VCD_TRACE_LEVEL.ALL
+    _traceGlobs = None
+    _traceTimeWindow = None
+    _traceCompress = False
+    _traceBufferSize = 1 << 20
 
     def getTestName(self):
         className, testName = self.id().split(".")[-2:]
         return "%s_%s" % (className, testName)
 
     def runSim(self, until: float, name=None, config=None):
-        if name is None:
-            outputFileName = "tmp/" + self.getTestName() + ".vcd"
-        else:
-            outputFileName = name
-
-        d = os.path.dirname(outputFileName)
-        if d:
-            os.makedirs(d, exist_ok=True)
-        with open(outputFileName, 'w') as outputFile:
-            sim = HdlSimulator()
+        """
+        Run simulation of self.model with self.procs
 
+        :param name: name of VCD file (default is tmp/<test name>.vcd)
+        :param config: config of simulator, if is None VcdHdlSimConfig
+            configured by _trace* class variables is used
+            (VCD file is not created if _traceLevel is NONE)
+        """
+        if config is not None or self._traceLevel == VCD_TRACE_LEVEL.NONE:
             if config is None:
-                # configure simulator to log in vcd
-                config = VcdHdlSimConfig(outputFile)
-            sim.config = config
+                config = HdlSimConfig()
+            return self._runSim(until, config)
 
-            # run simulation, stimul processes are register after initial
-            # initialization
-            sim.simUnit(self.model, until=until, extraProcesses=self.procs)
-            return sim
+        if name is None:
+            name = "tmp/" + self.getTestName() + ".vcd"
+
+        with openVcdFile(name, compress=self._traceCompress) as outputFile:
+            try:
+                traceFiles = self.traceFiles
+            except AttributeError:
+                # setUp of subclass does not have to call super().setUp()
+                traceFiles = self.traceFiles = []
+            traceFiles.append(outputFile.name)
+            # configure simulator to log in vcd
+            config = VcdHdlSimConfig(outputFile,
+                                     traceLevel=self._traceLevel,
+                                     traceGlobs=self._traceGlobs,
+                                     timeWindow=self._traceTimeWindow,
+                                     bufferSize=self._traceBufferSize)
+            return self._runSim(until, config)
+
+    def _runSim(self, until: float, config):
+        sim = self._simulatorCls()
+        sim.config = config
+
+        # run simulation, stimul processes are register after initial
+        # initialization
+        sim.simUnit(self.model, until=until, extraProcesses=self.procs)
+        return sim
 
     def __serializeTestbenchDump(self, until: float, file):
         sim = HdlSimulator()
@@ -140,7 +160,7 @@ class SimTestCase(unittest.TestCase):
 
         def randomEnProc(sim):
             # small space at start to modify agents when they are inactive
-            yield sim.wait(timeQuantum / 4)
+            yield sim.wait(timeQuantum // 4)
             while True:
                 en = random.random() < 0.5
                 if agent.getEnable() != en:
@@ -149,15 +169,27 @@ class SimTestCase(unittest.TestCase):
                 yield sim.wait(delay)
         return randomEnProc
 
+    def scheduledRandomizationProcess(self, agent):
+        """
+        Like :meth:`~.simpleRandomizationProcess` but the enable timeline
+        is precomputed in chunks and the process is woken up only
+        when enable changes, the order of process wake ups
+        differs (see
+        :func:`hwt.simulator.randomizationSchedule.scheduledRandomizationProcess`)
+        """
+        seed = self._rand.getrandbits(64)
+        return scheduledRandomizationProcess(agent, seed)
+
     def randomize(self, intf):
         """
         Randomly disable and enable interface for testing purposes
         """
-        randomEnProc = self.simpleRandomizationProcess(intf._ag)
+        randomEnProc = self.scheduledRandomizationProcess(intf._ag)
         self.procs.append(randomEnProc)
 
     def prepareUnit(self, unit, modelCls=None, dumpModelIn=None,
-                    onAfterToRtl=None, targetPlatform=DummyPlatform()):
+                    onAfterToRtl=None, targetPlatform=DummyPlatform(),
+                    serializer=SimModelSerializer, flatten=False):
         """
         Create simulation model and connect it with interfaces of original unit
         and decorate it with agents and collect all simulation processes
@@ -169,13 +201,44 @@ class SimTestCase(unittest.TestCase):
             sim model will be constructed only in memory)
         :param onAfterToRtl: callback fn(unit) which will be called unit after
             it will be synthesised to rtl
+        :param serializer: serializer class used to generate sim model
+        :param flatten: if True hierarchy of sim model is inlined
+            into a single model
+
+        :note: if _simModelCache is set, model is loaded from it if possible
         """
         self.u, self.model, self.procs = simPrepare(
             unit,
             modelCls=modelCls,
             targetPlatform=targetPlatform,
             dumpModelIn=dumpModelIn,
-            onAfterToRtl=onAfterToRtl)
+            onAfterToRtl=onAfterToRtl,
+            serializer=serializer,
+            flatten=flatten,
+            modelCache=self._simModelCache)
+
+    def prepareLanes(self, unitFactory, lanes, targetPlatform=DummyPlatform(),
+                     flatten=False):
+        """
+        Create simulation model which simulates multiple independent
+        instances of the unit at once (see :func:`~.simPrepareLanes`)
+        and collect simulation processes of agents of all lanes
+
+        :param unitFactory: function() -> Unit (f.e. class of the unit)
+        :param lanes: number of lanes
+        :param flatten: if True hierarchy of sim model is inlined
+            into a single model
+
+        :note: units of lanes are stored in self.units,
+            self.u is unit of the first lane
+        """
+        self.units, self.model, self.procs = simPrepareLanes(
+            unitFactory, lanes,
+            targetPlatform=targetPlatform,
+            flatten=flatten,
+            modelCache=self._simModelCache)
+        self.u = self.units[0]
 
     def setUp(self):
         self._rand = Random(self._defaultSeed)
+        self.traceFiles = []
@@ -0,0 +1,397 @@
+from collections import OrderedDict
+from math import ceil
+import multiprocessing
+import os
+import random
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+import unittest
+
+from hwt.simulator.simModelCache import SimModelCache
+from hwt.simulator.simTestCase import SimTestCase
+
+
+class SIM_TEST_OUTCOME():
+    SUCCESS = "success"
+    FAILURE = "failure"
+    ERROR = "error"
+    SKIPPED = "skipped"
+    EXPECTED_FAILURE = "expectedFailure"
+    UNEXPECTED_SUCCESS = "unexpectedSuccess"
+
+
+class SimTestResult():
+    """
+    Result of single test executed in worker process
+    (picklable summary of outcome which is sent to main process)
+
+    :ivar testId: id of test (f.e. "module.Class.test_name")
+    :ivar outcome: SIM_TEST_OUTCOME value
+    :ivar details: formated traceback or reason of skip
+    :ivar duration: wall time of test in seconds
+    :ivar traceFiles: names of trace files written by the test
+    :ivar worker: pid of worker process
+    """
+
+    def __init__(self, testId: str, outcome: str, details: str=None,
+                 duration: float=0.0, traceFiles: List[str]=(),
+                 worker: int=None):
+        self.testId = testId
+        self.outcome = outcome
+        self.details = details
+        self.duration = duration
+        self.traceFiles = list(traceFiles)
+        self.worker = worker
+
+    def __repr__(self):
+        return "<%s %s %s>" % (self.__class__.__name__,
+                               self.testId, self.outcome)
+
+
+class _RecordingTestResult(unittest.TestResult):
+    """
+    unittest.TestResult which records SimTestResult for each test
+    and seeds global random generator before each test
+
+    :ivar records: dictionary {index of test: list of SimTestResult}
+    """
+
+    def __init__(self, indexes: Dict[int, int], defaultIndex: int):
+        """
+        :param indexes: dictionary {id(test): index of test}
+        :param defaultIndex: index of test to which errors outside
+            of tests (f.e. in setUpClass) are reported
+        """
+        super(_RecordingTestResult, self).__init__()
+        self.records = {i: [] for i in indexes.values()}
+        self._indexes = indexes
+        self._defaultIndex = defaultIndex
+        self._index = None
+        self._startTime = None
+
+    def startTest(self, test):
+        super(_RecordingTestResult, self).startTest(test)
+        self._index = self._indexes[id(test)]
+        # results of test do not depend on order of tests
+        random.seed(getattr(test, "_defaultSeed", 0))
+        self._startTime = time.perf_counter()
+
+    def _record(self, test, outcome, details=None):
+        if self._startTime is None:
+            duration = 0.0
+        else:
+            duration = time.perf_counter() - self._startTime
+        index = self._index
+        if index is None:
+            index = self._defaultIndex
+        self.records[index].append(SimTestResult(
+            test.id(), outcome, details, duration,
+            getattr(test, "traceFiles", ()), os.getpid()))
+
+    def stopTest(self, test):
+        super(_RecordingTestResult, self).stopTest(test)
+        self._index = None
+        self._startTime = None
+
+    def addSuccess(self, test):
+        self._record(test, SIM_TEST_OUTCOME.SUCCESS)
+
+    def addFailure(self, test, err):
+        self._record(test, SIM_TEST_OUTCOME.FAILURE,
+                     self._exc_info_to_string(err, test))
+
+    def addError(self, test, err):
+        self._record(test, SIM_TEST_OUTCOME.ERROR,
+                     self._exc_info_to_string(err, test))
+
+    def addSkip(self, test, reason):
+        self._record(test, SIM_TEST_OUTCOME.SKIPPED, reason)
+
+    def addExpectedFailure(self, test, err):
+        self._record(test, SIM_TEST_OUTCOME.EXPECTED_FAILURE,
+                     self._exc_info_to_string(err, test))
+
+    def addUnexpectedSuccess(self, test):
+        self._record(test, SIM_TEST_OUTCOME.UNEXPECTED_SUCCESS)
+
+    def addSubTest(self, test, subtest, err):
+        if err is not None:
+            if issubclass(err[0], test.failureException):
+                outcome = SIM_TEST_OUTCOME.FAILURE
+            else:
+                outcome = SIM_TEST_OUTCOME.ERROR
+            self._record(subtest, outcome,
+                         self._exc_info_to_string(err, subtest))
+
+
+# tests of suite for workers created by fork (indexes are sent instead
+# of names of tests, tests do not have to be loadable by name)
+_forkedTests = None
+
+
+def _initWorker(modelCache: Optional[SimModelCache]):
+    if modelCache is not None:
+        # model is built only once in each worker for each unit class
+        # and configuration, tests can override it by own cache
+        # (or disable it by _simModelCache = None)
+        SimTestCase._simModelCache = modelCache
+
+
+def _runTestGroup(group):
+    """
+    Run group of tests in worker process
+
+    :param group: list of tuples (index of test, id of test)
+    :return: dictionary {index of test: list of SimTestResult}
+    """
+    loader = unittest.defaultTestLoader
+    suite = unittest.TestSuite()
+    indexes = {}
+    for index, testId in group:
+        if _forkedTests is None:
+            tests = []
+            _flattenSuite(loader.loadTestsFromName(testId), tests)
+        else:
+            tests = [_forkedTests[index], ]
+        for t in tests:
+            indexes[id(t)] = index
+            suite.addTest(t)
+
+    r = _RecordingTestResult(indexes, group[0][0])
+    try:
+        # class and module fixtures are executed by the suite
+        suite.run(r)
+    except Exception:
+        index, testId = group[0]
+        r.records[index].append(SimTestResult(
+            testId, SIM_TEST_OUTCOME.ERROR, traceback.format_exc(),
+            worker=os.getpid()))
+
+    return r.records
+
+
+def _flattenSuite(suite, tests: list):
+    if isinstance(suite, unittest.TestSuite):
+        for t in suite:
+            _flattenSuite(t, tests)
+    else:
+        tests.append(suite)
+
+
+class ParallelSimTestResult():
+    """
+    Results of tests executed by ParallelSimTestRunner
+
+    :ivar results: list of SimTestResult in order of tests in suite
+    :ivar duration: wall time of run of all tests in seconds
+    :ivar workers: number of used worker processes
+    """
+
+    def __init__(self, results: List[SimTestResult], duration: float,
+                 workers: int):
+        self.results = results
+        self.duration = duration
+        self.workers = workers
+
+    def _withOutcome(self, *outcomes) -> List[SimTestResult]:
+        return [r for r in self.results if r.outcome in outcomes]
+
+    @property
+    def failures(self) -> List[SimTestResult]:
+        return self._withOutcome(SIM_TEST_OUTCOME.FAILURE)
+
+    @property
+    def errors(self) -> List[SimTestResult]:
+        return self._withOutcome(SIM_TEST_OUTCOME.ERROR)
+
+    @property
+    def testsRun(self) -> int:
+        return len(self.results)
+
+    def wasSuccessful(self) -> bool:
+        return not self._withOutcome(SIM_TEST_OUTCOME.FAILURE,
+                                     SIM_TEST_OUTCOME.ERROR,
+                                     SIM_TEST_OUTCOME.UNEXPECTED_SUCCESS)
+
+
+class ParallelSimTestRunner():
+    """
+    Test runner which distributes tests (usually SimTestCase) across
+    pool of worker processes
+
+    * tests are grouped by TestCase class (tests of the same class usually
+      simulate the same unit with the same parameters), each group
+      is executed by a single worker, if modelCache is specified model
+      of unit is built only once in the worker (through SimModelCache
+      which stays in the memory of the worker)
+    * global random generator is seeded by _defaultSeed before each test
+      and SimTestCase seeds its own generator in setUp,
+      results do not depend on the order of tests or on the worker
+    * outcome, duration and names of trace files are collected
+      for each test
+
+    Usage:
+
+    .. code-block:: python
+
+        suite = unittest.defaultTestLoader.loadTestsFromNames(names)
+        res = ParallelSimTestRunner(workers=8).run(suite)
+        sys.exit(not res.wasSuccessful())
+
+    :ivar workers: number of worker processes, if None number of cpus is used
+    :ivar modelCache: optional SimModelCache used by SimTestCase in workers
+        (opt-in, on cache hit the unit is not synthesised,
+        see :class:`hwt.simulator.simModelCache.SimModelCache`)
+    :ivar stream: output stream for progress and report
+    :ivar verbosity: 0 - only summary, 1 - dots, 2 - name of each test
+    :attention: if os.fork is not available tests has to be loadable
+        by their ids (unittest.TestLoader.loadTestsFromName)
+    """
+
+    def __init__(self, workers: Optional[int]=None,
+                 modelCache: Optional[SimModelCache]=None,
+                 stream=sys.stderr, verbosity: int=1):
+        self.workers = workers
+        self.modelCache = modelCache
+        self.stream = stream
+        self.verbosity = verbosity
+
+    def _groups(self, tests: list, workers: int) -> List[list]:
+        """
+        Group tests by class, groups which are too large to be balanced
+        across workers are split
+        """
+        byCls = OrderedDict()
+        for i, t in enumerate(tests):
+            byCls.setdefault(type(t), []).append((i, t.id()))
+
+        maxSize = max(1, ceil(len(tests) / workers))
+        groups = []
+        for g in byCls.values():
+            for i in range(0, len(g), maxSize):
+                groups.append(g[i:i + maxSize])
+
+        # largest groups first for better load balancing
+        groups.sort(key=len, reverse=True)
+        return groups
+
+    def _reportProgress(self, records: List[SimTestResult]):
+        w = self.stream.write
+        for r in records:
+            if self.verbosity >= 2:
+                w("%s ... %s\n" % (r.testId, r.outcome))
+            elif self.verbosity == 1:
+                w({
+                    SIM_TEST_OUTCOME.SUCCESS: ".",
+                    SIM_TEST_OUTCOME.FAILURE: "F",
+                    SIM_TEST_OUTCOME.ERROR: "E",
+                    SIM_TEST_OUTCOME.SKIPPED: "s",
+                    SIM_TEST_OUTCOME.EXPECTED_FAILURE: "x",
+                    SIM_TEST_OUTCOME.UNEXPECTED_SUCCESS: "u",
+                }[r.outcome])
+        self.stream.flush()
+
+    def _printReport(self, res: ParallelSimTestResult):
+        w = self.stream.write
+        if self.verbosity == 1:
+            w("\n")
+
+        for r in res.errors + res.failures:
+            w("=" * 70 + "\n")
+            w("%s: %s\n" % (r.outcome.upper(), r.testId))
+            w("-" * 70 + "\n")
+            w("%s\n" % r.details)
+
+        w("-" * 70 + "\n")
+        w("Ran %d tests in %.3fs (%d workers)\n\n" % (
+            res.testsRun, res.duration, res.workers))
+        if res.wasSuccessful():
+            w("OK\n")
+        else:
+            w("FAILED (failures=%d, errors=%d)\n" % (
+                len(res.failures), len(res.errors)))
+        self.stream.flush()
+
+    def run(self, test) -> ParallelSimTestResult:
+        """
+        Run all tests from test suite (or a single test)
+        """
+        global _forkedTests
+        tests = []
+        _flattenSuite(test, tests)
+
+        workers = self.workers
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(tests)))
+        groups = self._groups(tests, workers)
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context("fork")
+            _forkedTests = tests
+        else:
+            ctx = multiprocessing.get_context()
+
+        results = [[] for _ in tests]
+        start = time.perf_counter()
+        # buffered data would be written by each process otherwise
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            with ctx.Pool(workers, initializer=_initWorker,
+                          initargs=(self.modelCache,)) as pool:
+                for groupRes in pool.imap_unordered(_runTestGroup, groups):
+                    for index, records in sorted(groupRes.items()):
+                        results[index] = records
+                        self._reportProgress(records)
+        finally:
+            _forkedTests = None
+
+        res = ParallelSimTestResult(
+            [r for records in results for r in records],
+            time.perf_counter() - start,
+            workers)
+        self._printReport(res)
+        return res
+
+
+def main(argv=None):
+    """
+    Run tests specified by names (as for unittest) in parallel
+
+    python3 -m hwt.simulator.simTestRunner -j 8 module.TestCls ...
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Run tests in parallel in multiple processes")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes"
+                             " (default number of cpus)")
+    parser.add_argument("--model-cache", default=None,
+                        help="directory of persistent cache"
+                             " of simulation models")
+    parser.add_argument("--memory-model-cache", action="store_true",
+                        help="reuse simulation models in worker process"
+                             " (without persistent cache)")
+    parser.add_argument("-v", "--verbose", action="store_const", const=2,
+                        default=1, dest="verbosity")
+    parser.add_argument("-q", "--quiet", action="store_const", const=0,
+                        dest="verbosity")
+    parser.add_argument("tests", nargs="+", help="names of tests")
+    args = parser.parse_args(argv)
+
+    suite = unittest.defaultTestLoader.loadTestsFromNames(args.tests)
+    if args.model_cache is not None or args.memory_model_cache:
+        modelCache = SimModelCache(args.model_cache)
+    else:
+        modelCache = None
+    runner = ParallelSimTestRunner(workers=args.jobs,
+                                   modelCache=modelCache,
+                                   verbosity=args.verbosity)
+    return 0 if runner.run(suite).wasSuccessful() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,419 @@
+from array import array
+import sys
+from typing import List, Optional, Tuple, Union
+
+from hwt.bitmask import mask
+from hwt.hdl.types.array import HArray
+from hwt.hdl.types.arrayVal import HArrayVal
+from hwt.hdl.types.bits import Bits
+from hwt.hdl.types.defs import BOOL
+from hwt.hdl.value import Value
+from hwt.simulator.intArray import intArrayTypecode, intArrayFull, \
+    intArrayToNumpy
+from hwt.synthesizer.param import evalParam
+
+
+__simHArrayCache = {}
+
+
+def simHArray(elmType, size: int):
+    """
+    Construct SimHArrayT with cache
+    """
+    k = (elmType, size)
+    try:
+        return __simHArrayCache[k]
+    except KeyError:
+        t = SimHArrayT(elmType, size)
+        __simHArrayCache[k] = t
+        return t
+
+
+def isSimHArrayCompatible(t) -> bool:
+    """
+    :return: True if items of (possibly nested) array type are Bits
+        and array can be represented by SimHArrayT
+    """
+    while isinstance(t, HArray):
+        t = t.elmType
+    return isinstance(t, Bits)
+
+
+class SimHArrayT(HArray):
+    """
+    Array type for simulation, its values (SimArrayVal) are stored
+    in flat arrays of integers instead of Value instance for each item
+
+    :ivar itemType: type of items of innermost array
+    :ivar itemCnt: number of items of innermost arrays in this array
+    :ivar rowSize: number of items of innermost arrays in element
+        of this array (1 if element is not array)
+    """
+
+    def __init__(self, elmType, size: int):
+        size = evalParam(size)
+        if isinstance(size, Value):
+            size = int(size)
+        super(SimHArrayT, self).__init__(elmType, size)
+
+        if isinstance(elmType, SimHArrayT):
+            self.itemType = elmType.itemType
+            self.rowSize = elmType.itemCnt
+        else:
+            assert isinstance(elmType, Bits), elmType
+            self.itemType = elmType
+            self.rowSize = 1
+        self.itemCnt = size * self.rowSize
+
+        t = self.itemType
+        self._itemWidth = t.bit_length()
+        self._itemMask = mask(self._itemWidth)
+        self._itemSigned = bool(t.signed)
+        self._dataTypecode = intArrayTypecode(self._itemWidth,
+                                              self._itemSigned)
+        self._vldTypecode = intArrayTypecode(self._itemWidth, False)
+
+    def __eq__(self, other):
+        return self is other or (
+            isinstance(other, HArray) and
+            self.size == other.size and
+            self.elmType == other.elmType
+        )
+
+    def __hash__(self):
+        return hash((self.elmType, self.size))
+
+    @classmethod
+    def getValueCls(cls):
+        return SimArrayVal
+
+    def _newStorage(self) -> Tuple[Union[array, list], Union[array, list]]:
+        """
+        :return: tuple (data, vld) with all items zero and invalid
+        """
+        n = self.itemCnt
+        return (intArrayFull(self._dataTypecode, n),
+                intArrayFull(self._vldTypecode, n))
+
+    def __repr__(self, indent=0, withAddr=None, expandStructs=False):
+        return "<SimHArrayT %r[%d]>" % (self.elmType, self.size)
+
+
+class SimArrayVal(HArrayVal):
+    """
+    Value of array (memory) for simulation
+
+    Items are stored as integers in two flat arrays (values and validity
+    masks) instead of Value instance for each item, items of nested
+    arrays are stored in row-major order. Updates are performed in place
+    without any allocation of Value instances.
+
+    :note: val is tuple (data, vld), data and vld are array.array
+        (list of python ints for items wider than 64b)
+    :note: vldMask is 1 if value was initialized
+        (validity of items is in vld)
+    """
+
+    def __init__(self, val, dtype: SimHArrayT, vldMask, updateTime=-1):
+        """
+        :param val: tuple (data, vld) (used as is without copy)
+            or None or dictionary {index: value of element}
+            or iterable of values of elements
+        """
+        if not isinstance(val, tuple):
+            items = val
+            val = dtype._newStorage()
+            super(SimArrayVal, self).__init__(val, dtype, vldMask, updateTime)
+            if items is not None:
+                if isinstance(items, dict):
+                    items = items.items()
+                else:
+                    items = enumerate(items)
+                for i, v in items:
+                    self._setElement(int(i), v)
+        else:
+            super(SimArrayVal, self).__init__(val, dtype, vldMask, updateTime)
+
+    @classmethod
+    def fromPy(cls, val, typeObj: SimHArrayT, vldMask=None):
+        """
+        :param val: None or dictionary {index: value}
+            or iterable of values (python ints, Value instances
+            or nested iterables for nested arrays)
+        """
+        if vldMask == 0:
+            val = None
+        return cls(val, typeObj, int(val is not None))
+
+    def _setElement(self, i: int, v) -> None:
+        """
+        Set element on index i (without any check)
+        """
+        t = self._dtype
+        data, vld = self.val
+        if t.rowSize == 1:
+            if isinstance(v, Value):
+                data[i] = v.val
+                vld[i] = v.vldMask
+            elif v is None:
+                data[i] = 0
+                vld[i] = 0
+            else:
+                data[i] = v
+                vld[i] = t._itemMask
+        else:
+            if not isinstance(v, SimArrayVal):
+                v = t.elmType.fromPy(v)
+            r = t.rowSize
+            d, vl = v.val
+            data[i * r:(i + 1) * r] = d
+            vld[i * r:(i + 1) * r] = vl
+
+    def clone(self):
+        data, vld = self.val
+        return self.__class__((data[:], vld[:]), self._dtype, self.vldMask,
+                              self.updateTime)
+
+    def __hash__(self):
+        return hash((self._dtype, self.updateTime))
+
+    def _isFullVld(self):
+        t = self._dtype
+        m = t._itemMask
+        for v in self.val[1]:
+            if v != m:
+                return False
+        return True
+
+    def _getitem__val(self, key):
+        """
+        :return: Value of item for key (clone of row for nested array)
+        """
+        t = self._dtype
+        try:
+            kv = key.val
+            if not key._isFullVld() or kv < 0 or kv >= t.size:
+                raise KeyError()
+        except KeyError:
+            return t.elmType.fromPy(None)
+
+        data, vld = self.val
+        r = t.rowSize
+        if r == 1:
+            elmT = t.elmType
+            return elmT.getValueCls()(data[kv], elmT, vld[kv],
+                                      self.updateTime)
+        else:
+            i = kv * r
+            return self.__class__((data[i:i + r], vld[i:i + r]),
+                                  t.elmType, self.vldMask, self.updateTime)
+
+    def _updateItem__val(self, indexes: Tuple[Value], value: Value) -> bool:
+        """
+        Write item (or row of nested array) in place
+
+        :param indexes: indexes of item, one for each dimension
+            (less for write of row of nested array)
+        :return: True if value of array has changed
+        :note: write on invalid index invalidates whole array,
+            write out of range is ignored
+        """
+        t = self._dtype
+        data, vld = self.val
+        offset = 0
+        for index in indexes:
+            if not index._isFullVld():
+                vld[:] = intArrayFull(self._dtype._vldTypecode, len(vld))
+                return True
+            i = index.val
+            if i < 0 or i >= t.size:
+                return False
+            offset += i * t.rowSize
+            t = t.elmType
+
+        if isinstance(t, SimHArrayT):
+            end = offset + t.itemCnt
+            d, vl = value.val
+            if data[offset:end] == d and vld[offset:end] == vl:
+                return False
+            data[offset:end] = d
+            vld[offset:end] = vl
+        else:
+            v = value.val
+            m = value.vldMask
+            if data[offset] == v and vld[offset] == m:
+                return False
+            data[offset] = v
+            vld[offset] = m
+
+        return True
+
+    def _setitem__val(self, index, value):
+        self.updateTime = max(index.updateTime, value.updateTime)
+        self._updateItem__val((index, ), value)
+
+    def _eq__val(self, other):
+        assert self._dtype == other._dtype
+        if not isinstance(other, SimArrayVal):
+            return super(SimArrayVal, self)._eq__val(other)
+
+        vld = int(self._isFullVld() and other._isFullVld())
+        eq = self.val[0] == other.val[0]
+        return BOOL.getValueCls()(eq, BOOL, vld,
+                                  max(self.updateTime, other.updateTime))
+
+    def toPy(self):
+        if not self._isFullVld():
+            raise ValueError("Value of %r is not fully defined" % self)
+        return [v.toPy() for v in self]
+
+    def toInts(self, offset: int=0, count: Optional[int]=None
+               ) -> List[Optional[int]]:
+        """
+        :return: list of values of items of innermost arrays
+            (None for item which is not fully valid)
+        """
+        data, vld = self.val
+        if count is None:
+            count = len(data) - offset
+        m = self._dtype._itemMask
+        end = offset + count
+        return [d if v == m else None
+                for d, v in zip(data[offset:end], vld[offset:end])]
+
+    def loadInts(self, values, offset: int=0) -> None:
+        """
+        Store values of items of innermost arrays starting at offset
+        (items are marked as valid)
+        """
+        t = self._dtype
+        values = list(values)
+        n = len(values)
+        data, vld = self.val
+        if offset < 0 or offset + n > len(data):
+            raise IndexError(offset, n, len(data))
+
+        if t._dataTypecode is None:
+            data[offset:offset + n] = values
+        else:
+            data[offset:offset + n] = array(t._dataTypecode, values)
+        vld[offset:offset + n] = intArrayFull(t._vldTypecode, n, t._itemMask)
+        self.vldMask = 1
+
+    def loadBytes(self, buff: bytes, offset: int=0,
+                  byteorder: str="little") -> int:
+        """
+        Store items from bytes, each item has (width + 7) // 8 bytes
+
+        :param offset: index of first written item of innermost arrays
+        :return: number of written items
+        """
+        t = self._dtype
+        itemBytes = (t._itemWidth + 7) // 8
+        n = len(buff) // itemBytes
+        tc = t._dataTypecode
+        if (tc is not None and array(tc).itemsize == itemBytes
+                and byteorder == sys.byteorder):
+            values = array(tc)
+            values.frombytes(buff[:n * itemBytes])
+        else:
+            signed = t._itemSigned
+            values = [int.from_bytes(buff[i:i + itemBytes], byteorder,
+                                     signed=signed)
+                      for i in range(0, n * itemBytes, itemBytes)]
+        if t._itemWidth % 8:
+            w = t._itemWidth
+            if t._itemSigned:
+                lo, hi = -(1 << (w - 1)), (1 << (w - 1)) - 1
+            else:
+                lo, hi = 0, t._itemMask
+            for v in values:
+                if v < lo or v > hi:
+                    raise ValueError("Value does not fit to item", v)
+
+        self.loadInts(values, offset)
+        return n
+
+    def toBytes(self, offset: int=0, count: Optional[int]=None,
+                byteorder: str="little") -> bytes:
+        """
+        Convert items to bytes, each item has (width + 7) // 8 bytes
+        (invalid bits are 0)
+        """
+        t = self._dtype
+        data, vld = self.val
+        if count is None:
+            count = len(data) - offset
+        end = offset + count
+        itemBytes = (t._itemWidth + 7) // 8
+        tc = t._dataTypecode
+        m = t._itemMask
+        if (tc is not None and array(tc).itemsize == itemBytes
+                and byteorder == sys.byteorder
+                and vld[offset:end] == intArrayFull(t._vldTypecode, count, m)):
+            return data[offset:end].tobytes()
+
+        res = []
+        for d, v in zip(data[offset:end], vld[offset:end]):
+            # & m converts negative value to two's complement
+            res.append((d & m & v).to_bytes(itemBytes, byteorder))
+        return b"".join(res)
+
+    def loadFile(self, fileName: str, offset: int=0,
+                 byteorder: str="little") -> int:
+        """
+        Store items from binary file (see loadBytes)
+        """
+        with open(fileName, "rb") as f:
+            return self.loadBytes(f.read(), offset, byteorder)
+
+    def dumpFile(self, fileName: str, offset: int=0,
+                 count: Optional[int]=None, byteorder: str="little") -> None:
+        """
+        Write items to binary file (see toBytes)
+        """
+        with open(fileName, "wb") as f:
+            f.write(self.toBytes(offset, count, byteorder))
+
+    def toNumpy(self):
+        """
+        :return: tuple of numpy arrays (data, vld) in shape of the array,
+            items wider than 64b are python ints (dtype=object)
+        """
+        shape = []
+        t = self._dtype
+        while isinstance(t, SimHArrayT):
+            shape.append(t.size)
+            t = t.elmType
+
+        data, vld = self.val
+        return (intArrayToNumpy(data).reshape(shape),
+                intArrayToNumpy(vld).reshape(shape))
+
+    def __repr__(self):
+        return "<%s %r, %d items>" % (self.__class__.__name__, self._dtype,
+                                      len(self.val[0]))
+
+
+def loadSimMem(sig, data: Union[bytes, str, list], offset: int=0,
+               byteorder: str="little") -> None:
+    """
+    Preload content of memory signal in simulation model
+
+    :param sig: signal of type SimHArrayT
+    :param data: bytes, name of binary file or list of ints
+    :param offset: index of first written item of innermost arrays
+    :attention: initial value of memory (if specified) is applied
+        at start of simulation and it overwrites preloaded data
+        (in this case preload data after start of the simulation)
+    """
+    v = sig._oldVal
+    assert isinstance(v, SimArrayVal), v
+    if isinstance(data, bytes):
+        v.loadBytes(data, offset, byteorder)
+    elif isinstance(data, str):
+        v.loadFile(data, offset, byteorder)
+    else:
+        v.loadInts(data, offset)
+    v.vldMask = 1
+    sig._val = v
@@ -6,7 +6,7 @@ from hwt.synthesizer.hObjList import HObjList
 
 
 def valueHasChanged(valA, valB):
-    return valA.val is not valB.val or valA.vldMask != valB.vldMask
+    return valA.vldMask != valB.vldMask or valA.val != valB.val
 
 
 def pprintInterface(intf, prefix="", indent=0, file=sys.stdout):
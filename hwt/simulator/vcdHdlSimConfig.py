@@ -1,6 +1,10 @@
 from datetime import datetime
+from enum import Enum
+from fnmatch import fnmatchcase
+import gzip
+import os
 import sys
-from typing import Union, Optional, Tuple, Callable
+from typing import Union, Optional, Tuple, Callable, List
 
 from hwt.hdl.types.bits import Bits
 from hwt.hdl.types.bool import HBool
@@ -30,14 +34,143 @@ def vcdTypeInfoForHType(t) -> Tuple[str, int, Callable[[RtlSignalBase, Value], s
         raise ValueError(t)
 
 
+class VCD_TRACE_LEVEL(Enum):
+    """
+    Selection of signals which are dumped to VCD
+    """
+    # nothing is dumped
+    NONE = 0
+    # only ports of top unit
+    PORTS = 1
+    # only signals with hierarchical name matching any of specified globs
+    GLOB = 2
+    # all signals
+    ALL = 3
+
+
+def openVcdFile(fileName: str, compress: bool=False):
+    """
+    Open file for writing of VCD
+
+    :param compress: if True file is compressed by gzip on the fly
+        (".gz" is appended to fileName if it does not end with it)
+    """
+    d = os.path.dirname(fileName)
+    if d:
+        os.makedirs(d, exist_ok=True)
+
+    if compress:
+        if not fileName.endswith(".gz"):
+            fileName += ".gz"
+        return gzip.open(fileName, "wt")
+    else:
+        return open(fileName, "w")
+
+
+class VcdWriteBuffer():
+    """
+    Buffer of strings written to VCD file, strings are written
+    to the file in large chunks
+
+    :ivar file: output file
+    :ivar size: number of characters after which buffer is written to file
+    """
+
+    def __init__(self, file, size: int):
+        self.file = file
+        self.size = size
+        self._buff = []
+        self._buffLen = 0
+
+    def write(self, s: str) -> None:
+        self._buff.append(s)
+        self._buffLen += len(s)
+        if self._buffLen >= self.size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buff:
+            self.file.write("".join(self._buff))
+            self._buff = []
+            self._buffLen = 0
+
+
 class VcdHdlSimConfig(HdlSimConfig):
+    """
+    Simulator config which dumps values of signals to VCD file
+
+    :ivar traceLevel: VCD_TRACE_LEVEL which selects dumped signals
+    :ivar traceGlobs: list of glob patterns for hierarchical names
+        of signals (f.e. "top.sub0.*"), used if traceLevel is GLOB
+    :ivar timeWindow: optional tuple (start, end) of simulation time,
+        only changes in this time window are dumped,
+        values of all signals are dumped at the start of the window
+    :ivar _windowStarted: flag which tells that values at start
+        of time window were already dumped
+    :ivar _dumpFile: file (or write buffer) where vcdWriter writes
+    """
     supported_type_classes = (HBool, Bits, HEnum)
 
-    def __init__(self, dumpFile=sys.stdout):
+    def __init__(self, dumpFile=sys.stdout,
+                 traceLevel: VCD_TRACE_LEVEL=VCD_TRACE_LEVEL.ALL,
+                 traceGlobs: Optional[List[str]]=None,
+                 timeWindow: Optional[Tuple[int, int]]=None,
+                 bufferSize: int=0):
+        """
+        :param bufferSize: if > 0 output is collected in buffer
+            and it is written to dumpFile in chunks of at least
+            bufferSize characters
+        """
+        if bufferSize > 0:
+            self._writeBuffer = VcdWriteBuffer(dumpFile, bufferSize)
+            dumpFile = self._writeBuffer
+        else:
+            self._writeBuffer = None
+
+        self._dumpFile = dumpFile
         self.vcdWriter = VcdWriter(dumpFile)
         self.logPropagation = False
         self.logApplyingValues = False
         self._obj2scope = {}
+        self._timeResolution = 1
+
+        if traceLevel == VCD_TRACE_LEVEL.GLOB:
+            assert traceGlobs, "traceGlobs required for VCD_TRACE_LEVEL.GLOB"
+        self.traceLevel = traceLevel
+        self.traceGlobs = traceGlobs
+        self.timeWindow = timeWindow
+        self._windowStarted = timeWindow is None
+
+    def _isTraced(self, scope: VcdVarWritingScope, name: str) -> bool:
+        """
+        :return: True if signal of specified name in specified scope
+            should be dumped
+        """
+        if self.traceLevel != VCD_TRACE_LEVEL.GLOB:
+            return True
+
+        path = [name, ]
+        while isinstance(scope, VcdVarWritingScope):
+            path.append(scope.name)
+            scope = scope.parent
+        path = ".".join(reversed(path))
+
+        for g in self.traceGlobs:
+            if fnmatchcase(path, g):
+                return True
+        return False
+
+    def _addVar(self, scope: VcdVarWritingScope, sig):
+        t = sig._dtype
+        if isinstance(t, self.supported_type_classes):
+            name = getSignalName(sig)
+            if not self._isTraced(scope, name):
+                return
+            tName, width, formatter = vcdTypeInfoForHType(t)
+            try:
+                scope.addVar(sig, name, tName, width, formatter)
+            except VarAlreadyRegistered:
+                pass
 
     def vcdRegisterInterfaces(self, obj: Union[Interface, Unit],
                               parent: Optional[VcdVarWritingScope]):
@@ -63,23 +196,13 @@ class VcdHdlSimConfig(HdlSimConfig):
 
             return subScope
         else:
-            t = obj._dtype
-            if isinstance(t, self.supported_type_classes):
-                tName, width, formatter = vcdTypeInfoForHType(t)
-                try:
-                    parent.addVar(obj, getSignalName(obj), tName, width, formatter)
-                except VarAlreadyRegistered:
-                    pass
+            self._addVar(parent, obj)
 
     def vcdRegisterRemainingSignals(self, unit: Union[Interface, Unit]):
         unitScope = self._obj2scope[unit]
         for s in unit._ctx.signals:
             if s not in self.vcdWriter._idScope:
-                t = s._dtype
-                if isinstance(t, self.supported_type_classes):
-                    tName, width, formatter = vcdTypeInfoForHType(t)
-                    unitScope.addVar(s, getSignalName(
-                        s), tName, width, formatter)
+                self._addVar(unitScope, s)
 
         for u in unit._units:
             self.vcdRegisterRemainingSignals(u)
@@ -97,21 +220,66 @@ class VcdHdlSimConfig(HdlSimConfig):
         """
         This method is called before first step of simulation.
         """
+        if self.traceLevel == VCD_TRACE_LEVEL.NONE:
+            # nothing to dump, value changes are not even reported
+            self.logChange = None
+            return
+
         vcd = self.vcdWriter
         vcd.date(datetime.now())
-        vcd.timescale(1)
+        self._timeResolution = simulator.timeResolution
+        vcd.timescale(self._timeResolution)
 
-        self.vcdRegisterInterfaces(synthesisedUnit, None)
-        self.vcdRegisterRemainingSignals(synthesisedUnit)
+        if self.traceLevel == VCD_TRACE_LEVEL.PORTS:
+            with vcd.varScope(synthesisedUnit._name) as scope:
+                for p in synthesisedUnit._ports:
+                    self._addVar(scope, p)
+        else:
+            self.vcdRegisterInterfaces(synthesisedUnit, None)
+            self.vcdRegisterRemainingSignals(synthesisedUnit)
 
         vcd.enddefinitions()
 
+    def _startTimeWindow(self, sig, nextVal):
+        """
+        Dump values of all signals at the start of time window
+        """
+        self._windowStarted = True
+        vcd = self.vcdWriter
+        start = self.timeWindow[0]
+        vcd.setTime(start // self._timeResolution)
+        write = self._dumpFile.write
+        for s, varInfo in vcd._idScope.items():
+            if s is sig:
+                # value before this change
+                v = s._oldVal
+            else:
+                v = s._val
+            write(varInfo.valueFormatter(s, v, varInfo))
+
     def logChange(self, nowTime, sig, nextVal):
         """
         This method is called for every value change of any signal.
         """
+        if not self._windowStarted:
+            if nowTime < self.timeWindow[0]:
+                return
+            self._startTimeWindow(sig, nextVal)
+        elif self.timeWindow is not None and nowTime > self.timeWindow[1]:
+            # end of time window, stop reporting of changes
+            self.logChange = None
+            return
+
         try:
-            self.vcdWriter.logChange(nowTime, sig, nextVal)
+            self.vcdWriter.logChange(nowTime // self._timeResolution,
+                                     sig, nextVal)
         except KeyError:
             # not every signal has to be registered
             pass
+
+    def afterRun(self, simulator):
+        """
+        Write buffered data to output file
+        """
+        if self._writeBuffer is not None:
+            self._writeBuffer.flush()
@@ -0,0 +1,254 @@
+from array import array
+from bisect import bisect_right
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Tuple, Union
+
+from hwt.hdl.constants import SENSITIVITY
+from hwt.hdl.types.bits import Bits
+from hwt.hdl.types.bool import HBool
+from hwt.hdl.types.enum import HEnum
+from hwt.hdl.value import Value
+from hwt.simulator.hdlSimConfig import HdlSimConfig
+from hwt.simulator.intArray import intArrayTypecode, intArrayFull, \
+    intArrayToNumpy
+from hwt.simulator.simModel import simModelScopes
+from hwt.simulator.simSignal import SimSignal
+
+
+class SignalWaveform():
+    """
+    Value changes of a single signal stored in compact growable arrays
+    (column per property of change)
+
+    :ivar name: hierarchical name of signal (f.e. "top.sub0.a_data")
+    :ivar sig: recorded signal
+    :ivar width: bit width of value
+    :ivar times: times of value changes (sorted, unique)
+    :ivar vals: values after change (index of value for HEnum)
+    :ivar vldMasks: validity masks of values after change
+    :note: if there are multiple changes in a single time
+        (in delta steps) only the last one is kept
+    """
+
+    def __init__(self, name: str, sig: SimSignal):
+        self.name = name
+        self.sig = sig
+        t = sig._dtype
+        if isinstance(t, HEnum):
+            self.width = t.bit_length()
+            signed = False
+            self._enumIndex = {v: i for i, v in enumerate(t._allValues)}
+            self._enumIndex[None] = 0
+        else:
+            self.width = t.bit_length()
+            signed = bool(getattr(t, "signed", False))
+            self._enumIndex = None
+
+        self.times = array("q")
+        self.vals = intArrayFull(intArrayTypecode(self.width, signed), 0)
+        self.vldMasks = intArrayFull(intArrayTypecode(self.width, False), 0)
+
+    def append(self, time: int, v: Value) -> None:
+        """
+        Record value change
+        """
+        val = v.val
+        if self._enumIndex is not None:
+            val = self._enumIndex[val]
+        else:
+            val = int(val)
+
+        times = self.times
+        if times and times[-1] == time:
+            # change in next delta step overrides the previous one
+            self.vals[-1] = val
+            self.vldMasks[-1] = int(v.vldMask)
+        else:
+            times.append(time)
+            self.vals.append(val)
+            self.vldMasks.append(int(v.vldMask))
+
+    def __len__(self):
+        return len(self.times)
+
+    def valueAt(self, time: int) -> Optional[Tuple[int, int]]:
+        """
+        :return: tuple (value, validity mask) of signal in specified time
+            (after all changes in this time)
+            or None if time is before start of simulation
+        """
+        i = bisect_right(self.times, time) - 1
+        if i < 0:
+            return None
+        return (self.vals[i], self.vldMasks[i])
+
+    def edges(self, sensitivity: SENSITIVITY=SENSITIVITY.RISING,
+              start: int=0, end: Optional[int]=None) -> List[int]:
+        """
+        :param sensitivity: SENSITIVITY.RISING/FALLING for valid 0->1/1->0
+            transitions of 1b signal, SENSITIVITY.ANY for all changes
+        :param start: only edges in time >= start are returned
+        :param end: if not None only edges in time < end are returned
+        :return: list of times of edges
+        """
+        times = self.times
+        lo = bisect_right(times, start - 1)
+        hi = len(times) if end is None else bisect_right(times, end - 1)
+        if sensitivity == SENSITIVITY.ANY:
+            return list(times[lo:hi])
+
+        if sensitivity == SENSITIVITY.RISING:
+            before, after = 0, 1
+        elif sensitivity == SENSITIVITY.FALLING:
+            before, after = 1, 0
+        else:
+            raise ValueError(sensitivity)
+        assert self.width == 1, (self.name, self.width)
+
+        vals = self.vals
+        vld = self.vldMasks
+        res = []
+        for i in range(max(lo, 1), hi):
+            if (vals[i] == after and vld[i] and
+                    vals[i - 1] == before and vld[i - 1]):
+                res.append(times[i])
+        return res
+
+    def toNumpy(self):
+        """
+        :return: tuple of numpy arrays (times, vals, vldMasks),
+            values wider than 64b are in arrays of python ints (dtype=object)
+        """
+        return (intArrayToNumpy(self.times),
+                intArrayToNumpy(self.vals),
+                intArrayToNumpy(self.vldMasks))
+
+    def valuesAt(self, times):
+        """
+        Vectorized version of valueAt
+
+        :param times: array like of query times
+        :return: tuple of numpy arrays (vals, vldMasks),
+            times before first change have value and validity 0
+        """
+        import numpy as np
+        t, vals, vld = self.toNumpy()
+        i = np.searchsorted(t, times, side="right") - 1
+        if not len(t):
+            z = np.zeros(len(i), dtype=vals.dtype)
+            return z, z.copy()
+        before = i < 0
+        i[before] = 0
+        vals = vals[i]
+        vld = vld[i]
+        vals[before] = 0
+        vld[before] = 0
+        return vals, vld
+
+    def __repr__(self):
+        return "<%s %s, %d changes>" % (self.__class__.__name__, self.name,
+                                        len(self))
+
+
+class WaveformHdlSimConfig(HdlSimConfig):
+    """
+    Simulator config which records value changes of signals in memory
+    (alternative to VCD dump, which does not need to be parsed back
+    for checks of the waveform)
+
+    Usage:
+
+    .. code-block:: python
+
+        wave = WaveformHdlSimConfig()
+        sim = HdlSimulator(wave)
+        sim.simUnit(model, 1000 * Time.ns, procs)
+
+        clkEdges = wave[model.clk].edges(SENSITIVITY.RISING)
+        t, vals, vld = wave["top.b_data"].toNumpy()
+        wave.saveNpz("wave.npz")
+
+    :ivar traceGlobs: optional list of glob patterns of hierarchical names
+        of recorded signals, if None all supported signals are recorded
+    :ivar waveforms: dictionary {hierarchical name: SignalWaveform}
+    :ivar _sigWaves: dictionary {signal: SignalWaveform}
+    :attention: NumPy is required only for toNumpy, valuesAt and saveNpz
+    """
+    supported_type_classes = (HBool, Bits, HEnum)
+
+    def __init__(self, traceGlobs: Optional[List[str]]=None):
+        super(WaveformHdlSimConfig, self).__init__()
+        self.traceGlobs = traceGlobs
+        self.waveforms = {}
+        self._sigWaves = {}
+
+    def _isTraced(self, name: str) -> bool:
+        globs = self.traceGlobs
+        if globs is None:
+            return True
+
+        for g in globs:
+            if fnmatchcase(name, g):
+                return True
+        return False
+
+    def beforeSim(self, simulator, synthesisedUnit):
+        for m, scope in simModelScopes(synthesisedUnit).items():
+            for s in sorted(m._ctx.signals, key=lambda s: s.name):
+                if (s in self._sigWaves
+                        or not isinstance(s._dtype,
+                                          self.supported_type_classes)):
+                    continue
+                name = "%s.%s" % (scope, s.name)
+                if not self._isTraced(name):
+                    continue
+
+                w = SignalWaveform(name, s)
+                # initial value, signals which are never changed
+                # would not have any record otherwise
+                w.append(simulator.now, s._val)
+                self._sigWaves[s] = w
+                self.waveforms[name] = w
+
+    def logChange(self, nowTime, sig, nextVal):
+        try:
+            w = self._sigWaves[sig]
+        except KeyError:
+            # not recorded signal
+            return
+        w.append(nowTime, nextVal)
+
+    def __getitem__(self, sigOrName: Union[SimSignal, str]) -> SignalWaveform:
+        """
+        :return: SignalWaveform for signal or its hierarchical name
+        """
+        if isinstance(sigOrName, str):
+            return self.waveforms[sigOrName]
+        else:
+            return self._sigWaves[sigOrName]
+
+    def toNumpy(self) -> Dict[str, tuple]:
+        """
+        :return: dictionary {hierarchical name: (times, vals, vldMasks)}
+            (see SignalWaveform.toNumpy)
+        """
+        return {name: w.toNumpy() for name, w in self.waveforms.items()}
+
+    def saveNpz(self, file, compressed: bool=True) -> None:
+        """
+        Save all waveforms to .npz file, arrays are named
+        "<name>.times", "<name>.vals", "<name>.vldMasks"
+
+        :param file: file name or file object
+        """
+        import numpy as np
+        arrays = {}
+        for name, (t, v, vld) in self.toNumpy().items():
+            arrays[name + ".times"] = t
+            arrays[name + ".vals"] = v
+            arrays[name + ".vldMasks"] = vld
+
+        if compressed:
+            np.savez_compressed(file, **arrays)
+        else:
+            np.savez(file, **arrays)
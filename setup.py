@@ -34,6 +34,9 @@ setup(name="hwt",
           "jinja2",  # template engine
           "pyDigitalWaveTools>=0.3",  # simulator output dumping
       ],
+      extras_require={
+          "numpy": ["numpy"],  # export of in-memory waveforms
+      },
       license="MIT",
       packages=find_packages(),
       package_data={"hwt": ["*.vhd", "*.v",